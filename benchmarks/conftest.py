@@ -0,0 +1,40 @@
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(__file__))
+
+from fonts import build_composite_font, build_cjk_font  # noqa: E402
+
+FONTS_DIR = os.path.join("tests", "test_files", "fonts")
+
+# bundled test fonts by benchmark id
+BUNDLED_FONTS = {
+    "latin": os.path.join(FONTS_DIR, "Roboto-Regular.ttf"),
+    "latin-extended": os.path.join(FONTS_DIR, "NotoSans-Regular.ttf"),
+    "variable": os.path.join(FONTS_DIR, "OpenSans-VF.ttf"),
+}
+# synthesized fonts by benchmark id
+SYNTHESIZED_FONTS = {
+    "cjk": build_cjk_font,
+    "composite": build_composite_font,
+}
+FONT_IDS = list(BUNDLED_FONTS) + list(SYNTHESIZED_FONTS)
+
+
+@pytest.fixture(scope="session")
+def synthesized_fonts_dir(tmp_path_factory):
+    return tmp_path_factory.mktemp("benchmark-fonts")
+
+
+@pytest.fixture(scope="session", params=FONT_IDS)
+def font_path(request, synthesized_fonts_dir):
+    """The file path of each benchmark font.  Synthesized fonts are built once
+    per session."""
+    if request.param in BUNDLED_FONTS:
+        return BUNDLED_FONTS[request.param]
+    path = synthesized_fonts_dir / f"{request.param}.ttf"
+    if not path.exists():
+        SYNTHESIZED_FONTS[request.param](str(path))
+    return str(path)
@@ -0,0 +1,124 @@
+"""Synthesized hinted TrueType fonts for the benchmark suite.
+
+The bundled test fonts cover small Latin and variable fonts.  The fonts in
+this module model the glyph counts and glyph structure of CJK fonts and of
+composite glyph heavy fonts, with instruction bytecode in every glyph and the
+fpgm, prep, cvt, hdmx, and LTSH hinting tables."""
+
+import array
+
+from fontTools.fontBuilder import FontBuilder
+from fontTools.pens.ttGlyphPen import TTGlyphPen
+from fontTools.ttLib import newTable
+from fontTools.ttLib.tables import ttProgram
+
+UNITS_PER_EM = 1000
+
+
+def _program(length):
+    # PUSHB[0] pushes a single byte, a valid sequence of any even length
+    program = ttProgram.Program()
+    program.fromBytecode(bytes([0xB0, 0x01]) * (length // 2))
+    return program
+
+
+def _draw_strokes(pen, strokes, offset):
+    # CJK ideographs are drawn with many short rectangular strokes
+    for stroke in range(strokes):
+        x = 50 + (stroke * 97 + offset) % 800
+        y = 50 + (stroke * 131 + offset * 7) % 800
+        width = 40 + (stroke * 13) % 120
+        height = 40 + (stroke * 29) % 120
+        pen.moveTo((x, y))
+        pen.lineTo((x, y + height))
+        pen.qCurveTo((x + width // 2, y + height + 20), (x + width, y + height))
+        pen.lineTo((x + width, y))
+        pen.closePath()
+
+
+def _build_font(path, glyph_order, glyphs, bytecode_length):
+    fb = FontBuilder(UNITS_PER_EM, isTTF=True)
+    fb.setupGlyphOrder(glyph_order)
+    fb.setupCharacterMap(
+        {0x4E00 + index: name for index, name in enumerate(glyph_order[1:])}
+    )
+    fb.setupGlyf(glyphs)
+    fb.setupHorizontalMetrics(
+        {name: (UNITS_PER_EM, glyphs[name].xMin) for name in glyph_order}
+    )
+    fb.setupHorizontalHeader(ascent=880, descent=-120)
+    fb.setupNameTable({"familyName": "Dehinter Benchmark", "styleName": "Regular"})
+    fb.setupOS2()
+    fb.setupPost()
+    fb.setupMaxp()
+
+    font = fb.font
+    font["head"].flags |= 1 << 4
+    maxp = font["maxp"]
+    maxp.maxZones = 2
+    maxp.maxTwilightPoints = 16
+    maxp.maxStorage = 64
+    maxp.maxFunctionDefs = 32
+    maxp.maxStackElements = 512
+    maxp.maxSizeOfInstructions = bytecode_length
+    for tag in ("fpgm", "prep"):
+        font[tag] = newTable(tag)
+        font[tag].program = _program(2048)
+    font["cvt "] = newTable("cvt ")
+    font["cvt "].values = array.array("h", range(256))
+    font["gasp"] = newTable("gasp")
+    font["gasp"].version = 1
+    font["gasp"].gaspRange = {8: 0x000A, 65535: 0x000F}
+    font["hdmx"] = newTable("hdmx")
+    font["hdmx"].hdmx = {
+        ppem: {name: ppem for name in glyph_order} for ppem in (12, 16, 24)
+    }
+    font["LTSH"] = newTable("LTSH")
+    font["LTSH"].yPels = {name: 1 for name in glyph_order}
+    font.save(path)
+
+
+def build_cjk_font(path, num_glyphs=20000, strokes=12, bytecode_length=300):
+    """Writes a CJK-scale font with `num_glyphs` simple glyphs."""
+    glyph_order = [".notdef"] + [f"uni{0x4E00 + i:04X}" for i in range(num_glyphs - 1)]
+    # a set of distinct outlines is shared by the glyphs, the glyph records
+    # are compiled separately
+    outlines = []
+    for offset in range(64):
+        pen = TTGlyphPen(None)
+        _draw_strokes(pen, strokes, offset)
+        glyph = pen.glyph()
+        glyph.program = _program(bytecode_length)
+        outlines.append(glyph)
+    glyphs = {name: outlines[index % 64] for index, name in enumerate(glyph_order)}
+    _build_font(path, glyph_order, glyphs, bytecode_length)
+
+
+def build_composite_font(
+    path, num_base_glyphs=2000, num_composite_glyphs=12000, bytecode_length=120
+):
+    """Writes a font in which most glyphs are composite glyphs with two to four
+    components and composite glyph instructions."""
+    base_names = [f"base{i:05d}" for i in range(num_base_glyphs)]
+    composite_names = [f"composite{i:05d}" for i in range(num_composite_glyphs)]
+    glyph_order = [".notdef"] + base_names + composite_names
+    glyphs = {}
+    base_outlines = []
+    for offset in range(32):
+        pen = TTGlyphPen(None)
+        _draw_strokes(pen, 4, offset)
+        glyph = pen.glyph()
+        glyph.program = _program(bytecode_length)
+        base_outlines.append(glyph)
+    glyphs[".notdef"] = base_outlines[0]
+    for index, name in enumerate(base_names):
+        glyphs[name] = base_outlines[index % 32]
+    for index, name in enumerate(composite_names):
+        pen = TTGlyphPen(glyphs)
+        for component in range(2 + index % 3):
+            base_name = base_names[(index * 7 + component * 13) % num_base_glyphs]
+            pen.addComponent(base_name, (1, 0, 0, 1, component * 150, 0))
+        glyph = pen.glyph()
+        glyph.program = _program(bytecode_length // 4)
+        glyphs[name] = glyph
+    _build_font(path, glyph_order, glyphs, bytecode_length)
@@ -0,0 +1,199 @@
+"""Benchmarks of the dehint phases across font sizes and formats.
+
+Run with pytest-benchmark from the root of the repository:
+
+    $ pytest benchmarks --benchmark-autosave
+
+Each benchmark times one phase on a fresh font per round and records the peak
+Python memory allocation of one additional untimed round in the
+`peak_memory` extra info field."""
+
+import io
+
+from fontTools.ttLib import TTFont
+
+from dehinter.font import (
+    dehint,
+    remove_cvar_table,
+    remove_cvt_table,
+    remove_fpgm_table,
+    remove_glyf_instructions,
+    remove_hdmx_table,
+    remove_ltsh_table,
+    remove_prep_table,
+    remove_ttfa_table,
+    remove_vdmx_table,
+    update_gasp_table,
+    update_head_table_flags,
+    update_maxp_table,
+)
+from dehinter.profiling import Profiler
+from dehinter.raw import (
+    dehint_sfnt,
+    recalc_raw_glyf_metrics,
+    remove_raw_glyf_instructions,
+)
+from dehinter.sfnt import open_sfnt, read_sfnt
+
+import pytest
+
+pytest.importorskip("pytest_benchmark")
+
+ROUNDS = 5
+
+REMOVE_TABLE_FUNCTIONS = [
+    remove_cvar_table,
+    remove_cvt_table,
+    remove_fpgm_table,
+    remove_hdmx_table,
+    remove_ltsh_table,
+    remove_prep_table,
+    remove_ttfa_table,
+    remove_vdmx_table,
+]
+UPDATE_FUNCTIONS = [update_gasp_table, update_maxp_table, update_head_table_flags]
+
+
+def run_benchmark(benchmark, func, setup):
+    """Times func(*setup()) with a fresh setup per round and records the peak
+    memory allocation of an untimed round."""
+    args = setup()
+    with Profiler(trace_memory=True) as profiler:
+        with profiler.phase(func.__name__):
+            func(*args)
+    benchmark.extra_info["peak_memory"] = profiler.timings[0].peak_memory
+    return benchmark.pedantic(
+        func, setup=lambda: (setup(), {}), rounds=ROUNDS, iterations=1
+    )
+
+
+def font_setup(font_path, *tags):
+    """Returns a setup function that loads a font and decompiles the tables in
+    tags so that only the phase itself is timed."""
+
+    def setup():
+        tt = TTFont(font_path)
+        for tag in tags:
+            if tag in tt:
+                tt[tag]
+        return (tt,)
+
+    return setup
+
+
+@pytest.fixture(scope="module", params=["ttf", "woff"])
+def flavored_font_data(request, font_path):
+    """The bytes of each benchmark font in the ttf and WOFF formats."""
+    if request.param == "ttf":
+        with open(font_path, "rb") as f:
+            return f.read()
+    tt = TTFont(font_path)
+    tt.flavor = request.param
+    font_file = io.BytesIO()
+    tt.save(font_file)
+    return font_file.getvalue()
+
+
+def test_load(benchmark, flavored_font_data):
+    def load(data):
+        tt = TTFont(io.BytesIO(data))
+        for tag in tt.keys():
+            tt[tag]
+        return tt
+
+    run_benchmark(benchmark, load, lambda: (flavored_font_data,))
+
+
+@pytest.mark.parametrize("func", REMOVE_TABLE_FUNCTIONS, ids=lambda func: func.__name__)
+def test_remove_table(benchmark, font_path, func):
+    run_benchmark(benchmark, func, font_setup(font_path))
+
+
+def test_remove_glyf_instructions(benchmark, font_path):
+    run_benchmark(benchmark, remove_glyf_instructions, font_setup(font_path, "glyf"))
+
+
+@pytest.mark.parametrize("func", UPDATE_FUNCTIONS, ids=lambda func: func.__name__)
+def test_update_table(benchmark, font_path, func):
+    run_benchmark(
+        benchmark, func, font_setup(font_path, "gasp", "maxp", "head", "hdmx", "LTSH")
+    )
+
+
+def test_save(benchmark, flavored_font_data):
+    def setup():
+        tt = TTFont(io.BytesIO(flavored_font_data))
+        dehint(tt, verbose=False)
+        return (tt,)
+
+    def save(tt):
+        tt.save(io.BytesIO())
+
+    run_benchmark(benchmark, save, setup)
+
+
+def test_dehint(benchmark, font_path):
+    def dehint_font(tt):
+        dehint(tt, verbose=False)
+
+    run_benchmark(benchmark, dehint_font, font_setup(font_path))
+
+
+def test_dehint_sfnt(benchmark, font_path):
+    def dehint_font(path):
+        with open_sfnt(path) as sfnt:
+            dehint_sfnt(sfnt, verbose=False)
+            sfnt.compile()
+
+    run_benchmark(benchmark, dehint_font, lambda: (font_path,))
+
+
+def test_remove_raw_glyf_instructions(benchmark, font_path):
+    with open(font_path, "rb") as f:
+        data = f.read()
+
+    run_benchmark(benchmark, remove_raw_glyf_instructions, lambda: (read_sfnt(data),))
+
+
+def test_remove_raw_glyf_instructions_parallel(benchmark, font_path):
+    # fonts below 2 * GLYF_CHUNK_MIN_GLYPHS glyphs are stripped in one process
+    with open(font_path, "rb") as f:
+        data = f.read()
+
+    def remove_raw_glyf_instructions_parallel(sfnt):
+        return remove_raw_glyf_instructions(sfnt, jobs=4)
+
+    run_benchmark(
+        benchmark, remove_raw_glyf_instructions_parallel, lambda: (read_sfnt(data),)
+    )
+
+
+def test_recalc_raw_glyf_metrics(benchmark, font_path):
+    with open(font_path, "rb") as f:
+        data = f.read()
+
+    run_benchmark(benchmark, recalc_raw_glyf_metrics, lambda: (read_sfnt(data),))
+
+
+def test_recalc_maxp(benchmark, font_path):
+    # the fontTools maxp and head bounding box recalculation of a save with
+    # recalcBBoxes=True, for comparison with test_recalc_raw_glyf_metrics
+    def recalc_maxp(tt):
+        tt["maxp"].recalc(tt)
+
+    run_benchmark(benchmark, recalc_maxp, font_setup(font_path, "glyf", "hmtx"))
+
+
+@pytest.mark.parametrize("recalc", [False, True], ids=["no-recalc", "recalc"])
+def test_save_recalc(benchmark, font_path, recalc):
+    # the save of a dehinted lazily loaded font as in dehinter.font.dehint_file,
+    # with and without the bounding box recalculation
+    def setup():
+        tt = TTFont(font_path, lazy=True, recalcBBoxes=recalc)
+        dehint(tt, verbose=False)
+        return (tt,)
+
+    def save(tt):
+        tt.save(io.BytesIO())
+
+    run_benchmark(benchmark, save, setup)
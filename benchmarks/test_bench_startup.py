@@ -0,0 +1,79 @@
+"""Benchmarks of the dehinter command line start-up time.
+
+Run with pytest-benchmark from the root of the repository:
+
+    $ pytest benchmarks/test_bench_startup.py --benchmark-autosave
+
+Each benchmark times a process that runs the `dehinter` console script entry
+point per round.  The total `python -X importtime` import time and the number
+of imported fontTools modules of an additional untimed run are recorded in the
+`import_time_us` and `fonttools_modules` extra info fields."""
+
+import os
+import re
+import subprocess
+import sys
+
+import pytest
+
+pytest.importorskip("pytest_benchmark")
+
+ROUNDS = 10
+
+FONTS_DIR = os.path.join("tests", "test_files", "fonts")
+TEXT_FILE = os.path.join("tests", "test_files", "text", "test.txt")
+
+# the `dehinter` console script entry point
+ENTRY_POINT = "from dehinter.__main__ import main; main()"
+
+# -X importtime lines: "import time: self [us] | cumulative | imported package"
+IMPORT_TIME_LINE = re.compile(r"import time:\s+(\d+) \|\s+(\d+) \|( *)(\S+)")
+
+# command line arguments by benchmark id.  The font paths are copied to a
+# temporary directory before the benchmark runs.
+STARTUP_PATHS = {
+    "version": ["--version"],
+    "help": ["--help"],
+    "invalid-input": [TEXT_FILE],
+    "fast": ["--fast", "--quiet", "Roboto-Regular.ttf"],
+    "default": ["--quiet", "Roboto-Regular.ttf"],
+}
+
+
+def get_command(argv, cwd):
+    argv = [os.path.join(cwd, arg) if arg.endswith(".ttf") else arg for arg in argv]
+    return [sys.executable, "-X", "importtime", "-c", ENTRY_POINT] + argv
+
+
+def parse_import_times(stderr):
+    """Returns the total import time in microseconds of the top level imports
+    and the names of the imported modules in -X importtime output."""
+    total = 0
+    modules = []
+    for match in IMPORT_TIME_LINE.finditer(stderr):
+        modules.append(match.group(4))
+        if len(match.group(3)) == 1:
+            total += int(match.group(2))
+    return total, modules
+
+
+@pytest.mark.parametrize("path_id", list(STARTUP_PATHS))
+def test_startup(benchmark, path_id, tmp_path):
+    font_path = tmp_path / "Roboto-Regular.ttf"
+    with open(os.path.join(FONTS_DIR, "Roboto-Regular.ttf"), "rb") as f:
+        font_path.write_bytes(f.read())
+    command = get_command(STARTUP_PATHS[path_id], str(tmp_path))
+
+    process = subprocess.run(command, capture_output=True, text=True)
+    import_time, modules = parse_import_times(process.stderr)
+    benchmark.extra_info["import_time_us"] = import_time
+    benchmark.extra_info["fonttools_modules"] = sum(
+        module.startswith("fontTools") for module in modules
+    )
+    benchmark.pedantic(
+        subprocess.run,
+        args=(command,),
+        kwargs={"capture_output": True},
+        rounds=ROUNDS,
+        iterations=1,
+    )
@@ -13,16 +13,28 @@
 # limitations under the License.
 
 import argparse
+import json
 import os
 import sys
-from typing import List
-
-from fontTools.ttLib import TTFont  # type: ignore
+from typing import TYPE_CHECKING, Any, Dict, List, Optional, Tuple
 
 from dehinter import __version__
-from dehinter.font import dehint, is_truetype_font
-from dehinter.paths import filepath_exists, get_default_out_path
-from dehinter.system import get_filesize
+from dehinter.font import FLAVOR_FILE_EXTENSIONS, is_truetype_font
+from dehinter.paths import (
+    STDIO_PATH,
+    expand_input_paths,
+    filepath_exists,
+    get_default_out_path,
+)
+from dehinter.system import format_size, fsync_directory, get_filesize
+
+# the batch, cache, server, and sync modules import the process pool and
+# hashing machinery.  They are imported once the command line arguments are
+# parsed and validated so that --version, --help, and requests that fail
+# validation return without the import cost.  fontTools is only imported by
+# the dehinter.font routines that build fontTools objects.
+if TYPE_CHECKING:  # pragma: no cover
+    from dehinter.batch import BatchResult
 
 
 def main() -> None:  # pragma: no cover
@@ -30,6 +42,23 @@ def main() -> None:  # pragma: no cover
 
 
 def run(argv: List[str]) -> None:
+    # ===========================================================
+    # subcommands
+    # ===========================================================
+    # a font file path with a subcommand name is dehinted, e.g. a file named
+    # "serve" in the working directory.  "./serve" or "-- serve" always
+    # define a file path.
+    subcommand = argv[0] if argv and not os.path.exists(argv[0]) else None
+    if subcommand == "cache":
+        run_cache(argv[1:])
+        return
+    if subcommand == "sync":
+        run_sync(argv[1:])
+        return
+    if subcommand == "serve":
+        run_serve(argv[1:])
+        return
+
     # ===========================================================
     # argparse command line argument definitions
     # ===========================================================
@@ -39,118 +68,721 @@ def run(argv: List[str]) -> None:
     parser.add_argument(
         "--version", action="version", version="dehinter v{}".format(__version__)
     )
-    parser.add_argument("-o", "--out", help="out file path (dehinted font)")
-    parser.add_argument("--keep-cvar", help="keep cvar table", action="store_true")
-    parser.add_argument("--keep-cvt", help="keep cvt table", action="store_true")
-    parser.add_argument("--keep-fpgm", help="keep fpgm table", action="store_true")
-    parser.add_argument("--keep-hdmx", help="keep hdmx table", action="store_true")
-    parser.add_argument("--keep-ltsh", help="keep LTSH table", action="store_true")
-    parser.add_argument("--keep-prep", help="keep prep table", action="store_true")
-    parser.add_argument("--keep-ttfa", help="keep TTFA table", action="store_true")
-    parser.add_argument("--keep-vdmx", help="keep VDMX table", action="store_true")
     parser.add_argument(
-        "--keep-glyf", help="do not modify glyf table", action="store_true"
+        "-o", "--out", help="out file path (dehinted font), '-' for standard output"
     )
+    add_dehint_arguments(parser)
     parser.add_argument(
-        "--keep-gasp", help="do not modify gasp table", action="store_true"
+        "--glyf-jobs",
+        type=int,
+        default=1,
+        help="number of worker processes for the glyf table instruction removal "
+        "of large fonts with --fast (0 = one per CPU)",
     )
     parser.add_argument(
-        "--keep-maxp", help="do not modify maxp table", action="store_true"
+        "--cache-dir",
+        help="reuse dehinted fonts from a cache directory and add new results to it",
     )
     parser.add_argument(
-        "--keep-head", help="do not modify head table", action="store_true"
+        "--cache-max-size",
+        help="evict least recently used cache entries above this size (e.g. 500M)",
+    )
+    parser.add_argument(
+        "--profile",
+        metavar="PATH",
+        help="write the time and memory use of each dehint phase to PATH as "
+        "JSON lines",
+    )
+    parser.add_argument(
+        "--profile-memory",
+        action="store_true",
+        help="trace the peak memory allocation of each phase in --profile "
+        "records (slower)",
+    )
+    parser.add_argument(
+        "--report",
+        choices=("json", "ndjson"),
+        help="write a machine-readable report of each font to standard output "
+        "instead of the text output: a JSON array (json) or one JSON object per "
+        "line as each font is processed (ndjson)",
+    )
+    parser.add_argument(
+        "--server",
+        help="send the fonts to a running `dehinter serve` server",
+        action="store_true",
+    )
+    parser.add_argument(
+        "--socket",
+        metavar="PATH",
+        help="server socket path (default: the `dehinter serve` socket path)",
+    )
+    parser.add_argument(
+        "--dry-run",
+        "--analyze",
+        dest="dry_run",
+        help="report the projected size savings of each font without writing "
+        "dehinted fonts",
+        action="store_true",
+    )
+    parser.add_argument(
+        "INFILE",
+        nargs="+",
+        help="in file path(s) (hinted font), directory path(s), or glob pattern(s), "
+        "'-' for standard input",
     )
-    parser.add_argument("--quiet", help="silence standard output", action="store_true")
-    parser.add_argument("INFILE", help="in file path (hinted font)")
 
     args = parser.parse_args(argv)
 
     # ===========================================================
     # Command line logic
     # ===========================================================
+    from dehinter.batch import BatchResult
+
+    inpaths = expand_input_paths(args.INFILE)
+    # text output is replaced by the report in report modes
+    use_verbose_output = not args.quiet and args.report is None
+    report_records: List[Dict[str, Any]] = []
     #
     # Validations
     # -----------
-    #  (1) file path request is a file
-    if not filepath_exists(args.INFILE):
+    #  (1) there is at least one file to dehint
+    if len(inpaths) == 0:
         sys.stderr.write(
-            f"[!] Error: '{args.INFILE}' is not a valid file path.{os.linesep}"
+            f"[!] Error: no font files were found with the requested paths."
+            f"{os.linesep}"
         )
         sys.stderr.write(f"[!] Request canceled.{os.linesep}")
         sys.exit(1)
-    #  (2) the file is a ttf font file (based on the 4 byte file signature
-    if not is_truetype_font(args.INFILE):
+    if args.dry_run:
+        run_dry_run(args, inpaths)
+        return
+    #  (2) an explicit out file path and standard input are only supported with
+    #      a single in file path
+    if args.out and len(inpaths) > 1:
         sys.stderr.write(
-            f"[!] Error: '{args.INFILE}' does not appear to be a TrueType font "
-            f"file.{os.linesep}"
+            f"[!] Error: the -o/--out option is not supported with multiple in "
+            f"file paths.{os.linesep}"
         )
         sys.stderr.write(f"[!] Request canceled.{os.linesep}")
         sys.exit(1)
-    #   (3) confirm that out path is not the same as in path
-    #    This tool does not support writing dehinted files in place over hinted version
-    if args.INFILE == args.out:
+    if STDIO_PATH in inpaths and len(inpaths) > 1:
         sys.stderr.write(
-            f"[!] Error: You are attempting to overwrite the hinted file with the "
-            f"dehinted file.  This is not supported. Please choose a different file "
-            f"path for the dehinted file.{os.linesep}"
+            f"[!] Error: standard input ('{STDIO_PATH}') is not supported with "
+            f"multiple in file paths.{os.linesep}"
         )
+        sys.stderr.write(f"[!] Request canceled.{os.linesep}")
+        sys.exit(1)
+    #  (3) the requested number of worker processes is valid
+    jobs = get_jobs(args)
+    #  (4) the requested number of glyf table worker processes is valid, they
+    #      are only supported by the raw dehint routines
+    if args.glyf_jobs < 0:
+        sys.stderr.write(
+            f"[!] Error: --glyf-jobs must be a positive integer or 0.{os.linesep}"
+        )
+        sys.stderr.write(f"[!] Request canceled.{os.linesep}")
         sys.exit(1)
+    if args.glyf_jobs != 1 and not args.fast:
+        sys.stderr.write(
+            f"[!] Error: the --glyf-jobs option requires the --fast option."
+            f"{os.linesep}"
+        )
+        sys.stderr.write(f"[!] Request canceled.{os.linesep}")
+        sys.exit(1)
+    #  (5) memory profiles are written to the --profile records
+    if args.profile_memory and not args.profile:
+        sys.stderr.write(
+            f"[!] Error: the --profile-memory option requires the --profile "
+            f"option.{os.linesep}"
+        )
+        sys.stderr.write(f"[!] Request canceled.{os.linesep}")
+        sys.exit(1)
+    glyf_jobs = args.glyf_jobs if args.glyf_jobs > 0 else (os.cpu_count() or 1)
+    if inpaths[0] == STDIO_PATH or args.out == STDIO_PATH:
+        run_stdio(args, inpaths[0], glyf_jobs)
+        return
+    #  (6) the cache size limit is valid
+    from dehinter.cache import DehintCache, parse_size
+
+    cache_max_size = None
+    if args.cache_max_size is not None:
+        try:
+            cache_max_size = parse_size(args.cache_max_size)
+        except ValueError as e:
+            sys.stderr.write(f"[!] Error: --cache-max-size: {str(e)}{os.linesep}")
+            sys.stderr.write(f"[!] Request canceled.{os.linesep}")
+            sys.exit(1)
+    cache = DehintCache(args.cache_dir) if args.cache_dir else None
+
+    requests: List[Tuple[str, str]] = []
+    failures: List[BatchResult] = []
+    for inpath in inpaths:
+        if args.out:
+            # validation performed below to prevent this file path definition from
+            # being the same as the in file path.  Write in place over a hinted
+            # file is not supported
+            outpath = args.out
+        else:
+            outpath = get_default_out_path(
+                inpath, FLAVOR_FILE_EXTENSIONS.get(args.flavor)
+            )
+        error = validate_request(inpath, outpath)
+        if error:
+            sys.stderr.write(f"[!] Error: {error}{os.linesep}")
+            failures.append(BatchResult(inpath, outpath, error))
+            if args.report is not None:
+                write_report_record(args.report, failures[-1], report_records)
+        else:
+            requests.append((inpath, outpath))
+
     # Execution
     # ---------
-    #  (1) OpenType table removal
-    try:
-        tt = TTFont(args.INFILE)
-    except Exception as e:
-        sys.stderr.write(
-            f"[!] Error: Unable to create font object with '{args.INFILE}' -> {str(e)}"
+    options = get_dehint_options(args)
+    profile_file = open(args.profile, "w") if args.profile else None
+    if args.server:
+        from dehinter.server import get_default_socket_path, request_font_files
+
+        socket_path = args.socket or get_default_socket_path()
+        try:
+            results = request_font_files(
+                socket_path,
+                requests,
+                options,
+                fast=args.fast,
+                flavor=args.flavor,
+                cache_dir=args.cache_dir,
+                profile=profile_file is not None,
+                fsync=args.fsync,
+                recalc=args.recalc,
+                profile_memory=args.profile_memory,
+            )
+        except OSError as e:
+            sys.stderr.write(
+                f"[!] Error: unable to connect to the dehinter server on "
+                f"'{socket_path}': {str(e)}{os.linesep}"
+            )
+            sys.stderr.write(f"[!] Request canceled.{os.linesep}")
+            sys.exit(1)
+    else:
+        from dehinter.batch import dehint_font_files
+
+        results = dehint_font_files(
+            requests,
+            options,
+            jobs=jobs,
+            verbose=use_verbose_output,
+            fast=args.fast,
+            flavor=args.flavor,
+            cache=cache,
+            profile=profile_file is not None,
+            glyf_jobs=glyf_jobs,
+            fsync=args.fsync,
+            recalc=args.recalc,
+            profile_memory=args.profile_memory,
+        )
+    for result in results:
+        if profile_file is not None:
+            for timing in result.timings:
+                profile_file.write(timing.to_json(file=result.inpath) + "\n")
+        if args.report is not None:
+            write_report_record(args.report, result, report_records)
+        if not result.ok:
+            sys.stderr.write(f"[!] Error: {result.error}{os.linesep}")
+            failures.append(result)
+            continue
+
+        if use_verbose_output:
+            if result.cached:
+                print(f"{os.linesep}[*] Found '{result.inpath}' in the cache")
+            print(f"{os.linesep}[+] Saved dehinted font as '{result.outpath}'")
+            # File size comparison
+            # --------------------
+            infile_size_tuple = get_filesize(result.inpath)
+            outfile_size_tuple = get_filesize(result.outpath)
+            print(f"{os.linesep}[*] File sizes:")
+            print(f"    {infile_size_tuple[0]}{infile_size_tuple[1]} (hinted)")
+            print(f"    {outfile_size_tuple[0]}{outfile_size_tuple[1]} (dehinted)")
+
+    if profile_file is not None:
+        profile_file.close()
+    if args.report == "json":
+        print(json.dumps(report_records, indent=2))
+    if cache is not None and cache_max_size is not None:
+        cache.prune(cache_max_size)
+
+    # Summary
+    # -------
+    if len(inpaths) > 1 and use_verbose_output:
+        print(
+            f"{os.linesep}[*] Dehinted {len(inpaths) - len(failures)} of "
+            f"{len(inpaths)} font files"
         )
+    if failures:
+        if len(inpaths) > 1:
+            sys.stderr.write(
+                f"{os.linesep}[!] {len(failures)} of {len(inpaths)} font files "
+                f"failed:{os.linesep}"
+            )
+            for failure in failures:
+                sys.stderr.write(f"    {failure.inpath}: {failure.error}{os.linesep}")
+        sys.stderr.write(f"[!] Request canceled.{os.linesep}")
         sys.exit(1)
 
-    use_verbose_output = not args.quiet
 
-    dehint(
-        tt,
-        keep_cvar=args.keep_cvar,
-        keep_cvt=args.keep_cvt,
-        keep_fpgm=args.keep_fpgm,
-        keep_gasp=args.keep_gasp,
-        keep_glyf=args.keep_glyf,
-        keep_hdmx=args.keep_hdmx,
-        keep_head=args.keep_head,
-        keep_ltsh=args.keep_ltsh,
-        keep_maxp=args.keep_maxp,
-        keep_prep=args.keep_prep,
-        keep_ttfa=args.keep_ttfa,
-        keep_vdmx=args.keep_vdmx,
-        verbose=use_verbose_output,
-    )
+def run_stdio(args: argparse.Namespace, inpath: str, glyf_jobs: int) -> None:
+    """Dehints a single font that is read from standard input or written to
+    standard output, e.g. in a shell pipeline."""
+    from dehinter.batch import dehint_font_stream
 
-    # File write
-    # ----------
+    if args.server or args.cache_dir or args.profile:
+        sys.stderr.write(
+            f"[!] Error: standard input and output ('{STDIO_PATH}') are not "
+            f"supported with the --server, --cache-dir, and --profile options."
+            f"{os.linesep}"
+        )
+        sys.stderr.write(f"[!] Request canceled.{os.linesep}")
+        sys.exit(1)
     if args.out:
-        # validation performed above to prevent this file path definition from
-        # being the same as the in file path.  Write in place over a hinted
-        # file is not supported
         outpath = args.out
+    elif inpath == STDIO_PATH:
+        outpath = STDIO_PATH
     else:
-        outpath = get_default_out_path(args.INFILE)
-
-    try:
-        tt.save(outpath)
-        if use_verbose_output:
-            print(f"{os.linesep}[+] Saved dehinted font as '{outpath}'")
-    except Exception as e:  # pragma: no cover
+        outpath = get_default_out_path(inpath, FLAVOR_FILE_EXTENSIONS.get(args.flavor))
+    # the dehinted font is the only standard output when it is written there
+    if outpath == STDIO_PATH and args.report is not None:
         sys.stderr.write(
-            f"[!] Error: Unable to save dehinted font file: {str(e)}{os.linesep}"
+            f"[!] Error: the --report option is not supported with standard "
+            f"output.{os.linesep}"
         )
+        sys.stderr.write(f"[!] Request canceled.{os.linesep}")
+        sys.exit(1)
+    error = None if inpath == STDIO_PATH else validate_request(inpath, outpath)
+    if error:
+        sys.stderr.write(f"[!] Error: {error}{os.linesep}")
+        sys.stderr.write(f"[!] Request canceled.{os.linesep}")
+        sys.exit(1)
 
-    # File size comparison
-    # --------------------
-    if use_verbose_output:
-        infile_size_tuple = get_filesize(args.INFILE)
-        outfile_size_tuple = get_filesize(
-            outpath
-        )  # depends on outpath definition defined during file write
+    use_verbose_output = (
+        not args.quiet and args.report is None and outpath != STDIO_PATH
+    )
+    result = dehint_font_stream(
+        inpath,
+        outpath,
+        get_dehint_options(args),
+        verbose=use_verbose_output,
+        fast=args.fast,
+        flavor=args.flavor,
+        glyf_jobs=glyf_jobs,
+        fsync=args.fsync,
+        recalc=args.recalc,
+    )
+    if args.fsync and result.ok and outpath != STDIO_PATH:
+        fsync_directory(os.path.dirname(os.path.abspath(outpath)))
+    report_records: List[Dict[str, Any]] = []
+    if args.report is not None:
+        write_report_record(args.report, result, report_records)
+    if args.report == "json":
+        print(json.dumps(report_records, indent=2))
+    if not result.ok:
+        sys.stderr.write(f"[!] Error: {result.error}{os.linesep}")
+        sys.stderr.write(f"[!] Request canceled.{os.linesep}")
+        sys.exit(1)
+
+    if use_verbose_output and result.report is not None:
+        print(f"{os.linesep}[+] Saved dehinted font as '{result.outpath}'")
+        # File size comparison
+        # --------------------
+        infile_size_tuple = format_size(result.report.in_size or 0)
+        outfile_size_tuple = format_size(result.report.out_size or 0)
         print(f"{os.linesep}[*] File sizes:")
         print(f"    {infile_size_tuple[0]}{infile_size_tuple[1]} (hinted)")
         print(f"    {outfile_size_tuple[0]}{outfile_size_tuple[1]} (dehinted)")
+
+
+def run_dry_run(args: argparse.Namespace, inpaths: List[str]) -> None:
+    """Reports the projected size savings of dehinting the fonts in `inpaths`
+    with the command line options.  No fonts are written."""
+    from dehinter.analyze import FontSavings, analyze_font_file
+
+    options = get_dehint_options(args)
+    use_verbose_output = not args.quiet and args.report is None
+    report_records: List[Dict[str, Any]] = []
+    results: List[FontSavings] = []
+    for inpath in inpaths:
+        error = validate_request(inpath, "")
+        if error:
+            savings = FontSavings(inpath, {}, error=error)
+        else:
+            savings = analyze_font_file(inpath, options)
+        results.append(savings)
+        if args.report == "ndjson":
+            print(json.dumps(savings.to_dict()), flush=True)
+        elif args.report == "json":
+            report_records.append(savings.to_dict())
+        if not savings.ok:
+            sys.stderr.write(f"[!] Error: {savings.error}{os.linesep}")
+            continue
+
+        if use_verbose_output:
+            print(f"{os.linesep}[*] Projected savings of '{inpath}'")
+            print_savings(savings.tables, savings.glyf, savings.gasp)
+            print_total_savings(savings.total, savings.in_size)
+
+    if args.report == "json":
+        print(json.dumps(report_records, indent=2))
+
+    # Summary
+    # -------
+    analyzed = [savings for savings in results if savings.ok]
+    if len(inpaths) > 1 and use_verbose_output and analyzed:
+        tables: Dict[str, int] = {}
+        for savings in analyzed:
+            for tag, size in savings.tables.items():
+                tables[tag] = tables.get(tag, 0) + size
+        print(
+            f"{os.linesep}[*] Projected savings of {len(analyzed)} of "
+            f"{len(inpaths)} font files"
+        )
+        print_savings(
+            tables,
+            sum(savings.glyf for savings in analyzed),
+            sum(savings.gasp for savings in analyzed),
+        )
+        print_total_savings(
+            sum(savings.total for savings in analyzed),
+            sum(savings.in_size for savings in analyzed),
+        )
+    failures = [savings for savings in results if not savings.ok]
+    if failures:
+        if len(inpaths) > 1:
+            sys.stderr.write(
+                f"{os.linesep}[!] {len(failures)} of {len(inpaths)} font files "
+                f"failed:{os.linesep}"
+            )
+            for failure in failures:
+                sys.stderr.write(f"    {failure.inpath}: {failure.error}{os.linesep}")
+        sys.stderr.write(f"[!] Request canceled.{os.linesep}")
+        sys.exit(1)
+
+
+def print_savings(tables: Dict[str, int], glyf: int, gasp: int) -> None:
+    """Prints the projected savings of each edit."""
+    for tag, size in tables.items():
+        print(f"    {tag:<6}{''.join(format_size(size))} (removed)")
+    if glyf:
+        print(f"    {'glyf':<6}{''.join(format_size(glyf))} (instructions)")
+    if gasp:
+        sign = "" if gasp > 0 else "-"
+        print(f"    {'gasp':<6}{sign}{''.join(format_size(abs(gasp)))} (replaced)")
+
+
+def print_total_savings(total: int, in_size: int) -> None:
+    """Prints the projected total savings and their share of the file size."""
+    percent = total / in_size * 100 if in_size else 0.0
+    print(
+        f"    {'total':<6}{''.join(format_size(total))} of "
+        f"{''.join(format_size(in_size))} ({percent:.1f}%)"
+    )
+
+
+def run_cache(argv: List[str]) -> None:
+    """The `dehinter cache stats|prune` subcommand."""
+    parser = argparse.ArgumentParser(
+        prog="dehinter cache", description="Inspect and prune a dehinter cache"
+    )
+    parser.add_argument("COMMAND", choices=("stats", "prune"), help="cache command")
+    parser.add_argument("--cache-dir", required=True, help="cache directory path")
+    parser.add_argument(
+        "--max-size",
+        default="0",
+        help="prune: evict least recently used entries above this size "
+        "(default: 0, remove all entries)",
+    )
+    args = parser.parse_args(argv)
+
+    from dehinter.cache import DehintCache, parse_size
+
+    cache = DehintCache(args.cache_dir)
+    if args.COMMAND == "stats":
+        stats = cache.stats()
+        size = format_size(stats.size)
+        print(f"[*] Cache directory: {args.cache_dir}")
+        print(f"[*] Entries: {stats.entries}")
+        print(f"[*] Size: {size[0]}{size[1]}")
+        return
+
+    try:
+        max_size = parse_size(args.max_size)
+    except ValueError as e:
+        sys.stderr.write(f"[!] Error: --max-size: {str(e)}{os.linesep}")
+        sys.stderr.write(f"[!] Request canceled.{os.linesep}")
+        sys.exit(1)
+    removed = cache.prune(max_size)
+    size = format_size(removed.size)
+    print(f"[-] Removed {removed.entries} cache entries ({size[0]}{size[1]})")
+
+
+def run_sync(argv: List[str]) -> None:
+    """The `dehinter sync SRC_DIR DST_DIR` subcommand."""
+    parser = argparse.ArgumentParser(
+        prog="dehinter sync",
+        description="Mirror the fonts in a directory tree as dehinted fonts and "
+        "only dehint the fonts that changed since the last sync",
+    )
+    add_dehint_arguments(parser)
+    parser.add_argument("SRC_DIR", help="directory path of the hinted fonts")
+    parser.add_argument("DST_DIR", help="directory path of the dehinted fonts")
+    args = parser.parse_args(argv)
+
+    use_verbose_output = not args.quiet
+    #
+    # Validations
+    # -----------
+    #  (1) the source directory exists
+    if not os.path.isdir(args.SRC_DIR):
+        sys.stderr.write(
+            f"[!] Error: '{args.SRC_DIR}' is not a valid directory path.{os.linesep}"
+        )
+        sys.stderr.write(f"[!] Request canceled.{os.linesep}")
+        sys.exit(1)
+    #  (2) the destination directory is not in the source directory tree, the
+    #      dehinted fonts would be synced as source fonts in the next sync
+    src_dir = os.path.realpath(args.SRC_DIR)
+    dst_dir = os.path.realpath(args.DST_DIR)
+    if os.path.commonpath([src_dir, dst_dir]) == src_dir:
+        sys.stderr.write(
+            f"[!] Error: the destination directory must not be in the source "
+            f"directory tree.{os.linesep}"
+        )
+        sys.stderr.write(f"[!] Request canceled.{os.linesep}")
+        sys.exit(1)
+    #  (3) the requested number of worker processes is valid
+    jobs = get_jobs(args)
+
+    # Execution
+    # ---------
+    from dehinter.sync import sync_directory
+
+    result = sync_directory(
+        args.SRC_DIR,
+        args.DST_DIR,
+        get_dehint_options(args),
+        jobs=jobs,
+        verbose=use_verbose_output,
+        fast=args.fast,
+        flavor=args.flavor,
+        fsync=args.fsync,
+        recalc=args.recalc,
+    )
+
+    # Summary
+    # -------
+    if use_verbose_output:
+        for src_path in result.dehinted:
+            print(f"[+] Dehinted '{src_path}'")
+        for dst_path in result.removed:
+            print(f"[-] Removed '{dst_path}'")
+        print(
+            f"{os.linesep}[*] Synced {len(result.dehinted) + len(result.unchanged)} "
+            f"font files: {len(result.dehinted)} dehinted, "
+            f"{len(result.unchanged)} unchanged, {len(result.removed)} removed"
+        )
+    if result.failures:
+        sys.stderr.write(
+            f"{os.linesep}[!] {len(result.failures)} font files failed:{os.linesep}"
+        )
+        for failure in result.failures:
+            sys.stderr.write(f"    {failure.inpath}: {failure.error}{os.linesep}")
+        sys.stderr.write(f"[!] Request canceled.{os.linesep}")
+        sys.exit(1)
+
+
+def run_serve(argv: List[str]) -> None:
+    """The `dehinter serve` subcommand."""
+    from dehinter.server import get_default_socket_path, serve, stop_server
+
+    parser = argparse.ArgumentParser(
+        prog="dehinter serve",
+        description="Run a dehint server with warm worker processes on a local "
+        "Unix socket for `dehinter --server` requests",
+    )
+    parser.add_argument(
+        "--socket",
+        metavar="PATH",
+        default=get_default_socket_path(),
+        help="server socket path (default: %(default)s)",
+    )
+    parser.add_argument(
+        "-j",
+        "--jobs",
+        type=int,
+        default=1,
+        help="number of worker processes (0 = one per CPU)",
+    )
+    parser.add_argument(
+        "--stop", help="stop the server on the socket path", action="store_true"
+    )
+    args = parser.parse_args(argv)
+
+    if args.stop:
+        try:
+            stop_server(args.socket)
+        except OSError as e:
+            sys.stderr.write(
+                f"[!] Error: unable to connect to the dehinter server on "
+                f"'{args.socket}': {str(e)}{os.linesep}"
+            )
+            sys.exit(1)
+        print(f"[-] Stopped the dehinter server on '{args.socket}'")
+        return
+
+    jobs = get_jobs(args)
+    print(f"[*] Serving dehint requests on '{args.socket}' with {jobs} workers")
+    sys.stdout.flush()
+    try:
+        serve(args.socket, jobs)
+    except OSError as e:
+        sys.stderr.write(f"[!] Error: {str(e)}{os.linesep}")
+        sys.stderr.write(f"[!] Request canceled.{os.linesep}")
+        sys.exit(1)
+
+
+def add_dehint_arguments(parser: argparse.ArgumentParser) -> None:
+    """Adds the dehint option arguments that are shared by the dehint and sync
+    commands to an argument parser."""
+    parser.add_argument("--keep-cvar", help="keep cvar table", action="store_true")
+    parser.add_argument("--keep-cvt", help="keep cvt table", action="store_true")
+    parser.add_argument("--keep-fpgm", help="keep fpgm table", action="store_true")
+    parser.add_argument("--keep-hdmx", help="keep hdmx table", action="store_true")
+    parser.add_argument("--keep-ltsh", help="keep LTSH table", action="store_true")
+    parser.add_argument("--keep-prep", help="keep prep table", action="store_true")
+    parser.add_argument("--keep-ttfa", help="keep TTFA table", action="store_true")
+    parser.add_argument("--keep-vdmx", help="keep VDMX table", action="store_true")
+    parser.add_argument(
+        "--keep-tsi", help="keep VTT TSI* source tables", action="store_true"
+    )
+    parser.add_argument(
+        "--keep-glyf", help="do not modify glyf table", action="store_true"
+    )
+    parser.add_argument(
+        "--keep-gasp", help="do not modify gasp table", action="store_true"
+    )
+    parser.add_argument(
+        "--keep-maxp", help="do not modify maxp table", action="store_true"
+    )
+    parser.add_argument(
+        "--keep-head", help="do not modify head table", action="store_true"
+    )
+    parser.add_argument(
+        "--fast",
+        help="edit the font binary without a full decompile and compile",
+        action="store_true",
+    )
+    parser.add_argument(
+        "--recalc",
+        help="recalculate the glyph and font bounding boxes when the font is saved",
+        action="store_true",
+    )
+    parser.add_argument(
+        "--flavor",
+        choices=sorted(FLAVOR_FILE_EXTENSIONS),
+        help="dehinted font format (default: the in file format)",
+    )
+    parser.add_argument(
+        "-j",
+        "--jobs",
+        type=int,
+        default=1,
+        help="number of worker processes for multiple fonts (0 = one per CPU)",
+    )
+    parser.add_argument(
+        "--fsync",
+        help="flush dehinted fonts to storage before they replace the out files, "
+        "and flush each out file directory once per run",
+        action="store_true",
+    )
+    parser.add_argument("--quiet", help="silence standard output", action="store_true")
+
+
+def get_jobs(args: argparse.Namespace) -> int:
+    """Returns the number of worker processes that were requested on the
+    command line.  The request is canceled when the number is not valid."""
+    if args.jobs < 0:
+        sys.stderr.write(
+            f"[!] Error: --jobs must be a positive integer or 0.{os.linesep}"
+        )
+        sys.stderr.write(f"[!] Request canceled.{os.linesep}")
+        sys.exit(1)
+    return args.jobs if args.jobs > 0 else (os.cpu_count() or 1)
+
+
+def get_dehint_options(args: argparse.Namespace) -> Dict[str, bool]:
+    """Returns the dehint() keyword arguments that were requested on the
+    command line."""
+    return {
+        "keep_cvar": args.keep_cvar,
+        "keep_cvt": args.keep_cvt,
+        "keep_fpgm": args.keep_fpgm,
+        "keep_gasp": args.keep_gasp,
+        "keep_glyf": args.keep_glyf,
+        "keep_hdmx": args.keep_hdmx,
+        "keep_head": args.keep_head,
+        "keep_ltsh": args.keep_ltsh,
+        "keep_maxp": args.keep_maxp,
+        "keep_prep": args.keep_prep,
+        "keep_ttfa": args.keep_ttfa,
+        "keep_vdmx": args.keep_vdmx,
+        "keep_tsi": args.keep_tsi,
+    }
+
+
+def get_report_record(result: "BatchResult") -> Dict[str, Any]:
+    """Returns the report of a dehint request as a dictionary of JSON
+    serializable values."""
+    record: Dict[str, Any] = {
+        "file": result.inpath,
+        "outfile": result.outpath,
+        "ok": result.ok,
+        "error": result.error,
+        "cached": result.cached,
+    }
+    if result.report is not None:
+        record.update(result.report.to_dict())
+    elif result.cached:
+        # the edits of cache hits are not known, the file sizes are
+        record["in_size"] = os.path.getsize(result.inpath)
+        record["out_size"] = os.path.getsize(result.outpath)
+    return record
+
+
+def write_report_record(
+    report_format: str, result: "BatchResult", records: List[Dict[str, Any]]
+) -> None:
+    """Writes the report of a dehint request to standard output in the ndjson
+    report format, or adds it to the records of the json report format."""
+    record = get_report_record(result)
+    if report_format == "ndjson":
+        print(json.dumps(record), flush=True)
+    else:
+        records.append(record)
+
+
+def validate_request(inpath: str, outpath: str) -> Optional[str]:
+    """Returns an error message when a dehint request is not valid, otherwise
+    returns None."""
+    #  (1) file path request is a file
+    if not filepath_exists(inpath):
+        return f"'{inpath}' is not a valid file path."
+    #  (2) the file is a ttf, ttc, woff, or woff2 font file with TrueType outlines
+    #      (based on the file signature)
+    if not is_truetype_font(inpath):
+        return f"'{inpath}' does not appear to be a TrueType font file."
+    #   (3) confirm that out path is not the same as in path
+    #    This tool does not support writing dehinted files in place over hinted version
+    if os.path.abspath(inpath) == os.path.abspath(outpath):
+        return (
+            "You are attempting to overwrite the hinted file with the "
+            "dehinted file.  This is not supported. Please choose a different file "
+            "path for the dehinted file."
+        )
+    return None
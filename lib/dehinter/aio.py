@@ -0,0 +1,218 @@
+# Copyright 2019 Source Foundry Authors and Contributors
+
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+
+#     http://www.apache.org/licenses/LICENSE-2.0
+
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import asyncio
+import functools
+import hashlib
+import os
+import weakref
+from concurrent.futures import Executor, ProcessPoolExecutor
+from typing import Any, Dict, Optional, Tuple
+
+from dehinter.cache import options_key
+from dehinter.font import dehint_bytes
+from dehinter.sfnt import TableData
+
+# font binaries of at least this size are hashed and copied in a thread rather
+# than on the event loop
+THREAD_PREPARE_MIN_SIZE = 1 << 20
+
+# the DehintService of each event loop that dehint_async uses
+_default_services: (
+    "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, DehintService]"
+) = weakref.WeakKeyDictionary()
+
+
+class DehintServiceBusy(Exception):
+    """Raised when a DehintService already has its maximum number of pending
+    jobs."""
+
+
+class _Job(object):
+    # an in-flight dehint job and the number of requests that wait for it
+    def __init__(self, task: "asyncio.Future[bytes]") -> None:
+        self.task = task
+        self.waiters = 0
+        self.cancelled = False
+
+
+class DehintService(object):
+    """Dehints fonts in memory from asyncio code without blocking the event
+    loop.
+
+    Jobs run with dehinter.font.dehint_bytes in an executor, by default a
+    process pool with `max_workers` processes that is shut down when the
+    service is closed.  At most `max_concurrency` jobs are submitted to the
+    executor at a time and other jobs wait for a free slot.  When
+    `max_pending` is defined, new jobs beyond that number of running and
+    waiting jobs raise DehintServiceBusy so that callers can shed load.
+
+    Identical requests (the same font bytes and options) that arrive while a
+    job for them is in flight are coalesced onto that job.  A cancelled request
+    only cancels its job when no other request waits for it.  A job that was
+    cancelled after it was submitted to the executor keeps its slot and counts
+    as pending until the executor finishes it.  A service is bound to the
+    event loop that it is first used in."""
+
+    def __init__(
+        self,
+        max_workers: Optional[int] = None,
+        executor: Optional[Executor] = None,
+        max_concurrency: Optional[int] = None,
+        max_pending: Optional[int] = None,
+    ) -> None:
+        self._owns_executor = executor is None
+        self.executor: Executor = executor or ProcessPoolExecutor(max_workers)
+        self.max_concurrency = max_concurrency or max_workers or os.cpu_count() or 1
+        self.max_pending = max_pending
+        self._semaphore: Optional[asyncio.Semaphore] = None
+        self._jobs: Dict[str, _Job] = {}
+        # cancelled jobs that still run in the executor
+        self._orphaned_jobs = 0
+
+    async def __aenter__(self) -> "DehintService":
+        return self
+
+    async def __aexit__(self, *exc_info) -> None:
+        self.close()
+
+    @property
+    def pending(self) -> int:
+        """The number of jobs that are running or waiting for a free slot."""
+        return len(self._jobs) + self._orphaned_jobs
+
+    async def dehint(
+        self,
+        data: TableData,
+        flavor: Optional[str] = None,
+        fast: bool = False,
+        **kwargs,
+    ) -> bytes:
+        """Returns the dehinted font binary of a font binary.  The arguments
+        are the dehinter.font.dehint_bytes arguments."""
+        # buffers are pickled to worker processes as bytes objects
+        copy = isinstance(self.executor, ProcessPoolExecutor) and not isinstance(
+            data, bytes
+        )
+        if len(data) >= THREAD_PREPARE_MIN_SIZE:
+            key, data = await asyncio.get_running_loop().run_in_executor(
+                None, _prepare_request, data, flavor, fast, kwargs, copy
+            )
+        else:
+            key, data = _prepare_request(data, flavor, fast, kwargs, copy)
+        job = self._jobs.get(key)
+        if job is None or job.cancelled:
+            if self.max_pending is not None and self.pending >= self.max_pending:
+                raise DehintServiceBusy(
+                    f"the dehint service has {self.pending} pending jobs"
+                )
+            job = _Job(asyncio.ensure_future(self._run(data, flavor, fast, kwargs)))
+            self._jobs[key] = job
+            job.task.add_done_callback(functools.partial(self._remove_job, key, job))
+
+        job.waiters += 1
+        try:
+            return await asyncio.shield(job.task)
+        except asyncio.CancelledError:
+            if job.waiters == 1:
+                # no other request waits for the job
+                job.cancelled = True
+                job.task.cancel()
+            raise
+        finally:
+            job.waiters -= 1
+
+    async def _run(
+        self,
+        data: TableData,
+        flavor: Optional[str],
+        fast: bool,
+        kwargs: Dict[str, Any],
+    ) -> bytes:
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.max_concurrency)
+        semaphore = self._semaphore
+        await semaphore.acquire()
+        try:
+            future = asyncio.get_running_loop().run_in_executor(
+                self.executor,
+                functools.partial(
+                    dehint_bytes, data, flavor=flavor, fast=fast, **kwargs
+                ),
+            )
+        except BaseException:
+            semaphore.release()
+            raise
+        # the slot is released when the executor finishes the job, not when
+        # the job task is cancelled
+        future.add_done_callback(lambda _: semaphore.release())
+        try:
+            return await asyncio.shield(future)
+        except asyncio.CancelledError:
+            if not future.done():
+                self._orphaned_jobs += 1
+                future.add_done_callback(self._remove_orphaned_job)
+            raise
+
+    def _remove_orphaned_job(self, future: "asyncio.Future[bytes]") -> None:
+        self._orphaned_jobs -= 1
+        if not future.cancelled():
+            # the result of a cancelled job is discarded
+            future.exception()
+
+    def _remove_job(self, key: str, job: _Job, _: "asyncio.Future[bytes]") -> None:
+        if self._jobs.get(key) is job:
+            del self._jobs[key]
+
+    def close(self) -> None:
+        """Cancels the pending jobs and shuts down the executor when it was
+        created by the service."""
+        for job in list(self._jobs.values()):
+            job.cancelled = True
+            job.task.cancel()
+        if self._owns_executor:
+            self.executor.shutdown(wait=False)
+
+
+def _prepare_request(
+    data: TableData,
+    flavor: Optional[str],
+    fast: bool,
+    kwargs: Dict[str, Any],
+    copy: bool,
+) -> Tuple[str, TableData]:
+    # returns the coalescing key of a request and the font binary, copied to a
+    # bytes object when `copy` is True
+    key = hashlib.sha256(
+        hashlib.sha256(data).hexdigest().encode("ascii")
+        + options_key(kwargs, fast, flavor).encode("ascii")
+    ).hexdigest()
+    return key, bytes(data) if copy else data
+
+
+async def dehint_async(
+    data: TableData, flavor: Optional[str] = None, fast: bool = False, **kwargs
+) -> bytes:
+    """Returns the dehinted font binary of a font binary without blocking the
+    event loop.  The arguments are the dehinter.font.dehint_bytes arguments.
+
+    Jobs run in the default DehintService of the running event loop, a
+    service with a process pool of one process per CPU.  Create a
+    DehintService to control the executor, the concurrency limits, and the
+    lifetime of the worker processes."""
+    loop = asyncio.get_running_loop()
+    service = _default_services.get(loop)
+    if service is None:
+        service = _default_services[loop] = DehintService()
+    return await service.dehint(data, flavor=flavor, fast=fast, **kwargs)
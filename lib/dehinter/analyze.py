@@ -0,0 +1,172 @@
+# Copyright 2019 Source Foundry Authors and Contributors
+
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+
+#     http://www.apache.org/licenses/LICENSE-2.0
+
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import os
+import struct
+import time
+from typing import Any, Dict, List, NamedTuple, Optional, Set, Tuple, Union
+
+from dehinter.glyf import LOCA_FORMAT_SHORT, measure_glyf_instructions
+from dehinter.raw import (
+    DEHINTED_GASP_TABLE,
+    HEAD_INDEX_TO_LOC_FORMAT_OFFSET,
+    MAXP_NUM_GLYPHS_OFFSET,
+)
+from dehinter.sfnt import TABLE_RECORD, SFNTCollection, SFNTFont, open_sfnt, pad_length
+from dehinter.tables import get_removed_tables
+
+# size of a WOFF table directory entry
+WOFF_TABLE_ENTRY_SIZE = 20
+
+
+class FontSavings(NamedTuple):
+    """The projected size savings in bytes of dehinting a font file.
+
+    Table savings are the stored table sizes (the compressed sizes of WOFF
+    tables) and their table directory entries.  glyf table savings are
+    uncompressed sizes, and WOFF2 fonts are measured in their decoded sfnt
+    form."""
+
+    inpath: str
+    # removed table tag -> bytes
+    tables: Dict[str, int]
+    # glyf and loca table bytes and the number of glyphs and bytecode bytes
+    # behind them
+    glyf: int = 0
+    glyphs_edited: int = 0
+    bytecode: int = 0
+    # the gasp table is replaced, a negative value is a size increase
+    gasp: int = 0
+    in_size: int = 0
+    # milliseconds
+    elapsed_time: float = 0.0
+    error: Optional[str] = None
+
+    @property
+    def ok(self) -> bool:
+        return self.error is None
+
+    @property
+    def total(self) -> int:
+        """The projected savings of all edits."""
+        return sum(self.tables.values()) + self.glyf + self.gasp
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Returns the savings as a dictionary of JSON serializable values."""
+        return {
+            "file": self.inpath,
+            "ok": self.ok,
+            "error": self.error,
+            "tables": dict(self.tables),
+            "glyf": self.glyf,
+            "glyphs_edited": self.glyphs_edited,
+            "bytecode": self.bytecode,
+            "gasp": self.gasp,
+            "total": self.total,
+            "in_size": self.in_size,
+            "projected_size": self.in_size - self.total,
+            "elapsed_ms": round(self.elapsed_time, 3),
+        }
+
+
+def analyze_font_file(
+    inpath: Union[str, "os.PathLike[str]"], options: Dict[str, bool]
+) -> FontSavings:
+    """Returns the projected savings of dehinting a font file with the dehint
+    keep_* `options`.  Only the table directory and the glyph record headers
+    are read and no font is written.  Errors are returned in the FontSavings
+    rather than raised."""
+    inpath = os.fspath(inpath)
+    start = time.perf_counter()
+    try:
+        with open_sfnt(inpath) as sfnt:
+            fonts = sfnt.fonts if isinstance(sfnt, SFNTCollection) else [sfnt]
+            savings = analyze_sfnt_fonts(fonts, options)
+    except Exception as e:
+        return FontSavings(
+            inpath, {}, error=f"Unable to read font binary with '{inpath}' -> {str(e)}"
+        )
+    return savings._replace(
+        inpath=inpath,
+        in_size=os.path.getsize(inpath),
+        elapsed_time=(time.perf_counter() - start) * 1000,
+    )
+
+
+def analyze_sfnt_fonts(fonts: List[SFNTFont], options: Dict[str, bool]) -> FontSavings:
+    """Returns the projected savings of dehinting the fonts of a font file.
+    Tables that are shared between the fonts of a collection are counted
+    once."""
+    tables: Dict[str, int] = {}
+    glyf = glyphs_edited = bytecode = gasp = 0
+    # the source ranges of the tables that were counted
+    counted: Set[Optional[Tuple[int, int]]] = set()
+    gasp_written = False
+    for font in fonts:
+        entry_size = (
+            WOFF_TABLE_ENTRY_SIZE if font.flavor == "woff" else TABLE_RECORD.size
+        )
+        for spec in get_removed_tables(font.keys(), options):
+            source = font.source_range(spec.tag)
+            size = entry_size
+            if source not in counted:
+                counted.add(source)
+                size += pad_length(len(font[spec.tag]) if source is None else source[1])
+            tables[spec.tag] = tables.get(spec.tag, 0) + size
+
+        if not options.get("keep_glyf", False) and "glyf" in font:
+            source = font.source_range("glyf")
+            if source is None or source not in counted:
+                counted.add(source)
+                font_glyphs, font_bytecode, font_glyf, font_loca = _measure_glyf(font)
+                glyphs_edited += font_glyphs
+                bytecode += font_bytecode
+                # the tables are padded to four bytes
+                glyf_length = len(font["glyf"])
+                glyf += pad_length(glyf_length) - pad_length(glyf_length - font_glyf)
+                glyf += pad_length(len(font["loca"])) - pad_length(font_loca)
+
+        if not options.get("keep_gasp", False):
+            if "gasp" in font:
+                source = font.source_range("gasp")
+                if source is None or source not in counted:
+                    counted.add(source)
+                    gasp += pad_length(
+                        len(font["gasp"]) if source is None else source[1]
+                    )
+            else:
+                gasp -= entry_size
+            # the dehinted gasp tables have the same data and are written once
+            if not gasp_written:
+                gasp_written = True
+                gasp -= pad_length(len(DEHINTED_GASP_TABLE))
+    return FontSavings("", tables, glyf, glyphs_edited, bytecode, gasp)
+
+
+def _measure_glyf(font: SFNTFont) -> Tuple[int, int, int, int]:
+    # returns the number of edited glyphs, the number of removed bytecode
+    # bytes, the number of removed glyf table bytes, and the new loca length
+    (num_glyphs,) = struct.unpack_from(">H", font["maxp"], MAXP_NUM_GLYPHS_OFFSET)
+    (index_to_loc_format,) = struct.unpack_from(
+        ">h", font["head"], HEAD_INDEX_TO_LOC_FORMAT_OFFSET
+    )
+    glyph_number, bytecode, removed, new_index_to_loc_format = (
+        measure_glyf_instructions(
+            font["glyf"], font["loca"], index_to_loc_format, num_glyphs
+        )
+    )
+    if new_index_to_loc_format == index_to_loc_format:
+        return glyph_number, bytecode, removed, len(font["loca"])
+    offset_size = 2 if new_index_to_loc_format == LOCA_FORMAT_SHORT else 4
+    return glyph_number, bytecode, removed, (num_glyphs + 1) * offset_size
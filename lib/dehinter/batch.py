@@ -0,0 +1,444 @@
+# Copyright 2019 Source Foundry Authors and Contributors
+
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+
+#     http://www.apache.org/licenses/LICENSE-2.0
+
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import os
+import sys
+from contextlib import ExitStack
+from typing import Any, Dict, Iterable, Iterator, List, NamedTuple, Optional, Tuple
+
+from dehinter.cache import DehintCache
+from dehinter.font import (
+    dehint,
+    dehint_fileobj,
+    open_font,
+    save_font,
+    set_font_flavor,
+)
+from dehinter.paths import STDIO_PATH
+from dehinter.profiling import PhaseTiming, Profiler, profile_phase
+from dehinter.raw import dehint_sfnt
+from dehinter.report import DehintReport
+from dehinter.sfnt import open_sfnt
+from dehinter.system import atomic_write, fsync_directory
+
+
+class BatchResult(NamedTuple):
+    """The outcome of a single font file dehint request."""
+
+    inpath: str
+    outpath: str
+    error: Optional[str] = None
+    # True when the dehinted font was copied from a DehintCache entry
+    cached: bool = False
+    # the resource use of each phase in profiled requests
+    timings: Tuple[PhaseTiming, ...] = ()
+    # the edits and file sizes of dehinted fonts that were not cache hits
+    report: Optional[DehintReport] = None
+
+    @property
+    def ok(self) -> bool:
+        return self.error is None
+
+
+def dehint_font_file(
+    inpath: str,
+    outpath: str,
+    options: Dict[str, bool],
+    verbose: bool = False,
+    fast: bool = False,
+    flavor: Optional[str] = None,
+    cache: Optional[DehintCache] = None,
+    profile: bool = False,
+    glyf_jobs: int = 1,
+    fsync: bool = False,
+    recalc: bool = False,
+    profile_memory: bool = False,
+) -> BatchResult:
+    """Loads, dehints, and saves a single font file.  Errors are returned in the
+    BatchResult rather than raised so that one bad file does not stop a batch.
+    The `fast` option uses the binary table surgery routines in dehinter.raw
+    instead of a fontTools decompile and compile of the font.  The dehinted
+    font is saved in the in file format unless a `flavor` is requested.
+
+    When a `cache` is defined, cache hits are copied to outpath without a font
+    parse and new dehinted fonts are stored in the cache.  When `profile` is
+    True, the resource use of each phase is returned in BatchResult.timings.
+    The peak memory allocation of the phases is only traced with
+    `profile_memory`.
+    With the `fast` option, the glyf tables of large fonts are stripped in
+    `glyf_jobs` worker processes.
+
+    The dehinted font is written to a temporary file in the out file directory
+    and renamed to outpath, so that an interrupted dehint never leaves a
+    partial font at outpath.  With `fsync`, the font is flushed to storage
+    before the rename; the out file directory is not flushed.
+
+    Dehinting does not edit glyph outlines, so bounding boxes are only
+    recalculated with `recalc`."""
+    if not profile:
+        return _dehint_font_file_cached(
+            inpath,
+            outpath,
+            options,
+            verbose,
+            fast,
+            flavor,
+            cache,
+            None,
+            glyf_jobs,
+            fsync,
+            recalc,
+        )
+    with Profiler(trace_memory=profile_memory) as profiler:
+        result = _dehint_font_file_cached(
+            inpath,
+            outpath,
+            options,
+            verbose,
+            fast,
+            flavor,
+            cache,
+            profiler,
+            glyf_jobs,
+            fsync,
+            recalc,
+        )
+    return result._replace(timings=tuple(profiler.timings))
+
+
+def _dehint_font_file_cached(
+    inpath: str,
+    outpath: str,
+    options: Dict[str, bool],
+    verbose: bool,
+    fast: bool,
+    flavor: Optional[str],
+    cache: Optional[DehintCache],
+    profiler: Optional[Profiler],
+    glyf_jobs: int,
+    fsync: bool,
+    recalc: bool,
+) -> BatchResult:
+    if cache is None:
+        return _dehint_font_file(
+            inpath,
+            outpath,
+            options,
+            verbose,
+            fast,
+            flavor,
+            profiler,
+            glyf_jobs,
+            fsync,
+            recalc,
+        )
+
+    try:
+        with profile_phase(profiler, "cache_fetch"):
+            key = cache.key(inpath, options, fast=fast, flavor=flavor, recalc=recalc)
+            cached = cache.fetch(key, outpath, fsync)
+        if cached:
+            return BatchResult(inpath, outpath, cached=True)
+    except Exception as e:
+        return BatchResult(
+            inpath, outpath, f"Unable to read the dehint cache -> {str(e)}"
+        )
+    result = _dehint_font_file(
+        inpath,
+        outpath,
+        options,
+        verbose,
+        fast,
+        flavor,
+        profiler,
+        glyf_jobs,
+        fsync,
+        recalc,
+    )
+    if result.ok:
+        try:
+            with profile_phase(profiler, "cache_store"):
+                cache.store(key, outpath)
+        except Exception as e:
+            return BatchResult(
+                inpath, outpath, f"Unable to write the dehint cache -> {str(e)}"
+            )
+    return result
+
+
+def _dehint_font_file(
+    inpath: str,
+    outpath: str,
+    options: Dict[str, bool],
+    verbose: bool,
+    fast: bool,
+    flavor: Optional[str],
+    profiler: Optional[Profiler],
+    glyf_jobs: int,
+    fsync: bool,
+    recalc: bool,
+) -> BatchResult:
+    if fast:
+        return _dehint_font_file_raw(
+            inpath,
+            outpath,
+            options,
+            verbose,
+            flavor,
+            profiler,
+            glyf_jobs,
+            fsync,
+            recalc,
+        )
+
+    with ExitStack() as stack:
+        try:
+            with profile_phase(profiler, "load"):
+                tt = stack.enter_context(open_font(inpath, recalc))
+        except Exception as e:
+            return BatchResult(
+                inpath,
+                outpath,
+                f"Unable to create font object with '{inpath}' -> {str(e)}",
+            )
+
+        try:
+            report = dehint(tt, verbose=verbose, profiler=profiler, **options)
+        except Exception as e:
+            return BatchResult(
+                inpath, outpath, f"Unable to dehint '{inpath}' -> {str(e)}"
+            )
+
+        try:
+            if flavor is not None:
+                set_font_flavor(tt, flavor)
+            with profile_phase(profiler, "save"):
+                save_font(tt, outpath, fsync)
+        except Exception as e:
+            return BatchResult(
+                inpath, outpath, f"Unable to save dehinted font file: {str(e)}"
+            )
+    return BatchResult(inpath, outpath, report=_add_file_sizes(report, inpath, outpath))
+
+
+def _dehint_font_file_raw(
+    inpath: str,
+    outpath: str,
+    options: Dict[str, bool],
+    verbose: bool,
+    flavor: Optional[str],
+    profiler: Optional[Profiler],
+    glyf_jobs: int,
+    fsync: bool,
+    recalc: bool,
+) -> BatchResult:
+    with ExitStack() as stack:
+        try:
+            with profile_phase(profiler, "load"):
+                sfnt = stack.enter_context(open_sfnt(inpath))
+        except Exception as e:
+            return BatchResult(
+                inpath,
+                outpath,
+                f"Unable to read font binary with '{inpath}' -> {str(e)}",
+            )
+
+        try:
+            report = dehint_sfnt(
+                sfnt,
+                verbose=verbose,
+                profiler=profiler,
+                glyf_jobs=glyf_jobs,
+                recalc_bboxes=recalc,
+                **options,
+            )
+        except Exception as e:
+            return BatchResult(
+                inpath, outpath, f"Unable to dehint '{inpath}' -> {str(e)}"
+            )
+
+        try:
+            if flavor is not None:
+                set_font_flavor(sfnt, flavor)
+            with profile_phase(profiler, "save"):
+                sfnt.save(outpath, fsync)
+        except Exception as e:
+            return BatchResult(
+                inpath, outpath, f"Unable to save dehinted font file: {str(e)}"
+            )
+    return BatchResult(inpath, outpath, report=_add_file_sizes(report, inpath, outpath))
+
+
+def dehint_font_stream(
+    inpath: str,
+    outpath: str,
+    options: Dict[str, bool],
+    verbose: bool = False,
+    fast: bool = False,
+    flavor: Optional[str] = None,
+    glyf_jobs: int = 1,
+    fsync: bool = False,
+    recalc: bool = False,
+) -> BatchResult:
+    """Dehints a single font that is read from standard input when `inpath` is
+    STDIO_PATH and writes it to standard output when `outpath` is STDIO_PATH.
+    Standard input does not need to be seekable, the font is read into memory
+    and no temporary files are written for it.  Out files are written as in
+    dehint_font_file.  Errors are returned in the BatchResult rather than
+    raised."""
+    kwargs: Dict[str, Any] = dict(options, verbose=verbose)
+    if fast:
+        kwargs["glyf_jobs"] = glyf_jobs
+    try:
+        with ExitStack() as stack:
+            if inpath == STDIO_PATH:
+                infile = sys.stdin.buffer
+            else:
+                infile = stack.enter_context(open(inpath, "rb"))
+            if outpath == STDIO_PATH:
+                outfile = sys.stdout.buffer
+            else:
+                outfile = stack.enter_context(atomic_write(outpath, fsync))
+            report = dehint_fileobj(
+                infile, outfile, flavor=flavor, fast=fast, recalc=recalc, **kwargs
+            )
+            outfile.flush()
+    except Exception as e:
+        return BatchResult(inpath, outpath, f"Unable to dehint '{inpath}' -> {str(e)}")
+    return BatchResult(inpath, outpath, report=report)
+
+
+def _add_file_sizes(report: DehintReport, inpath: str, outpath: str) -> DehintReport:
+    return report._replace(
+        in_size=os.path.getsize(inpath), out_size=os.path.getsize(outpath)
+    )
+
+
+def dehint_font_files(
+    requests: List[Tuple[str, str]],
+    options: Dict[str, bool],
+    jobs: int = 1,
+    verbose: bool = False,
+    fast: bool = False,
+    flavor: Optional[str] = None,
+    cache: Optional[DehintCache] = None,
+    profile: bool = False,
+    glyf_jobs: int = 1,
+    fsync: bool = False,
+    recalc: bool = False,
+    profile_memory: bool = False,
+) -> Iterator[BatchResult]:
+    """Dehints (in path, out path) font file requests across a pool of `jobs`
+    worker processes.  Results are yielded in the order of the requests.
+    Verbose dehint reporting is only available when requests are processed
+    serially in the calling process.  The `glyf_jobs` glyf table worker
+    processes are only used when requests are processed serially, the font
+    file workers strip glyf tables in a single process.
+
+    With `fsync`, each dehinted font is flushed to storage before it is
+    renamed to its out file path, and each out file directory is flushed once
+    after the last request rather than once per font."""
+    results = _dehint_font_files(
+        requests,
+        options,
+        jobs,
+        verbose,
+        fast,
+        flavor,
+        cache,
+        profile,
+        glyf_jobs,
+        fsync,
+        recalc,
+        profile_memory,
+    )
+    return fsync_out_directories(results) if fsync else results
+
+
+def fsync_out_directories(results: Iterable[BatchResult]) -> Iterator[BatchResult]:
+    """Yields the results of a batch and flushes the directory of the out files
+    of the successful requests to storage once after the last result."""
+    out_dirs: Dict[str, None] = {}
+    for result in results:
+        if result.ok:
+            out_dirs[os.path.dirname(os.path.abspath(result.outpath))] = None
+        yield result
+    for dirpath in out_dirs:
+        fsync_directory(dirpath)
+
+
+def _dehint_font_files(
+    requests: List[Tuple[str, str]],
+    options: Dict[str, bool],
+    jobs: int,
+    verbose: bool,
+    fast: bool,
+    flavor: Optional[str],
+    cache: Optional[DehintCache],
+    profile: bool,
+    glyf_jobs: int,
+    fsync: bool,
+    recalc: bool,
+    profile_memory: bool,
+) -> Iterator[BatchResult]:
+    if jobs <= 1 or len(requests) <= 1:
+        for inpath, outpath in requests:
+            yield dehint_font_file(
+                inpath,
+                outpath,
+                options,
+                verbose=verbose,
+                fast=fast,
+                flavor=flavor,
+                cache=cache,
+                profile=profile,
+                glyf_jobs=glyf_jobs,
+                fsync=fsync,
+                recalc=recalc,
+                profile_memory=profile_memory,
+            )
+        return
+
+    # the process pool machinery is only imported for parallel batches
+    from concurrent.futures import ProcessPoolExecutor
+
+    max_workers = min(jobs, len(requests))
+    with ProcessPoolExecutor(max_workers=max_workers) as executor:
+        futures = [
+            executor.submit(
+                dehint_font_file,
+                inpath,
+                outpath,
+                options,
+                False,
+                fast,
+                flavor,
+                cache,
+                profile,
+                1,
+                fsync,
+                recalc,
+                profile_memory,
+            )
+            for inpath, outpath in requests
+        ]
+        for (inpath, outpath), future in zip(requests, futures):
+            try:
+                result = future.result()
+            except Exception as e:
+                # e.g. BrokenProcessPool when a worker process was killed
+                result = BatchResult(
+                    inpath, outpath, f"Unable to dehint '{inpath}' -> {str(e)}"
+                )
+            yield result
@@ -0,0 +1,200 @@
+# Copyright 2019 Source Foundry Authors and Contributors
+
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+
+#     http://www.apache.org/licenses/LICENSE-2.0
+
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import hashlib
+import inspect
+import json
+import os
+import re
+import shutil
+import tempfile
+from typing import Dict, List, NamedTuple, Optional, Tuple, Union
+
+from dehinter import __version__
+from dehinter.font import dehint
+from dehinter.system import atomic_write
+
+# number of bytes that are read at a time during input file hashes
+HASH_CHUNK_SIZE = 1 << 20
+
+# the full set of dehint() keep_* options and their default values
+DEHINT_OPTION_DEFAULTS: Dict[str, bool] = {
+    name: parameter.default
+    for name, parameter in inspect.signature(dehint).parameters.items()
+    if name.startswith("keep_")
+}
+
+# file name prefix of entries that are being written
+TEMP_FILE_PREFIX = "tmp-"
+
+SIZE_UNITS = {"": 1, "K": 1 << 10, "M": 1 << 20, "G": 1 << 30}
+
+
+class CacheStats(NamedTuple):
+    """The number of entries and the total size in bytes of a cache."""
+
+    entries: int
+    size: int
+
+
+class DehintCache(object):
+    """A content-addressed on-disk cache of dehinted font files.
+
+    Entries are keyed by a hash of the in file bytes, the full set of dehint
+    keep_* options, the output format, and the dehinter and fontTools versions.
+    Cache hits are copied to the out file path without a font parse.  The
+    modification time of an entry is updated on each hit and is used for
+    least recently used eviction."""
+
+    def __init__(self, cache_dir: Union[str, "os.PathLike[str]"]) -> None:
+        self.cache_dir = os.fspath(cache_dir)
+
+    def key(
+        self,
+        inpath: Union[str, "os.PathLike[str]"],
+        options: Dict[str, bool],
+        fast: bool = False,
+        flavor: Optional[str] = None,
+        recalc: bool = False,
+    ) -> str:
+        """Returns the cache key of a dehint request."""
+        request_key = options_key(options, fast, flavor, recalc)
+        return hashlib.sha256(
+            (hash_file(inpath) + request_key).encode("ascii")
+        ).hexdigest()
+
+    def entry_path(self, key: str) -> str:
+        """Returns the file path of a cache entry."""
+        return os.path.join(self.cache_dir, key[:2], key)
+
+    def fetch(
+        self, key: str, outpath: Union[str, "os.PathLike[str]"], fsync: bool = False
+    ) -> bool:
+        """Copies the cache entry of a key to outpath with atomic_write.
+        Returns False when the key is not in the cache."""
+        entry_path = self.entry_path(key)
+        try:
+            with open(entry_path, "rb") as entry:
+                with atomic_write(outpath, fsync) as f:
+                    shutil.copyfileobj(entry, f)
+            os.utime(entry_path)
+        except FileNotFoundError:
+            # the entry was not written or was evicted by another process
+            return False
+        return True
+
+    def store(self, key: str, filepath: Union[str, "os.PathLike[str]"]) -> None:
+        """Copies a dehinted font file into the cache.  The entry is written to
+        a temporary file and renamed so that concurrent readers never see a
+        partial entry."""
+        entry_path = self.entry_path(key)
+        os.makedirs(os.path.dirname(entry_path), exist_ok=True)
+        fd, temp_path = tempfile.mkstemp(
+            prefix=TEMP_FILE_PREFIX, dir=os.path.dirname(entry_path)
+        )
+        os.close(fd)
+        try:
+            shutil.copyfile(filepath, temp_path)
+            os.replace(temp_path, entry_path)
+        except BaseException:
+            os.remove(temp_path)
+            raise
+
+    def entries(self) -> List[Tuple[str, float, int]]:
+        """Returns the (file path, modification time, size) of the cache
+        entries from the least to the most recently used entry."""
+        entries: List[Tuple[str, float, int]] = []
+        if not os.path.isdir(self.cache_dir):
+            return entries
+        for dir_entry in os.scandir(self.cache_dir):
+            if not dir_entry.is_dir():
+                continue
+            for file_entry in os.scandir(dir_entry.path):
+                # skip entries that are still being written
+                if file_entry.name.startswith(TEMP_FILE_PREFIX):
+                    continue
+                if file_entry.is_file():
+                    stat = file_entry.stat()
+                    entries.append((file_entry.path, stat.st_mtime, stat.st_size))
+        entries.sort(key=lambda entry: entry[1])
+        return entries
+
+    def stats(self) -> CacheStats:
+        """Returns the number of entries and the total size of the cache."""
+        entries = self.entries()
+        return CacheStats(len(entries), sum(size for _, _, size in entries))
+
+    def prune(self, max_size: int = 0) -> CacheStats:
+        """Evicts the least recently used entries until the total size of the
+        cache is not larger than max_size bytes.  Returns the number of evicted
+        entries and the number of bytes that were removed."""
+        entries = self.entries()
+        size = sum(entry_size for _, _, entry_size in entries)
+        removed_entries = removed_size = 0
+        for entry_path, _, entry_size in entries:
+            if size <= max_size:
+                break
+            try:
+                os.remove(entry_path)
+            except FileNotFoundError:
+                pass
+            size -= entry_size
+            removed_entries += 1
+            removed_size += entry_size
+        return CacheStats(removed_entries, removed_size)
+
+
+def hash_file(filepath: Union[str, "os.PathLike[str]"]) -> str:
+    """Returns the SHA-256 hex digest of the bytes in a file."""
+    file_hash = hashlib.sha256()
+    with open(filepath, "rb") as f:
+        for chunk in iter(lambda: f.read(HASH_CHUNK_SIZE), b""):
+            file_hash.update(chunk)
+    return file_hash.hexdigest()
+
+
+def options_key(
+    options: Dict[str, bool],
+    fast: bool = False,
+    flavor: Optional[str] = None,
+    recalc: bool = False,
+) -> str:
+    """Returns a SHA-256 hex digest of everything other than the in file bytes
+    that defines a dehinted font: the full set of dehint keep_* options, the
+    dehint routine, the output format, bounding box recalculation, and the
+    dehinter and fontTools versions."""
+    import fontTools  # type: ignore
+
+    keep_options = dict(DEHINT_OPTION_DEFAULTS)
+    keep_options.update(options)
+    request = {
+        "options": keep_options,
+        "fast": fast,
+        "flavor": flavor,
+        "recalc": recalc,
+        "dehinter": __version__,
+        "fontTools": fontTools.version,
+    }
+    return hashlib.sha256(
+        json.dumps(request, sort_keys=True).encode("utf-8")
+    ).hexdigest()
+
+
+def parse_size(size: str) -> int:
+    """Returns the number of bytes in a size string such as 1048576, 512K,
+    100M, or 2G."""
+    match = re.fullmatch(r"\s*(\d+)\s*([KMG]?)B?\s*", size, re.IGNORECASE)
+    if match is None:
+        raise ValueError(f"invalid size '{size}'")
+    return int(match.group(1)) * SIZE_UNITS[match.group(2).upper()]
@@ -13,26 +13,46 @@
 # limitations under the License.
 
 import array
+import io
+import mmap
 import os
-import pprint
-import sys
-from typing import Union
-
-from fontTools import ttLib  # type: ignore
+from contextlib import ExitStack, contextmanager
+from typing import Any, BinaryIO, Dict, Iterator, List, Optional, Tuple, Union
 
 from dehinter.bitops import clear_bit_k, is_bit_k_set
+from dehinter.profiling import Profiler, profile_phase
+from dehinter.raw import dehint_sfnt
+from dehinter.report import DehintReport, table_delta
+from dehinter.sfnt import TableData, read_sfnt, write_chunks
+from dehinter.system import atomic_write
+from dehinter.tables import HEAD_FLAG_BIT_4_TABLES, get_removed_tables
+
+TRUETYPE_FILE_SIGNATURES = (b"\x00\x01\x00\x00", b"\x74\x72\x75\x65")
+TTC_FILE_SIGNATURE = b"ttcf"
+WOFF_FILE_SIGNATURES = (b"wOFF", b"wOF2")
+FONT_FILE_SIGNATURES = (
+    TRUETYPE_FILE_SIGNATURES + (TTC_FILE_SIGNATURE,) + WOFF_FILE_SIGNATURES
+)
+
+# font binary formats that dehinted fonts can be saved in
+FLAVOR_FILE_EXTENSIONS = {"ttf": ".ttf", "woff": ".woff", "woff2": ".woff2"}
+
+# maxp table instruction set fields that are set to zero
+MAXP_DEHINTED_FIELDS = (
+    "maxZones",
+    "maxTwilightPoints",
+    "maxStorage",
+    "maxFunctionDefs",
+    "maxStackElements",
+    "maxSizeOfInstructions",
+)
 
-# instantiate pretty printer
-pp = pprint.PrettyPrinter(indent=4)
 
+def _pformat(value: Any) -> str:
+    # pprint is only imported for verbose output
+    import pprint
 
-def _report_actions(table, has_table):
-    if not has_table:
-        print(f"[-] Removed {table} table")
-    else:  # pragma: no cover
-        sys.stderr.write(
-            f"[!] Error: failed to remove {table} table from font{os.linesep}"
-        )
+    return pprint.PrettyPrinter(indent=4).pformat(value)
 
 
 # ========================================================
@@ -52,60 +72,85 @@ def dehint(
     keep_prep=False,
     keep_ttfa=False,
     keep_vdmx=False,
+    keep_tsi=False,
     verbose=True,
-):
-
-    if is_variable_font(tt) and not keep_cvar:
-        if has_cvar_table(tt):
-            remove_cvar_table(tt)
-            if verbose:
-                _report_actions("cvar", has_cvar_table(tt))
-
-    if not keep_cvt:
-        if has_cvt_table(tt):
-            remove_cvt_table(tt)
-            if verbose:
-                _report_actions("cvt", has_cvt_table(tt))
-
-    if not keep_fpgm:
-        if has_fpgm_table(tt):
-            remove_fpgm_table(tt)
-            if verbose:
-                _report_actions("fpgm", has_fpgm_table(tt))
-
-    if not keep_hdmx:
-        if has_hdmx_table(tt):
-            remove_hdmx_table(tt)
-            if verbose:
-                _report_actions("hdmx", has_hdmx_table(tt))
-
-    if not keep_ltsh:
-        if has_ltsh_table(tt):
-            remove_ltsh_table(tt)
+    profiler=None,
+) -> DehintReport:
+    """Dehints a fontTools.ttLib.TTFont or TTCollection object in place and
+    returns a dehinter.report.DehintReport of the edits.  Progress is printed
+    to standard output when `verbose` is True."""
+    from fontTools import ttLib  # type: ignore
+
+    if isinstance(tt, ttLib.TTCollection):
+        # glyf and loca tables that are shared between fonts in a collection
+        # are dehinted once and the edited table objects are reused by the
+        # fonts that share them.  Shared tables are written once when the
+        # collection is saved.
+        shared_glyf_tables: dict = {}
+        font_reports: List[DehintReport] = []
+        for font_number, font in enumerate(tt.fonts):
             if verbose:
-                _report_actions("LTSH", has_ltsh_table(tt))
-
-    if not keep_prep:
-        if has_prep_table(tt):
-            remove_prep_table(tt)
-            if verbose:
-                _report_actions("prep", has_prep_table(tt))
-
-    if not keep_ttfa:
-        if has_ttfa_table(tt):
-            remove_ttfa_table(tt)
-            if verbose:
-                _report_actions("ttfa", has_ttfa_table(tt))
-
-    if not keep_vdmx:
-        if has_vdmx_table(tt):
-            remove_vdmx_table(tt)
-            if verbose:
-                _report_actions("VDMX", has_vdmx_table(tt))
+                print(f"[*] Font {font_number + 1} of {len(tt.fonts)} in collection")
+            shared_key = None
+            if not keep_glyf and "glyf" in font and "loca" in font:
+                shared_key = (
+                    font.reader.tables["glyf"].offset,
+                    font.reader.tables["loca"].offset,
+                    tuple(font.getGlyphOrder()),
+                )
+                if shared_key in shared_glyf_tables:
+                    font.tables["glyf"], font.tables["loca"] = shared_glyf_tables[
+                        shared_key
+                    ]
+            font_reports.append(
+                dehint(
+                    font,
+                    keep_cvar=keep_cvar,
+                    keep_cvt=keep_cvt,
+                    keep_fpgm=keep_fpgm,
+                    keep_gasp=keep_gasp,
+                    keep_glyf=keep_glyf,
+                    keep_hdmx=keep_hdmx,
+                    keep_head=keep_head,
+                    keep_ltsh=keep_ltsh,
+                    keep_maxp=keep_maxp,
+                    keep_prep=keep_prep,
+                    keep_ttfa=keep_ttfa,
+                    keep_vdmx=keep_vdmx,
+                    keep_tsi=keep_tsi,
+                    verbose=verbose,
+                    profiler=profiler,
+                )
+            )
+            if shared_key is not None:
+                shared_glyf_tables.setdefault(shared_key, (font["glyf"], font["loca"]))
+        return DehintReport([], fonts=font_reports)
+
+    #  (1) OpenType table removal
+    keep_options = {
+        "keep_cvar": keep_cvar,
+        "keep_cvt": keep_cvt,
+        "keep_fpgm": keep_fpgm,
+        "keep_hdmx": keep_hdmx,
+        "keep_ltsh": keep_ltsh,
+        "keep_prep": keep_prep,
+        "keep_ttfa": keep_ttfa,
+        "keep_vdmx": keep_vdmx,
+        "keep_tsi": keep_tsi,
+    }
+    removed_tables: List[str] = []
+    for spec in get_removed_tables(tt.keys(), keep_options):
+        with profile_phase(profiler, spec.phase, spec.tag):
+            del tt[spec.tag]
+        removed_tables.append(spec.tag)
+        if verbose:
+            print(f"[-] Removed {spec.label} table")
 
     #  (2) Remove glyf table instruction set bytecode
+    number_glyfs_edited = bytecode_removed = 0
     if not keep_glyf:
-        number_glyfs_edited = remove_glyf_instructions(tt)
+        with profile_phase(profiler, "remove_glyf_instructions", "glyf"):
+            number_glyfs_edited, bytecode_removed = _remove_glyf_instructions(tt)
         if number_glyfs_edited > 0:
             if verbose:
                 print(
@@ -114,25 +159,295 @@ def dehint(
                 )
 
     #  (3) Edit gasp table
+    gasp_delta = None
     if not keep_gasp:
-        if update_gasp_table(tt):
-            gasp_string = pp.pformat(tt["gasp"].__dict__)
+        with profile_phase(profiler, "update_gasp_table", "gasp"):
+            old_gasp = _gasp_fields(tt)
+            gasp_updated = update_gasp_table(tt)
+            gasp_delta = table_delta(old_gasp, _gasp_fields(tt))
+        if gasp_updated:
             if verbose:
+                gasp_string = _pformat(tt["gasp"].__dict__)
                 print(f"[Δ] New gasp table values:{os.linesep}    {gasp_string}")
 
     #  (4) Edit maxp table
+    maxp_delta = None
     if not keep_maxp:
-        if update_maxp_table(tt):
-            maxp_string = pp.pformat(tt["maxp"].__dict__)
+        with profile_phase(profiler, "update_maxp_table", "maxp"):
+            old_maxp = _maxp_fields(tt)
+            maxp_updated = update_maxp_table(tt)
+            maxp_delta = table_delta(old_maxp, _maxp_fields(tt))
+        if maxp_updated:
             if verbose:
+                maxp_string = _pformat(tt["maxp"].__dict__)
                 print(f"[Δ] New maxp table values:{os.linesep}    {maxp_string}")
 
     #  (5) Edit head table flags to clear bit 4
+    head_delta = None
     if not keep_head:
-        if update_head_table_flags(tt):
+        with profile_phase(profiler, "update_head_table_flags", "head"):
+            old_flags = tt["head"].flags
+            head_updated = update_head_table_flags(tt)
+            head_delta = table_delta({"flags": old_flags}, {"flags": tt["head"].flags})
+        if head_updated:
             if verbose:
                 print("[Δ] Cleared bit 4 in head table flags")
 
+    return DehintReport(
+        removed_tables,
+        glyphs_edited=number_glyfs_edited,
+        bytecode_removed=bytecode_removed,
+        gasp=gasp_delta,
+        maxp=maxp_delta,
+        head=head_delta,
+    )
+
+
+def _gasp_fields(tt) -> Dict[str, Any]:
+    if "gasp" not in tt:
+        return {"gaspRange": None}
+    return {"gaspRange": dict(tt["gasp"].gaspRange)}
+
+
+def _maxp_fields(tt) -> Dict[str, Any]:
+    return {field: getattr(tt["maxp"], field, None) for field in MAXP_DEHINTED_FIELDS}
+
+
+# ========================================================
+# File I/O
+# ========================================================
+@contextmanager
+def open_font(
+    filepath: Union[str, "os.PathLike[str]"], recalc: bool = False
+) -> Iterator:
+    """Opens a font file as a fontTools.ttLib.TTFont object in lazy loading mode
+    over a read-only memory map of the file.  Tables are only decompiled when
+    they are accessed and tables that are not accessed are written as the raw
+    bytes from the memory map when the font is saved.
+
+    Dehinting does not edit glyph outlines, so the glyph and head table bounding
+    boxes and the maxp table outline fields cannot change and are only
+    recalculated when the font is saved with `recalc`.  The head table modified
+    timestamp is always updated.
+
+    TrueType Collection files are opened as a fontTools.ttLib.TTCollection
+    object.  WOFF and WOFF2 files are opened as a TTFont with the matching
+    flavor and are saved in the same format unless the flavor is changed."""
+    with open(filepath, "rb") as f:
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            tt = _load_font(mm, recalc)
+            try:
+                yield tt
+            finally:
+                tt.close()
+
+
+def _load_font(reader, recalc: bool):
+    # reader is a seekable binary file object at the start of the font
+    from fontTools import ttLib  # type: ignore
+
+    signature = reader.read(4)
+    reader.seek(0)
+    font_class = ttLib.TTCollection if signature == TTC_FILE_SIGNATURE else ttLib.TTFont
+    return font_class(reader, lazy=True, recalcBBoxes=recalc)
+
+
+def save_font(
+    tt, filepath: Union[str, "os.PathLike[str]"], fsync: bool = False
+) -> None:
+    """Saves a fontTools.ttLib.TTFont object to a file path.  This supports
+    fonts that were opened with open_font.  The font is written to a temporary
+    file that is renamed to the file path, `fsync` flushes it to storage
+    before the rename."""
+    # lazy TTFont objects only support file path writes when the reader
+    # file has a name attribute, write through a file object instead
+    with atomic_write(filepath, fsync) as f:
+        tt.save(f)
+
+
+def set_font_flavor(tt, flavor: str) -> None:
+    """Defines the binary format that a font is saved in: "ttf", "woff", or
+    "woff2".  This supports fontTools.ttLib.TTFont and dehinter.sfnt.SFNTFont
+    objects.  Font collections only support the "ttf" format."""
+    if flavor not in FLAVOR_FILE_EXTENSIONS:
+        raise ValueError(f"unsupported font flavor '{flavor}'")
+    if not hasattr(tt, "flavor"):
+        if flavor == "ttf":
+            return
+        raise ValueError(f"the {flavor} format does not support font collections")
+    new_flavor = None if flavor == "ttf" else flavor
+    if new_flavor != tt.flavor and hasattr(tt, "flavorData"):
+        # WOFF and WOFF2 flavor data are not interchangeable
+        tt.flavorData = None
+    tt.flavor = new_flavor
+
+
+def dehint_file(
+    inpath: Union[str, "os.PathLike[str]"],
+    outpath: Union[str, "os.PathLike[str]"],
+    flavor: Optional[str] = None,
+    profiler: Optional[Profiler] = None,
+    recalc: bool = False,
+    **kwargs,
+) -> DehintReport:
+    """Dehints the font at inpath and saves the dehinted font to outpath.  The
+    keyword arguments are the dehint function keyword arguments.  Only the
+    tables that are edited during dehinting are decompiled.
+
+    The dehinted font is saved in the format of the font at inpath unless a
+    "ttf", "woff", or "woff2" flavor is requested.  A `profiler` records the
+    load and save phases in addition to the dehint phases.  Bounding boxes are
+    only recalculated with `recalc`, see open_font.
+    Returns the DehintReport of the edits with the in file and out file
+    sizes."""
+    with ExitStack() as stack:
+        with profile_phase(profiler, "load"):
+            tt = stack.enter_context(open_font(inpath, recalc))
+        report = dehint(tt, profiler=profiler, **kwargs)
+        if flavor is not None:
+            set_font_flavor(tt, flavor)
+        with profile_phase(profiler, "save"):
+            save_font(tt, outpath)
+    return report._replace(
+        in_size=os.path.getsize(inpath), out_size=os.path.getsize(outpath)
+    )
+
+
+def dehint_bytes(
+    data: TableData,
+    flavor: Optional[str] = None,
+    fast: bool = False,
+    recalc: bool = False,
+    **kwargs,
+) -> bytes:
+    """Dehints a font binary in memory and returns the dehinted font binary.
+    The keyword arguments are the dehint function keyword arguments.  Verbose
+    output is off unless `verbose=True` is passed.
+
+    The font data are read without a copy of the input buffer and the
+    filesystem is not used.  The `fast` option uses the binary table surgery
+    routines in dehinter.raw, which write tables that are not edited as slices
+    of the input buffer.  The dehinted font is returned in the format of the
+    input font unless a "ttf", "woff", or "woff2" flavor is requested.  With
+    `recalc`, bounding boxes are recalculated.  Raises ValueError when the
+    data are not a TrueType font."""
+    _, chunks = _dehint_buffer(data, flavor, fast, recalc, kwargs)
+    return b"".join(chunks)
+
+
+def dehint_fileobj(
+    infile: BinaryIO,
+    outfile: BinaryIO,
+    flavor: Optional[str] = None,
+    fast: bool = False,
+    recalc: bool = False,
+    **kwargs,
+) -> DehintReport:
+    """Dehints the font that is read from a binary file object and writes the
+    dehinted font to a binary file object.  This supports the same options as
+    dehint_bytes and returns the DehintReport of the edits with the in and out
+    font sizes."""
+    data = read_font_stream(infile)
+    report, chunks = _dehint_buffer(data, flavor, fast, recalc, kwargs)
+    write_chunks(outfile, chunks)
+    return report._replace(
+        in_size=len(data), out_size=sum(len(chunk) for chunk in chunks)
+    )
+
+
+def read_font_stream(infile: BinaryIO) -> bytearray:
+    """Reads a font binary from a binary file object that does not need to be
+    seekable, e.g. standard input.  The file signature is tested before the
+    rest of the stream is read and raises ValueError when the stream is not a
+    TrueType, TrueType Collection, or WOFF font."""
+    data = bytearray()
+    # pipes can return fewer bytes than requested
+    while len(data) < 4:
+        chunk = infile.read(4 - len(data))
+        if not chunk:
+            break
+        data += chunk
+    if bytes(data) not in FONT_FILE_SIGNATURES:
+        raise ValueError("the data do not appear to be a TrueType font")
+    data += infile.read()
+    return data
+
+
+def _dehint_buffer(
+    data: TableData,
+    flavor: Optional[str],
+    fast: bool,
+    recalc: bool,
+    kwargs: Dict[str, Any],
+) -> Tuple[DehintReport, List[TableData]]:
+    kwargs.setdefault("verbose", False)
+    if not is_truetype_font_data(data):
+        raise ValueError("the data do not appear to be a TrueType font")
+    if fast:
+        sfnt = read_sfnt(memoryview(data))
+        try:
+            report = dehint_sfnt(sfnt, recalc_bboxes=recalc, **kwargs)
+            if flavor is not None:
+                set_font_flavor(sfnt, flavor)
+            # the chunks are slices of the input buffer that remain valid
+            # after the font is closed
+            return report, list(sfnt.iter_compile())
+        finally:
+            sfnt.close()
+
+    tt = _load_font(BufferReader(data), recalc)
+    try:
+        report = dehint(tt, **kwargs)
+        if flavor is not None:
+            set_font_flavor(tt, flavor)
+        out = io.BytesIO()
+        tt.save(out)
+    finally:
+        tt.close()
+    return report, [out.getvalue()]
+
+
+class BufferReader(io.RawIOBase):
+    """A read-only binary file object over a bytes-like object.  The buffer is
+    not copied, only the bytes that are read are copied."""
+
+    def __init__(self, data: TableData) -> None:
+        self.data = memoryview(data)
+        self.position = 0
+
+    def readable(self) -> bool:
+        return True
+
+    def seekable(self) -> bool:
+        return True
+
+    def read(self, size: Optional[int] = -1) -> bytes:
+        start = min(self.position, len(self.data))
+        if size is None or size < 0:
+            end = len(self.data)
+        else:
+            end = min(start + size, len(self.data))
+        self.position = end
+        return bytes(self.data[start:end])
+
+    def readinto(self, buffer) -> int:
+        chunk = self.read(len(buffer))
+        buffer[: len(chunk)] = chunk
+        return len(chunk)
+
+    def seek(self, offset: int, whence: int = io.SEEK_SET) -> int:
+        if whence == io.SEEK_CUR:
+            offset += self.position
+        elif whence == io.SEEK_END:
+            offset += len(self.data)
+        if offset < 0:
+            raise ValueError(f"negative seek position {offset}")
+        self.position = offset
+        return self.position
+
+    def tell(self) -> int:
+        return self.position
+
 
 # ========================================================
 # Utilities
@@ -185,11 +500,49 @@ def has_vdmx_table(tt) -> bool:
 def is_truetype_font(filepath: Union[bytes, str, "os.PathLike[str]"]) -> bool:
     """Tests that a font has the TrueType file signature of either:
     1) b'\x00\x01\x00\x00'
-    2) b'\x74\x72\x75\x65' == 'true'"""
+    2) b'\x74\x72\x75\x65' == 'true'
+    or is a TrueType Collection (b'ttcf') with a first font that has one of
+    these file signatures, or is a WOFF (b'wOFF') or WOFF2 (b'wOF2') font with
+    one of these sfnt flavors."""
     with open(filepath, "rb") as f:
         file_signature: bytes = f.read(4)
+        if file_signature == TTC_FILE_SIGNATURE:
+            # ttcTag, version, numFonts, then the first font offset
+            ttc_header = f.read(12)
+            if len(ttc_header) < 12 or ttc_header[4:8] == b"\x00\x00\x00\x00":
+                return False
+            f.seek(int.from_bytes(ttc_header[8:12], "big"))
+            file_signature = f.read(4)
+        elif file_signature in WOFF_FILE_SIGNATURES:
+            # the WOFF header flavor field follows the signature
+            file_signature = f.read(4)
+
+        return file_signature in TRUETYPE_FILE_SIGNATURES
+
+
+def is_truetype_font_data(data: TableData) -> bool:
+    """Tests that a font binary in memory has one of the TrueType, TrueType
+    Collection, or WOFF file signatures that is_truetype_font accepts."""
+    data = memoryview(data)
+    file_signature = bytes(data[:4])
+    if file_signature == TTC_FILE_SIGNATURE:
+        # ttcTag, version, numFonts, then the first font offset
+        ttc_header = bytes(data[4:16])
+        if len(ttc_header) < 12 or ttc_header[4:8] == b"\x00\x00\x00\x00":
+            return False
+        start = int.from_bytes(ttc_header[8:12], "big")
+        end = start + 4
+        file_signature = bytes(data[start:end])
+    elif file_signature in WOFF_FILE_SIGNATURES:
+        # the WOFF header flavor field follows the signature
+        file_signature = bytes(data[4:8])
+    return file_signature in TRUETYPE_FILE_SIGNATURES
+
 
-        return file_signature in (b"\x00\x01\x00\x00", b"\x74\x72\x75\x65")
+def is_font_collection(filepath: Union[bytes, str, "os.PathLike[str]"]) -> bool:
+    """Tests that a font has the TrueType Collection file signature b'ttcf'."""
+    with open(filepath, "rb") as f:
+        return f.read(4) == TTC_FILE_SIGNATURE
 
 
 def is_variable_font(tt) -> bool:
@@ -278,17 +631,24 @@ def remove_vdmx_table(tt) -> None:
 # ========================================================
 def remove_glyf_instructions(tt) -> int:
     """Removes instruction set bytecode from glyph definitions in the glyf table."""
+    return _remove_glyf_instructions(tt)[0]
+
+
+def _remove_glyf_instructions(tt) -> Tuple[int, int]:
+    # returns the number of edited glyphs and of removed bytecode bytes
     glyph_number: int = 0
+    bytecode_removed: int = 0
     for glyph in tt["glyf"].glyphs.values():
         glyph.expand(tt["glyf"])
         if hasattr(glyph, "program") and glyph.program.bytecode != array.array("B", []):
+            bytecode_removed += len(glyph.program.getBytecode())
             if glyph.isComposite():
                 del glyph.program
                 glyph_number += 1
             else:
                 glyph.program.bytecode = array.array("B", [])
                 glyph_number += 1
-    return glyph_number
+    return glyph_number, bytecode_removed
 
 
 # ========================================================
@@ -299,6 +659,8 @@ def update_gasp_table(tt) -> bool:
     1) rangeMaxPPEM changed to 65535
     2) rangeGaspBehavior changed to 0x000a (symmetric grayscale, no gridfit)"""
     if "gasp" not in tt:
+        from fontTools import ttLib  # type: ignore
+
         tt["gasp"] = ttLib.newTable("gasp")
         tt["gasp"].gaspRange = {}
     if tt["gasp"].gaspRange != {65535: 0x000A}:
@@ -342,7 +704,7 @@ def update_head_table_flags(tt) -> bool:
     if is_bit_k_set(tt["head"].flags, 4):
         # confirm that there is no LTSH or hdmx table
         # bit 4 should be set if either of these tables are present in font
-        if has_hdmx_table(tt) or has_ltsh_table(tt):
+        if any(tag in tt for tag in HEAD_FLAG_BIT_4_TABLES):
             return False
         else:
             new_flags = clear_bit_k(tt["head"].flags, 4)
@@ -0,0 +1,587 @@
+# Copyright 2019 Source Foundry Authors and Contributors
+
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+
+#     http://www.apache.org/licenses/LICENSE-2.0
+
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import array
+import struct
+import sys
+from typing import Dict, List, NamedTuple, Optional, Sequence, Set, Tuple
+
+from dehinter.sfnt import SFNTError, TableData
+
+# composite glyph component flags
+ARG_1_AND_2_ARE_WORDS = 0x0001
+WE_HAVE_A_SCALE = 0x0008
+MORE_COMPONENTS = 0x0020
+WE_HAVE_AN_X_AND_Y_SCALE = 0x0040
+WE_HAVE_A_TWO_BY_TWO = 0x0080
+WE_HAVE_INSTRUCTIONS = 0x0100
+
+# simple glyph point flags
+X_SHORT_VECTOR = 0x02
+Y_SHORT_VECTOR = 0x04
+REPEAT_FLAG = 0x08
+X_IS_SAME_OR_POSITIVE_X_SHORT_VECTOR = 0x10
+Y_IS_SAME_OR_POSITIVE_Y_SHORT_VECTOR = 0x20
+
+# numberOfContours, xMin, yMin, xMax, yMax
+GLYPH_HEADER_SIZE = 10
+
+# head.indexToLocFormat values
+LOCA_FORMAT_SHORT = 0
+LOCA_FORMAT_LONG = 1
+# largest glyf table offset that can be stored in a short format loca table
+LOCA_SHORT_MAX_OFFSET = 0x1FFFE
+
+# smallest number of glyphs in a glyf table chunk of a parallel strip
+GLYF_CHUNK_MIN_GLYPHS = 4096
+
+
+class GlyphInstructions(NamedTuple):
+    """The location of the instruction set bytecode in a glyph record."""
+
+    # byte offset of the instructionLength field in the glyph record
+    offset: int
+    # instructionLength value, the number of bytecode bytes that follow the field
+    length: int
+    # byte offsets of the component flags fields in composite glyph records
+    flag_offsets: List[int]
+
+
+# ========================================================
+# loca table
+# ========================================================
+def parse_loca(
+    loca: TableData, index_to_loc_format: int, num_glyphs: int
+) -> array.array:
+    """Returns the numGlyphs + 1 glyf table byte offsets in a loca table."""
+    offsets = array.array("H" if index_to_loc_format == LOCA_FORMAT_SHORT else "I")
+    size = (num_glyphs + 1) * offsets.itemsize
+    if len(loca) < size:
+        raise SFNTError("loca table is too short for the number of glyphs")
+    offsets.frombytes(loca[:size])
+    if sys.byteorder == "little":
+        offsets.byteswap()
+    if index_to_loc_format == LOCA_FORMAT_SHORT:
+        # short format offsets are stored as the offset divided by two
+        return array.array("I", [offset << 1 for offset in offsets])
+    return offsets
+
+
+def compile_loca(offsets: array.array, index_to_loc_format: int) -> Tuple[bytes, int]:
+    """Returns the loca table binary and the head.indexToLocFormat value for a
+    sequence of glyf table byte offsets.  The long format is used when a short
+    format is requested and the offsets cannot be represented in it."""
+    if index_to_loc_format == LOCA_FORMAT_SHORT and (
+        max(offsets) > LOCA_SHORT_MAX_OFFSET or any(offset & 1 for offset in offsets)
+    ):
+        index_to_loc_format = LOCA_FORMAT_LONG
+    if index_to_loc_format == LOCA_FORMAT_SHORT:
+        loca = array.array("H", [offset >> 1 for offset in offsets])
+    else:
+        loca = array.array("I", offsets)
+    if sys.byteorder == "little":
+        loca.byteswap()
+    return loca.tobytes(), index_to_loc_format
+
+
+# ========================================================
+# glyph records
+# ========================================================
+def locate_glyph_instructions(glyph: TableData) -> Optional[GlyphInstructions]:
+    """Returns the location of the instruction set bytecode in a binary glyph
+    record, or None when the glyph record does not define instructions.  Only
+    the glyph header, the endPtsOfContours array, and the composite glyph
+    component records are read.  Coordinates are never decoded."""
+    try:
+        (number_of_contours,) = struct.unpack_from(">h", glyph, 0)
+        if number_of_contours >= 0:
+            # simple glyph: instructionLength follows the endPtsOfContours array
+            offset = GLYPH_HEADER_SIZE + 2 * number_of_contours
+            (length,) = struct.unpack_from(">H", glyph, offset)
+            return GlyphInstructions(offset, length, [])
+
+        # composite glyph: instructionLength follows the last component record
+        # when any of the components set the WE_HAVE_INSTRUCTIONS flag
+        flag_offsets: List[int] = []
+        have_instructions = False
+        offset = GLYPH_HEADER_SIZE
+        flags = MORE_COMPONENTS
+        while flags & MORE_COMPONENTS:
+            (flags,) = struct.unpack_from(">H", glyph, offset)
+            flag_offsets.append(offset)
+            have_instructions |= bool(flags & WE_HAVE_INSTRUCTIONS)
+            # flags, glyphIndex, and the two offset or point number arguments
+            offset += 8 if flags & ARG_1_AND_2_ARE_WORDS else 6
+            if flags & WE_HAVE_A_SCALE:
+                offset += 2
+            elif flags & WE_HAVE_AN_X_AND_Y_SCALE:
+                offset += 4
+            elif flags & WE_HAVE_A_TWO_BY_TWO:
+                offset += 8
+        if not have_instructions:
+            return None
+        (length,) = struct.unpack_from(">H", glyph, offset)
+        return GlyphInstructions(offset, length, flag_offsets)
+    except struct.error:
+        raise SFNTError("glyph record is too short for its glyph data")
+
+
+def locate_glyph_data_end(glyph: TableData, instructions: GlyphInstructions) -> int:
+    """Returns the end offset of the glyph data in a binary glyph record that
+    defines instructions, the glyph record padding is not included.  The
+    instruction set bytecode is the last field of composite glyph records.  In
+    simple glyph records, the flags array is read to sum the sizes of the
+    coordinate arrays.  Coordinates are never decoded."""
+    bytecode_end = instructions.offset + 2 + instructions.length
+    if bytecode_end > len(glyph):
+        raise SFNTError("glyph instructions extend beyond the glyph record")
+    if instructions.flag_offsets or instructions.offset == GLYPH_HEADER_SIZE:
+        # composite glyph, or a simple glyph without contours and points
+        return bytecode_end
+    try:
+        # the point count is the last endPtsOfContours value + 1
+        (num_points,) = struct.unpack_from(">H", glyph, instructions.offset - 2)
+        num_points += 1
+        offset = bytecode_end
+        coordinates_length = 0
+        while num_points > 0:
+            flag = glyph[offset]
+            offset += 1
+            repeat = 1
+            if flag & REPEAT_FLAG:
+                repeat += glyph[offset]
+                offset += 1
+            if flag & X_SHORT_VECTOR:
+                coordinates_length += repeat
+            elif not flag & X_IS_SAME_OR_POSITIVE_X_SHORT_VECTOR:
+                coordinates_length += 2 * repeat
+            if flag & Y_SHORT_VECTOR:
+                coordinates_length += repeat
+            elif not flag & Y_IS_SAME_OR_POSITIVE_Y_SHORT_VECTOR:
+                coordinates_length += 2 * repeat
+            num_points -= repeat
+    except IndexError:
+        raise SFNTError("glyph record is too short for its glyph data")
+    if num_points < 0 or offset + coordinates_length > len(glyph):
+        raise SFNTError("glyph record is too short for its glyph data")
+    return offset + coordinates_length
+
+
+def strip_glyph_instructions(
+    glyph: TableData, instructions: GlyphInstructions
+) -> bytearray:
+    """Returns a copy of a binary glyph record without instruction set bytecode.
+    Composite glyph records have the WE_HAVE_INSTRUCTIONS component flags
+    cleared and the instructionLength field removed.  Simple glyph records keep
+    an instructionLength field with a value of zero.  The padding of the
+    source glyph record is removed, see locate_glyph_data_end."""
+    bytecode_end = instructions.offset + 2 + instructions.length
+    data_end = locate_glyph_data_end(glyph, instructions)
+    stripped = bytearray(glyph[: instructions.offset])
+    if instructions.flag_offsets:
+        for flag_offset in instructions.flag_offsets:
+            (flags,) = struct.unpack_from(">H", stripped, flag_offset)
+            struct.pack_into(">H", stripped, flag_offset, flags & ~WE_HAVE_INSTRUCTIONS)
+    else:
+        stripped += b"\x00\x00"
+    stripped += glyph[bytecode_end:data_end]
+    # pad the glyph record to the two byte boundary that short loca offsets need
+    stripped += b"\x00" * (len(stripped) & 1)
+    return stripped
+
+
+# ========================================================
+# glyf table
+# ========================================================
+def strip_glyf_instructions(
+    glyf: TableData,
+    loca: TableData,
+    index_to_loc_format: int,
+    num_glyphs: int,
+    jobs: int = 1,
+) -> Tuple[bytearray, bytes, int, int, int]:
+    """Removes instruction set bytecode from the glyph records of a glyf table
+    in a single pass over the binary table data.
+
+    Returns the new glyf table binary, the new loca table binary, the new
+    head.indexToLocFormat value, the number of edited glyphs, and the number of
+    removed bytecode bytes.  Runs of
+    glyph records that are not edited are copied as a single byte slice.
+
+    When `jobs` is larger than 1, the glyph index range of a glyf table with at
+    least 2 * GLYF_CHUNK_MIN_GLYPHS glyphs is split into chunks that are
+    stripped in `jobs` worker processes.  The chunks are joined in glyph order
+    and the tables are identical to the tables of a single process strip."""
+    glyf = memoryview(glyf)
+    offsets = parse_loca(loca, index_to_loc_format, num_glyphs)
+    chunks = get_glyph_chunks(num_glyphs, jobs)
+    if len(chunks) > 1:
+        new_glyf, new_offsets, glyph_number, bytecode_removed = _strip_glyph_chunks(
+            glyf, offsets, chunks
+        )
+    else:
+        new_glyf, new_offsets, glyph_number, bytecode_removed = _strip_glyph_range(
+            glyf, offsets
+        )
+
+    if glyph_number == 0:
+        # the source loca table binary is still valid when nothing changed
+        return new_glyf, bytes(loca), index_to_loc_format, 0, 0
+    # the short loca format is used when the new offsets fit, as fontTools does
+    new_loca, new_index_to_loc_format = compile_loca(new_offsets, LOCA_FORMAT_SHORT)
+    return new_glyf, new_loca, new_index_to_loc_format, glyph_number, bytecode_removed
+
+
+def measure_glyf_instructions(
+    glyf: TableData, loca: TableData, index_to_loc_format: int, num_glyphs: int
+) -> Tuple[int, int, int, int]:
+    """Returns the number of glyph records with instruction set bytecode, the
+    number of bytecode bytes, the number of glyf table bytes that
+    strip_glyf_instructions removes, and the head.indexToLocFormat value of
+    the new loca table.  Only the glyph record headers and the flags of the
+    edited simple glyph records are read and no glyph records are copied."""
+    glyf = memoryview(glyf)
+    offsets = parse_loca(loca, index_to_loc_format, num_glyphs)
+    glyph_number = bytecode_length = removed_length = 0
+    # the new glyf table offsets must be even for the short loca format
+    new_offset = 0
+    odd_offsets = False
+    for glyph_id in range(num_glyphs):
+        start, end = offsets[glyph_id], offsets[glyph_id + 1]
+        if end < start or end > len(glyf):
+            raise SFNTError(f"invalid loca offsets for glyph {glyph_id}")
+        instructions = None
+        if end > start:
+            instructions = locate_glyph_instructions(glyf[start:end])
+        if instructions is None or instructions.length == 0:
+            new_offset += end - start
+            odd_offsets |= bool(new_offset & 1)
+            continue
+        # see strip_glyph_instructions: composite glyph records also lose the
+        # instructionLength field, the source record padding is removed, and
+        # records are padded to two bytes
+        new_length = (
+            locate_glyph_data_end(glyf[start:end], instructions) - instructions.length
+        )
+        if instructions.flag_offsets:
+            new_length -= 2
+        new_length += new_length & 1
+        new_offset += new_length
+        odd_offsets |= bool(new_offset & 1)
+        glyph_number += 1
+        bytecode_length += instructions.length
+        removed_length += end - start - new_length
+    if glyph_number and (odd_offsets or new_offset > LOCA_SHORT_MAX_OFFSET):
+        index_to_loc_format = LOCA_FORMAT_LONG
+    elif glyph_number:
+        index_to_loc_format = LOCA_FORMAT_SHORT
+    return glyph_number, bytecode_length, removed_length, index_to_loc_format
+
+
+def get_glyph_chunks(num_glyphs: int, jobs: int) -> List[Tuple[int, int]]:
+    """Returns the [first, last) glyph index ranges that a glyf table is split
+    into for `jobs` worker processes.  Chunks have at least
+    GLYF_CHUNK_MIN_GLYPHS glyphs."""
+    count = min(jobs, num_glyphs // GLYF_CHUNK_MIN_GLYPHS)
+    if count <= 1:
+        return [(0, num_glyphs)]
+    size = -(-num_glyphs // count)
+    return [
+        (first, min(first + size, num_glyphs)) for first in range(0, num_glyphs, size)
+    ]
+
+
+def _strip_glyph_range(
+    glyf: memoryview, offsets: array.array, first_glyph_id: int = 0
+) -> Tuple[bytearray, array.array, int, int]:
+    # strips the len(offsets) - 1 glyph records at the glyf table byte offsets
+    # and returns the new glyf table bytes, their len(offsets) byte offsets,
+    # the number of edited glyphs, and the number of removed bytecode bytes
+    num_glyphs = len(offsets) - 1
+    new_offsets = array.array("I", bytes(4 * (num_glyphs + 1)))
+    new_glyf = bytearray()
+    glyph_number = 0
+    bytecode_removed = 0
+
+    # [run_start, run_end) is a run of unedited glyph records in the source
+    # glyf table that has not been copied to the new glyf table yet
+    run_start = run_end = offsets[0]
+    for glyph_id in range(num_glyphs):
+        start, end = offsets[glyph_id], offsets[glyph_id + 1]
+        if end < start or end > len(glyf):
+            raise SFNTError(
+                f"invalid loca offsets for glyph {first_glyph_id + glyph_id}"
+            )
+        instructions = None
+        if end > start:
+            instructions = locate_glyph_instructions(glyf[start:end])
+        if instructions is None or instructions.length == 0:
+            if start == run_end:
+                new_offsets[glyph_id] = len(new_glyf) + start - run_start
+                run_end = end
+                continue
+            new_glyf += glyf[run_start:run_end]
+            new_offsets[glyph_id] = len(new_glyf)
+            run_start, run_end = start, end
+            continue
+        new_glyf += glyf[run_start:run_end]
+        new_offsets[glyph_id] = len(new_glyf)
+        new_glyf += strip_glyph_instructions(glyf[start:end], instructions)
+        run_start = run_end = end
+        glyph_number += 1
+        bytecode_removed += instructions.length
+    new_glyf += glyf[run_start:run_end]
+    new_offsets[num_glyphs] = len(new_glyf)
+    return new_glyf, new_offsets, glyph_number, bytecode_removed
+
+
+def _strip_glyph_chunk(
+    glyf_chunk: bytes, offsets: array.array, first_glyph_id: int
+) -> Tuple[bytearray, array.array, int, int]:
+    # worker process entry point
+    return _strip_glyph_range(memoryview(glyf_chunk), offsets, first_glyph_id)
+
+
+def _strip_glyph_chunks(
+    glyf: memoryview, offsets: array.array, chunks: List[Tuple[int, int]]
+) -> Tuple[bytearray, array.array, int, int]:
+    # the process pool machinery is only imported for parallel strips
+    from concurrent.futures import ProcessPoolExecutor
+
+    # each worker receives the bytes of its glyph records and loca offsets
+    # that are relative to the first glyph record.  Signed offsets keep
+    # invalid descending loca offsets detectable in the workers.
+    glyf_chunks: List[bytes] = []
+    offset_chunks: List[array.array] = []
+    for first, last in chunks:
+        chunk_start = offsets[first]
+        chunk_end = offsets[last]
+        glyf_chunks.append(bytes(glyf[chunk_start:chunk_end]))
+        offsets_end = last + 1
+        offset_chunks.append(
+            array.array(
+                "q", [offset - chunk_start for offset in offsets[first:offsets_end]]
+            )
+        )
+
+    new_glyf = bytearray()
+    new_offsets = array.array("I")
+    glyph_number = bytecode_removed = 0
+    with ProcessPoolExecutor(max_workers=len(chunks)) as executor:
+        for chunk_glyf, chunk_offsets, chunk_glyphs, chunk_bytecode in executor.map(
+            _strip_glyph_chunk,
+            glyf_chunks,
+            offset_chunks,
+            [first for first, _ in chunks],
+        ):
+            chunk_base = len(new_glyf)
+            new_offsets.extend(chunk_base + offset for offset in chunk_offsets[:-1])
+            new_glyf += chunk_glyf
+            glyph_number += chunk_glyphs
+            bytecode_removed += chunk_bytecode
+    new_offsets.append(len(new_glyf))
+    return new_glyf, new_offsets, glyph_number, bytecode_removed
+
+
+# ========================================================
+# glyf table metrics
+# ========================================================
+class GlyfMetrics(NamedTuple):
+    """The maxp table glyph fields and the head table font bounding box of a
+    glyf table."""
+
+    x_min: int = 0
+    y_min: int = 0
+    x_max: int = 0
+    y_max: int = 0
+    max_points: int = 0
+    max_contours: int = 0
+    max_composite_points: int = 0
+    max_composite_contours: int = 0
+    max_size_of_instructions: int = 0
+    max_component_elements: int = 0
+    max_component_depth: int = 0
+
+
+def compute_glyf_metrics(
+    glyf: TableData, loca: TableData, index_to_loc_format: int, num_glyphs: int
+) -> GlyfMetrics:
+    """Returns the maxp table glyph fields and the head table font bounding box
+    of a glyf table with the values of the fontTools maxp table recalculation.
+    The largest instruction set size is measured as well.  Glyph objects are
+    not built and coordinates are never decoded: the glyph headers, the last
+    endPtsOfContours values, and the instructionLength fields of simple glyphs
+    are gathered into arrays, and only composite glyph component records are
+    parsed one at a time.  The bounding box is the union of the glyph header
+    bounding boxes."""
+    glyf = memoryview(glyf)
+    offsets = parse_loca(loca, index_to_loc_format, num_glyphs)
+    glyph_ids = []
+    for glyph_id in range(num_glyphs):
+        start, end = offsets[glyph_id], offsets[glyph_id + 1]
+        if end < start or end > len(glyf):
+            raise SFNTError(f"invalid loca offsets for glyph {glyph_id}")
+        if end - start >= GLYPH_HEADER_SIZE:
+            glyph_ids.append(glyph_id)
+        elif end != start:
+            raise SFNTError(f"glyph record {glyph_id} is too short for a header")
+    if not glyph_ids:
+        return GlyfMetrics()
+
+    # numberOfContours, xMin, yMin, xMax, yMax of each glyph record
+    headers = _gather_words(
+        glyf, [offsets[glyph_id] for glyph_id in glyph_ids], GLYPH_HEADER_SIZE // 2
+    )
+    contours = headers[0::5]
+    bounds: List[Sequence[int]] = [headers[field::5] for field in range(1, 5)]
+    if 0 in contours:
+        # glyph records without contours do not add to the bounding box
+        outlined = [index for index, count in enumerate(contours) if count != 0]
+        bounds = [[values[index] for index in outlined] for values in bounds]
+    metrics: Dict[str, int] = {}
+    if bounds[0]:
+        metrics.update(
+            x_min=min(bounds[0]),
+            y_min=min(bounds[1]),
+            x_max=max(bounds[2]),
+            y_max=max(bounds[3]),
+        )
+
+    # simple glyphs: the point count is the last endPtsOfContours value + 1
+    # and the instructionLength field follows the endPtsOfContours array
+    simple = [index for index, count in enumerate(contours) if count > 0]
+    simple_points: Dict[int, Tuple[int, int]] = {}
+    if simple:
+        starts = [offsets[glyph_ids[index]] for index in simple]
+        ends = [offsets[glyph_ids[index] + 1] for index in simple]
+        counts = [contours[index] for index in simple]
+        instruction_offsets = [
+            start + GLYPH_HEADER_SIZE + 2 * count
+            for start, count in zip(starts, counts)
+        ]
+        if any(offset + 2 > end for offset, end in zip(instruction_offsets, ends)):
+            raise SFNTError("glyph record is too short for its glyph data")
+        last_points = _gather_words(
+            glyf, [offset - 2 for offset in instruction_offsets], 1, "H"
+        )
+        instruction_lengths = _gather_words(glyf, instruction_offsets, 1, "H")
+        metrics["max_points"] = max(last_points) + 1
+        metrics["max_contours"] = max(counts)
+        metrics["max_size_of_instructions"] = max(instruction_lengths)
+        simple_points = {
+            glyph_ids[index]: (points + 1, count)
+            for index, points, count in zip(simple, last_points, counts)
+        }
+
+    # composite glyphs: component point and contour totals are resolved
+    # through the component tree
+    components: Dict[int, List[int]] = {}
+    for index, count in enumerate(contours):
+        if count < 0:
+            glyph_id = glyph_ids[index]
+            glyph_start, glyph_end = offsets[glyph_id], offsets[glyph_id + 1]
+            glyph = glyf[glyph_start:glyph_end]
+            components[glyph_id], instruction_length = parse_glyph_components(glyph)
+            metrics["max_size_of_instructions"] = max(
+                metrics.get("max_size_of_instructions", 0), instruction_length
+            )
+    if components:
+        resolved: Dict[int, Tuple[int, int, int]] = {}
+        for glyph_id in components:
+            points, glyph_contours, depth = _resolve_composite(
+                glyph_id, components, simple_points, resolved, num_glyphs, set()
+            )
+            metrics["max_composite_points"] = max(
+                metrics.get("max_composite_points", 0), points
+            )
+            metrics["max_composite_contours"] = max(
+                metrics.get("max_composite_contours", 0), glyph_contours
+            )
+            metrics["max_component_depth"] = max(
+                metrics.get("max_component_depth", 0), depth
+            )
+        metrics["max_component_elements"] = max(
+            len(glyph_components) for glyph_components in components.values()
+        )
+    return GlyfMetrics(**metrics)
+
+
+def parse_glyph_components(glyph: TableData) -> Tuple[List[int], int]:
+    """Returns the component glyph indices of a binary composite glyph record
+    and the length of its instruction set bytecode."""
+    instructions = locate_glyph_instructions(glyph)
+    glyph_ids = []
+    try:
+        offset = GLYPH_HEADER_SIZE
+        flags = MORE_COMPONENTS
+        while flags & MORE_COMPONENTS:
+            flags, glyph_id = struct.unpack_from(">HH", glyph, offset)
+            glyph_ids.append(glyph_id)
+            offset += 8 if flags & ARG_1_AND_2_ARE_WORDS else 6
+            if flags & WE_HAVE_A_SCALE:
+                offset += 2
+            elif flags & WE_HAVE_AN_X_AND_Y_SCALE:
+                offset += 4
+            elif flags & WE_HAVE_A_TWO_BY_TWO:
+                offset += 8
+    except struct.error:
+        raise SFNTError("glyph record is too short for its glyph data")
+    return glyph_ids, 0 if instructions is None else instructions.length
+
+
+def _gather_words(
+    glyf: memoryview, positions: List[int], count: int, typecode: str = "h"
+) -> array.array:
+    # joins `count` big-endian 16-bit values at each position into one array
+    size = 2 * count
+    words = array.array(typecode)
+    ends = [position + size for position in positions]
+    words.frombytes(b"".join([glyf[start:end] for start, end in zip(positions, ends)]))
+    if sys.byteorder == "little":
+        words.byteswap()
+    return words
+
+
+def _resolve_composite(
+    glyph_id: int,
+    components: Dict[int, List[int]],
+    simple_points: Dict[int, Tuple[int, int]],
+    resolved: Dict[int, Tuple[int, int, int]],
+    num_glyphs: int,
+    visiting: Set[int],
+) -> Tuple[int, int, int]:
+    # the point and contour totals and the component depth of a composite glyph
+    if glyph_id in resolved:
+        return resolved[glyph_id]
+    if glyph_id in visiting:
+        raise SFNTError(f"composite glyph {glyph_id} is a component of itself")
+    visiting.add(glyph_id)
+    points = glyph_contours = 0
+    depth = 1
+    for component_id in components[glyph_id]:
+        if component_id >= num_glyphs:
+            raise SFNTError(f"composite glyph {glyph_id} has an invalid component")
+        if component_id in components:
+            nested_points, nested_contours, nested_depth = _resolve_composite(
+                component_id, components, simple_points, resolved, num_glyphs, visiting
+            )
+            depth = max(depth, nested_depth + 1)
+        else:
+            # empty glyphs do not add points or contours
+            nested_points, nested_contours = simple_points.get(component_id, (0, 0))
+        points += nested_points
+        glyph_contours += nested_contours
+    visiting.discard(glyph_id)
+    resolved[glyph_id] = (points, glyph_contours, depth)
+    return resolved[glyph_id]
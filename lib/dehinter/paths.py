@@ -12,8 +12,15 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
+import glob
 import os
-from typing import Union
+from typing import Iterable, List, Optional, Union
+
+# file extensions that are included in directory path searches
+FONT_FILE_EXTENSIONS = (".ttf", ".ttc", ".woff", ".woff2")
+
+# the in and out file path of standard input and standard output
+STDIO_PATH = "-"
 
 
 def filepath_exists(filepath: Union[bytes, str, "os.PathLike[str]"]) -> bool:
@@ -22,11 +29,66 @@ def filepath_exists(filepath: Union[bytes, str, "os.PathLike[str]"]) -> bool:
 
 
 def get_default_out_path(
-    filepath: os.PathLike,
-) -> Union[str, bytes]:
+    filepath: Union[str, "os.PathLike[str]"],
+    file_extension: Optional[str] = None,
+) -> str:
     """Returns an updated file path that is used as dehinted file default when user
-    does not specify an out file path."""
+    does not specify an out file path.  The in file extension is replaced with
+    `file_extension` when it is defined."""
     dir_path, file_path = os.path.split(filepath)
-    file_name, file_extension = os.path.splitext(file_path)
+    file_name, in_file_extension = os.path.splitext(file_path)
+    if file_extension is None:
+        file_extension = in_file_extension
     default_file_name = file_name + "-dehinted" + file_extension
     return os.path.join(dir_path, default_file_name)
+
+
+def is_glob_pattern(path: str) -> bool:
+    """Tests a file path string for glob pattern wildcard characters."""
+    return glob.has_magic(path)  # type: ignore
+
+
+def expand_input_paths(paths: Iterable[str]) -> List[str]:
+    """Expands a sequence of file paths, directory paths, and glob patterns into
+    an ordered, de-duplicated list of file paths.  Directories are searched
+    recursively for files with a TrueType font file extension.  Paths that do not
+    exist on the file system and the standard input path STDIO_PATH are returned
+    unchanged so that they can be reported during file path validation."""
+    expanded: List[str] = []
+    for path in paths:
+        if os.path.isdir(path):
+            expanded.extend(find_font_files(path))
+        elif not os.path.exists(path) and is_glob_pattern(path):
+            expanded.extend(sorted(glob.glob(path, recursive=True)))
+        else:
+            expanded.append(path)
+    # remove duplicate paths, retain the order of the first definition
+    return list(dict.fromkeys(expanded))
+
+
+def find_font_files(dirpath: str) -> List[str]:
+    """Returns the sorted file paths of the files with a font file extension in
+    a directory tree.  Dehinted files that were written by previous executions
+    are not included: a "-dehinted" file is skipped when the font file that it
+    was dehinted from is in the same directory."""
+    font_paths: List[str] = []
+    for root, dirs, files in os.walk(dirpath):
+        dirs.sort()
+        font_stems = {
+            os.path.splitext(file_name)[0]
+            for file_name in files
+            if os.path.splitext(file_name)[1].lower() in FONT_FILE_EXTENSIONS
+        }
+        for file_name in sorted(files):
+            file_stem, file_extension = os.path.splitext(file_name)
+            if file_extension.lower() not in FONT_FILE_EXTENSIONS:
+                continue
+            # skip dehinted files that were written by previous executions, the
+            # out file format can differ from the in file format
+            if (
+                file_stem.endswith("-dehinted")
+                and file_stem[: -len("-dehinted")] in font_stems
+            ):
+                continue
+            font_paths.append(os.path.join(root, file_name))
+    return font_paths
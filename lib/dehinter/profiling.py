@@ -0,0 +1,115 @@
+# Copyright 2019 Source Foundry Authors and Contributors
+
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+
+#     http://www.apache.org/licenses/LICENSE-2.0
+
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import json
+import time
+import tracemalloc
+from contextlib import contextmanager, nullcontext
+from typing import Callable, ContextManager, Iterator, List, NamedTuple, Optional
+
+
+class PhaseTiming(NamedTuple):
+    """The resource use of a single dehinting phase."""
+
+    phase: str
+    # the OpenType table tag that the phase reads or edits
+    table: Optional[str]
+    # seconds
+    wall_time: float
+    # seconds of process CPU time
+    cpu_time: float
+    # bytes of peak Python memory allocation above the allocation at the start
+    # of the phase, zero when memory is not traced
+    peak_memory: int
+
+    def to_json(self, **fields) -> str:
+        """Returns the timing as a JSON object string.  The keyword arguments
+        are added to the object, e.g. the font file path."""
+        record = dict(fields)
+        record.update(self._asdict())
+        return json.dumps(record)
+
+
+class Profiler(object):
+    """Records the wall time, CPU time, and peak memory allocation of the
+    phases of a dehint run.
+
+    Pass a Profiler to dehinter.font.dehint or dehinter.raw.dehint_sfnt with
+    the `profiler` keyword argument.  The timings are collected in the
+    `timings` list and each timing is passed to the optional `callback` when
+    its phase ends.  Memory is only traced with tracemalloc when `trace_memory`
+    is True because the trace slows down the profiled phases.  Use the profiler
+    as a context manager, or call close(), to stop a memory trace that the
+    profiler started."""
+
+    def __init__(
+        self,
+        callback: Optional[Callable[[PhaseTiming], None]] = None,
+        trace_memory: bool = False,
+    ) -> None:
+        self.callback = callback
+        self.timings: List[PhaseTiming] = []
+        self.trace_memory = trace_memory
+        self._started_trace = False
+        if trace_memory and not tracemalloc.is_tracing():
+            tracemalloc.start()
+            self._started_trace = True
+
+    def __enter__(self) -> "Profiler":
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+    @contextmanager
+    def phase(self, phase: str, table: Optional[str] = None) -> Iterator[None]:
+        """A context manager that records the resource use of a phase."""
+        trace_memory = self.trace_memory and tracemalloc.is_tracing()
+        start_memory = 0
+        if trace_memory:
+            start_memory = tracemalloc.get_traced_memory()[0]
+            if hasattr(tracemalloc, "reset_peak"):
+                # Python 3.9+, earlier versions report the peak since the
+                # start of the trace
+                tracemalloc.reset_peak()
+        start_wall_time = time.perf_counter()
+        start_cpu_time = time.process_time()
+        try:
+            yield
+        finally:
+            wall_time = time.perf_counter() - start_wall_time
+            cpu_time = time.process_time() - start_cpu_time
+            peak_memory = 0
+            if trace_memory:
+                peak_memory = max(tracemalloc.get_traced_memory()[1] - start_memory, 0)
+            timing = PhaseTiming(phase, table, wall_time, cpu_time, peak_memory)
+            self.timings.append(timing)
+            if self.callback is not None:
+                self.callback(timing)
+
+    def close(self) -> None:
+        """Stops the memory trace when it was started by this profiler."""
+        if self._started_trace:
+            tracemalloc.stop()
+            self._started_trace = False
+
+
+def profile_phase(
+    profiler: Optional[Profiler], phase: str, table: Optional[str] = None
+) -> ContextManager:
+    """Returns the Profiler.phase context manager of a profiler, or a context
+    manager that does nothing when profiler is None."""
+    if profiler is None:
+        return nullcontext()
+    return profiler.phase(phase, table)
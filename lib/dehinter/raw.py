@@ -0,0 +1,396 @@
+# Copyright 2019 Source Foundry Authors and Contributors
+
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+
+#     http://www.apache.org/licenses/LICENSE-2.0
+
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import os
+import struct
+from typing import Any, Dict, List, Tuple, Union
+
+from dehinter.bitops import clear_bit_k, is_bit_k_set
+from dehinter.glyf import GlyfMetrics, compute_glyf_metrics, strip_glyf_instructions
+from dehinter.profiling import profile_phase
+from dehinter.report import DehintReport, table_delta
+from dehinter.sfnt import SFNTCollection, SFNTFont
+from dehinter.tables import HEAD_FLAG_BIT_4_TABLES, get_removed_tables
+
+# gasp version 1 table with a single range:
+#   rangeMaxPPEM = 65535, rangeGaspBehavior = 0x000a (symmetric grayscale, no gridfit)
+DEHINTED_GASP_TABLE = struct.pack(">HHHH", 1, 1, 65535, 0x000A)
+
+# byte offsets of the maxp version 1.0 fields that are set to zero
+MAXP_DEHINTED_FIELD_OFFSETS = {
+    "maxZones": 14,
+    "maxTwilightPoints": 16,
+    "maxStorage": 18,
+    "maxFunctionDefs": 20,
+    "maxStackElements": 24,
+    "maxSizeOfInstructions": 26,
+}
+# byte offsets of the maxp version 1.0 fields that are recalculated from the
+# glyph records, by GlyfMetrics field.  fontTools does not recalculate
+# maxSizeOfInstructions.
+MAXP_GLYF_FIELD_OFFSETS = {
+    "maxPoints": ("max_points", 6),
+    "maxContours": ("max_contours", 8),
+    "maxCompositePoints": ("max_composite_points", 10),
+    "maxCompositeContours": ("max_composite_contours", 12),
+    "maxComponentElements": ("max_component_elements", 28),
+    "maxComponentDepth": ("max_component_depth", 30),
+}
+MAXP_VERSION_1_0 = 0x00010000
+MAXP_NUM_GLYPHS_OFFSET = 4
+
+# byte offsets of head table fields
+HEAD_FLAGS_OFFSET = 16
+HEAD_INDEX_TO_LOC_FORMAT_OFFSET = 50
+# xMin, yMin, xMax, yMax
+HEAD_BBOX_OFFSET = 36
+HEAD_BBOX_FIELDS = ("xMin", "yMin", "xMax", "yMax")
+
+
+# ========================================================
+# Core raw dehinting routine
+# ========================================================
+def dehint_sfnt(
+    sfnt: Union[SFNTFont, SFNTCollection],
+    keep_cvar=False,
+    keep_cvt=False,
+    keep_fpgm=False,
+    keep_gasp=False,
+    keep_glyf=False,
+    keep_hdmx=False,
+    keep_head=False,
+    keep_ltsh=False,
+    keep_maxp=False,
+    keep_prep=False,
+    keep_ttfa=False,
+    keep_vdmx=False,
+    keep_tsi=False,
+    verbose=True,
+    profiler=None,
+    glyf_jobs=1,
+    recalc_bboxes=False,
+) -> DehintReport:
+    """Dehints a dehinter.sfnt.SFNTFont with the same defaults and keep_* options
+    as dehinter.font.dehint and returns a dehinter.report.DehintReport of the
+    edits.  All fonts in a dehinter.sfnt.SFNTCollection are dehinted and tables
+    that are shared between the fonts are edited once.  Large glyf tables are
+    stripped in `glyf_jobs` worker processes.  With `recalc_bboxes`, the maxp
+    table glyph fields and the head table font bounding box are recalculated
+    from the dehinted glyph records, see recalc_raw_glyf_metrics."""
+    if isinstance(sfnt, SFNTCollection):
+        font_reports: List[DehintReport] = []
+        for font_number, font in enumerate(sfnt.fonts):
+            if verbose:
+                print(f"[*] Font {font_number + 1} of {len(sfnt.fonts)} in collection")
+            report = dehint_sfnt(
+                font,
+                keep_cvar=keep_cvar,
+                keep_cvt=keep_cvt,
+                keep_fpgm=keep_fpgm,
+                keep_gasp=keep_gasp,
+                keep_glyf=keep_glyf,
+                keep_hdmx=keep_hdmx,
+                keep_head=keep_head,
+                keep_ltsh=keep_ltsh,
+                keep_maxp=keep_maxp,
+                keep_prep=keep_prep,
+                keep_ttfa=keep_ttfa,
+                keep_vdmx=keep_vdmx,
+                keep_tsi=keep_tsi,
+                verbose=verbose,
+                profiler=profiler,
+                glyf_jobs=glyf_jobs,
+                recalc_bboxes=recalc_bboxes,
+            )
+            font_reports.append(report)
+        return DehintReport([], fonts=font_reports)
+
+    keep_options = {
+        "keep_cvar": keep_cvar,
+        "keep_cvt": keep_cvt,
+        "keep_fpgm": keep_fpgm,
+        "keep_hdmx": keep_hdmx,
+        "keep_ltsh": keep_ltsh,
+        "keep_prep": keep_prep,
+        "keep_ttfa": keep_ttfa,
+        "keep_vdmx": keep_vdmx,
+        "keep_tsi": keep_tsi,
+    }
+
+    #  (1) OpenType table removal
+    removed_tables: List[str] = []
+    for spec in get_removed_tables(sfnt.keys(), keep_options):
+        with profile_phase(profiler, spec.phase, spec.tag):
+            del sfnt[spec.tag]
+        removed_tables.append(spec.tag)
+        if verbose:
+            print(f"[-] Removed {spec.label} table")
+
+    #  (2) Remove glyf table instruction set bytecode
+    number_glyfs_edited = bytecode_removed = 0
+    if not keep_glyf and "glyf" in sfnt:
+        with profile_phase(profiler, "remove_raw_glyf_instructions", "glyf"):
+            number_glyfs_edited, bytecode_removed = _remove_raw_glyf_instructions(
+                sfnt, glyf_jobs
+            )
+        if number_glyfs_edited > 0:
+            if verbose:
+                print(
+                    f"[-] Removed glyf table instruction bytecode from "
+                    f"{number_glyfs_edited} glyphs"
+                )
+
+    #  (3) Edit gasp table
+    gasp_delta = None
+    if not keep_gasp:
+        with profile_phase(profiler, "update_raw_gasp_table", "gasp"):
+            old_gasp = _raw_gasp_fields(sfnt)
+            gasp_updated = update_raw_gasp_table(sfnt)
+            gasp_delta = table_delta(old_gasp, _raw_gasp_fields(sfnt))
+        if gasp_updated:
+            if verbose:
+                print(f"[Δ] New gasp table values:{os.linesep}    {{65535: 10}}")
+
+    #  (4) Edit maxp table
+    maxp_delta = None
+    if not keep_maxp:
+        with profile_phase(profiler, "update_raw_maxp_table", "maxp"):
+            old_maxp = _raw_maxp_fields(sfnt)
+            maxp_updated = update_raw_maxp_table(sfnt)
+            maxp_delta = table_delta(old_maxp, _raw_maxp_fields(sfnt))
+        if maxp_updated:
+            if verbose:
+                fields = ", ".join(f"{f}=0" for f in MAXP_DEHINTED_FIELD_OFFSETS)
+                print(f"[Δ] New maxp table values:{os.linesep}    {fields}")
+
+    #  (5) Edit head table flags to clear bit 4
+    head_delta = None
+    if not keep_head:
+        with profile_phase(profiler, "update_raw_head_table_flags", "head"):
+            old_head = _raw_head_fields(sfnt)
+            head_updated = update_raw_head_table_flags(sfnt)
+            head_delta = table_delta(old_head, _raw_head_fields(sfnt))
+        if head_updated:
+            if verbose:
+                print("[Δ] Cleared bit 4 in head table flags")
+
+    #  (6) Recalculate the maxp table glyph fields and the head table font
+    #      bounding box from the glyph records
+    if recalc_bboxes and "glyf" in sfnt and not (keep_maxp and keep_head):
+        with profile_phase(profiler, "recalc_raw_glyf_metrics", "glyf"):
+            old_glyf_fields = {**_raw_maxp_fields(sfnt), **_raw_head_fields(sfnt)}
+            recalc_raw_glyf_metrics(
+                sfnt, update_maxp=not keep_maxp, update_head=not keep_head
+            )
+            if maxp_delta is not None:
+                maxp_delta = table_delta(old_maxp, _raw_maxp_fields(sfnt))
+            if head_delta is not None:
+                head_delta = table_delta(old_head, _raw_head_fields(sfnt))
+        if verbose:
+            new_glyf_fields = {**_raw_maxp_fields(sfnt), **_raw_head_fields(sfnt)}
+            changes = table_delta(old_glyf_fields, new_glyf_fields)
+            if changes:
+                fields = ", ".join(f"{f}={new}" for f, (_, new) in changes.items())
+                print(
+                    f"[Δ] Recalculated maxp and head table values:{os.linesep}    {fields}"
+                )
+
+    return DehintReport(
+        removed_tables,
+        glyphs_edited=number_glyfs_edited,
+        bytecode_removed=bytecode_removed,
+        gasp=gasp_delta,
+        maxp=maxp_delta,
+        head=head_delta,
+    )
+
+
+# ========================================================
+# glyf table instruction set bytecode removal
+# ========================================================
+def remove_raw_glyf_instructions(sfnt: SFNTFont, jobs: int = 1) -> int:
+    """Removes instruction set bytecode from the glyf table and replaces the
+    glyf, loca, and head tables in the SFNTFont.  Returns the number of edited
+    glyphs.  Large glyf tables are stripped in `jobs` worker processes, see
+    dehinter.glyf.strip_glyf_instructions.
+
+    In TrueType Collections, the edit of a glyf table that is shared between
+    fonts is stored in the SFNTFont table cache and reused by the other fonts."""
+    return _remove_raw_glyf_instructions(sfnt, jobs)[0]
+
+
+def _remove_raw_glyf_instructions(sfnt: SFNTFont, jobs: int = 1) -> Tuple[int, int]:
+    # returns the number of edited glyphs and of removed bytecode bytes
+    (num_glyphs,) = struct.unpack_from(">H", sfnt["maxp"], MAXP_NUM_GLYPHS_OFFSET)
+    (index_to_loc_format,) = struct.unpack_from(
+        ">h", sfnt["head"], HEAD_INDEX_TO_LOC_FORMAT_OFFSET
+    )
+    table_cache = sfnt.table_cache
+    glyf_source = sfnt.source_range("glyf")
+    loca_source = sfnt.source_range("loca")
+    if table_cache is None or glyf_source is None or loca_source is None:
+        result = strip_glyf_instructions(
+            sfnt["glyf"], sfnt["loca"], index_to_loc_format, num_glyphs, jobs
+        )
+    else:
+        cache_key = ("glyf", glyf_source, loca_source, index_to_loc_format, num_glyphs)
+        if cache_key not in table_cache:
+            table_cache[cache_key] = strip_glyf_instructions(
+                sfnt["glyf"], sfnt["loca"], index_to_loc_format, num_glyphs, jobs
+            )
+        result = table_cache[cache_key]
+    glyf, loca, new_index_to_loc_format, glyph_number, bytecode_removed = result
+    if glyph_number > 0:
+        sfnt["glyf"] = glyf
+        sfnt["loca"] = loca
+        if new_index_to_loc_format != index_to_loc_format:
+            head = bytearray(sfnt["head"])
+            struct.pack_into(
+                ">h", head, HEAD_INDEX_TO_LOC_FORMAT_OFFSET, new_index_to_loc_format
+            )
+            sfnt["head"] = head
+    return glyph_number, bytecode_removed
+
+
+# ========================================================
+# gasp table edit
+# ========================================================
+def _raw_gasp_fields(sfnt: SFNTFont) -> Dict[str, Any]:
+    if "gasp" not in sfnt:
+        return {"gaspRange": None}
+    gasp = sfnt["gasp"]
+    try:
+        (num_ranges,) = struct.unpack_from(">H", gasp, 2)
+        ranges = struct.unpack_from(f">{2 * num_ranges}H", gasp, 4)
+    except struct.error:
+        # a malformed gasp table is replaced without a report of its values
+        return {"gaspRange": None}
+    return {"gaspRange": dict(zip(ranges[::2], ranges[1::2]))}
+
+
+def update_raw_gasp_table(sfnt: SFNTFont) -> bool:
+    """Replaces the gasp table with a single rangeMaxPPEM 65535 range that uses
+    symmetric grayscale rendering without gridfitting.  The table is added when
+    it is not present in the font."""
+    if "gasp" in sfnt and bytes(sfnt["gasp"]) == DEHINTED_GASP_TABLE:
+        return False
+    sfnt["gasp"] = DEHINTED_GASP_TABLE
+    return True
+
+
+# =========================================
+# maxp table edits
+# =========================================
+def _raw_maxp_fields(sfnt: SFNTFont) -> Dict[str, Any]:
+    maxp = sfnt["maxp"]
+    if struct.unpack_from(">L", maxp, 0)[0] != MAXP_VERSION_1_0:
+        return {}
+    offsets = {field: offset for field, (_, offset) in MAXP_GLYF_FIELD_OFFSETS.items()}
+    offsets.update(MAXP_DEHINTED_FIELD_OFFSETS)
+    return {
+        field: struct.unpack_from(">H", maxp, offset)[0]
+        for field, offset in offsets.items()
+    }
+
+
+def update_raw_maxp_table(sfnt: SFNTFont) -> bool:
+    """Sets the maxp table instruction set fields to zero."""
+    maxp = bytearray(sfnt["maxp"])
+    (version,) = struct.unpack_from(">L", maxp, 0)
+    if version != MAXP_VERSION_1_0:
+        # version 0.5 tables do not include the TrueType instruction fields
+        return False
+    changed: bool = False
+    for offset in MAXP_DEHINTED_FIELD_OFFSETS.values():
+        if struct.unpack_from(">H", maxp, offset)[0] != 0:
+            struct.pack_into(">H", maxp, offset, 0)
+            changed = True
+    if changed:
+        sfnt["maxp"] = maxp
+    return changed
+
+
+# =========================================
+# head table edits
+# =========================================
+def _raw_head_fields(sfnt: SFNTFont) -> Dict[str, Any]:
+    head = sfnt["head"]
+    fields = {"flags": struct.unpack_from(">H", head, HEAD_FLAGS_OFFSET)[0]}
+    fields.update(
+        zip(HEAD_BBOX_FIELDS, struct.unpack_from(">4h", head, HEAD_BBOX_OFFSET))
+    )
+    return fields
+
+
+def update_raw_head_table_flags(sfnt: SFNTFont) -> bool:
+    """Clears bit 4 of the head table flags when the font does not include a
+    hdmx or LTSH table."""
+    head = bytearray(sfnt["head"])
+    (flags,) = struct.unpack_from(">H", head, HEAD_FLAGS_OFFSET)
+    if is_bit_k_set(flags, 4):
+        # bit 4 should be set if either of these tables are present in font
+        if any(tag in sfnt for tag in HEAD_FLAG_BIT_4_TABLES):
+            return False
+        struct.pack_into(">H", head, HEAD_FLAGS_OFFSET, clear_bit_k(flags, 4))
+        sfnt["head"] = head
+        return True
+    return False
+
+
+# =========================================
+# maxp and head table recalculation
+# =========================================
+def get_raw_glyf_metrics(sfnt: SFNTFont) -> GlyfMetrics:
+    """Returns the maxp table glyph fields and the head table font bounding box
+    of the glyph records in the glyf table, see
+    dehinter.glyf.compute_glyf_metrics."""
+    (num_glyphs,) = struct.unpack_from(">H", sfnt["maxp"], MAXP_NUM_GLYPHS_OFFSET)
+    (index_to_loc_format,) = struct.unpack_from(
+        ">h", sfnt["head"], HEAD_INDEX_TO_LOC_FORMAT_OFFSET
+    )
+    return compute_glyf_metrics(
+        sfnt["glyf"], sfnt["loca"], index_to_loc_format, num_glyphs
+    )
+
+
+def recalc_raw_glyf_metrics(
+    sfnt: SFNTFont, update_maxp: bool = True, update_head: bool = True
+) -> bool:
+    """Recalculates the maxp table glyph fields (maxPoints, maxContours,
+    maxCompositePoints, maxCompositeContours, maxComponentElements,
+    maxComponentDepth) and the head table font bounding box from the glyph
+    records of the glyf table.  This produces the values of a fontTools save
+    with recalcBBoxes=True without building glyph objects.  Like fontTools,
+    maxSizeOfInstructions is not recalculated, it keeps the value of the
+    update_raw_maxp_table edit or of the in file.  Returns True when a value
+    changed."""
+    metrics = get_raw_glyf_metrics(sfnt)
+    changed: bool = False
+    maxp = bytearray(sfnt["maxp"])
+    if update_maxp and struct.unpack_from(">L", maxp, 0)[0] == MAXP_VERSION_1_0:
+        values = metrics._asdict()
+        for attribute, offset in MAXP_GLYF_FIELD_OFFSETS.values():
+            if struct.unpack_from(">H", maxp, offset)[0] != values[attribute]:
+                struct.pack_into(">H", maxp, offset, values[attribute])
+                changed = True
+        if changed:
+            sfnt["maxp"] = maxp
+    if update_head:
+        head = bytearray(sfnt["head"])
+        bbox = (metrics.x_min, metrics.y_min, metrics.x_max, metrics.y_max)
+        if struct.unpack_from(">4h", head, HEAD_BBOX_OFFSET) != bbox:
+            struct.pack_into(">4h", head, HEAD_BBOX_OFFSET, *bbox)
+            sfnt["head"] = head
+            changed = True
+    return changed
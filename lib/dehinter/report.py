@@ -0,0 +1,87 @@
+# Copyright 2019 Source Foundry Authors and Contributors
+
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+
+#     http://www.apache.org/licenses/LICENSE-2.0
+
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+from typing import Any, Dict, List, NamedTuple, Optional, Tuple
+
+# table field name -> (value before dehinting, value after dehinting)
+TableDelta = Dict[str, Tuple[Any, Any]]
+
+
+class DehintReport(NamedTuple):
+    """The edits that a dehint run made to a font.
+
+    The gasp, maxp, and head deltas only include the fields that changed.  The
+    file sizes are defined when the report is returned by a function that
+    reads and writes font files.  Reports of font collections list the edits
+    of each font in `fonts` and do not define the edit fields."""
+
+    # tags of the removed tables in removal order
+    removed_tables: List[str]
+    # number of glyphs with instruction set bytecode that was removed
+    glyphs_edited: int = 0
+    # number of instruction set bytecode bytes that were removed from glyphs
+    bytecode_removed: int = 0
+    gasp: Optional[TableDelta] = None
+    maxp: Optional[TableDelta] = None
+    head: Optional[TableDelta] = None
+    # in file and out file sizes in bytes
+    in_size: Optional[int] = None
+    out_size: Optional[int] = None
+    # per-font reports of font collections
+    fonts: Optional[List["DehintReport"]] = None
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Returns the report as a dictionary of JSON serializable values."""
+        record = self._asdict()
+        if self.fonts is not None:
+            record["fonts"] = [font.to_dict() for font in self.fonts]
+        for table in ("gasp", "maxp", "head"):
+            if record[table] is not None:
+                record[table] = {
+                    field: {"old": old, "new": new}
+                    for field, (old, new) in record[table].items()
+                }
+        return record
+
+    @classmethod
+    def from_dict(cls, record: Dict[str, Any]) -> "DehintReport":
+        """Returns the report of a dictionary that was returned by to_dict,
+        e.g. after a JSON round trip."""
+        fields = dict(record)
+        if fields.get("fonts") is not None:
+            fields["fonts"] = [cls.from_dict(font) for font in fields["fonts"]]
+        for table in ("gasp", "maxp", "head"):
+            if fields.get(table) is not None:
+                fields[table] = {
+                    field: (_int_keys(values["old"]), _int_keys(values["new"]))
+                    for field, values in fields[table].items()
+                }
+        return cls(**fields)
+
+
+def _int_keys(value: Any) -> Any:
+    # JSON object keys are strings, the gasp table range keys are integers
+    if isinstance(value, dict):
+        return {int(key): item for key, item in value.items()}
+    return value
+
+
+def table_delta(old: Dict[str, Any], new: Dict[str, Any]) -> TableDelta:
+    """Returns the delta of the fields that differ between two snapshots of
+    table field values."""
+    return {
+        field: (old.get(field), value)
+        for field, value in new.items()
+        if old.get(field) != value
+    }
@@ -0,0 +1,362 @@
+# Copyright 2019 Source Foundry Authors and Contributors
+
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+
+#     http://www.apache.org/licenses/LICENSE-2.0
+
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import json
+import os
+import queue
+import signal
+import socket
+import socketserver
+import tempfile
+import threading
+from concurrent.futures import Future, ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+
+from dehinter.batch import BatchResult, dehint_font_file, fsync_out_directories
+from dehinter.cache import DehintCache
+from dehinter.profiling import PhaseTiming
+from dehinter.report import DehintReport
+
+# the tables that are decompiled during dehinting, their fontTools table
+# modules are imported when a worker process starts
+WARM_UP_TABLES = (
+    "cvar",
+    "cvt ",
+    "fpgm",
+    "gasp",
+    "glyf",
+    "hdmx",
+    "head",
+    "loca",
+    "LTSH",
+    "maxp",
+    "prep",
+    "VDMX",
+)
+
+SOCKET_FILE_NAME = "dehinter.sock"
+
+
+def get_default_socket_path() -> str:
+    """Returns the default server socket path: dehinter.sock in the
+    XDG_RUNTIME_DIR directory when it is defined, otherwise a per-user file in
+    the temporary file directory."""
+    runtime_dir = os.environ.get("XDG_RUNTIME_DIR")
+    if runtime_dir:
+        return os.path.join(runtime_dir, SOCKET_FILE_NAME)
+    return os.path.join(
+        tempfile.gettempdir(), f"dehinter-{os.getuid()}-{SOCKET_FILE_NAME}"
+    )
+
+
+# ========================================================
+# Server
+# ========================================================
+class DehintServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    """A dehint server on a Unix domain socket with a pool of `jobs` warm
+    worker processes.
+
+    Clients send newline-delimited JSON requests and receive one JSON response
+    line per request in request order.  Requests are:
+
+        {"op": "dehint", "inpath": ..., "outpath": ..., "options": {...},
+         "fast": false, "flavor": null, "cache_dir": null, "profile": false}
+        {"op": "ping"}
+        {"op": "shutdown"}
+
+    Font file paths are resolved by the server and should be absolute.  The
+    worker process pool is replaced when a worker process exits unexpectedly,
+    the requests that were in progress in the pool fail."""
+
+    daemon_threads = True
+
+    def __init__(self, socket_path: str, jobs: int = 1) -> None:
+        prepare_socket_path(socket_path)
+        self.socket_path = socket_path
+        self.jobs = jobs
+        self.executor = ProcessPoolExecutor(max_workers=jobs)
+        self.executor_lock = threading.Lock()
+        # start and warm up the worker processes before the first request
+        for future in [self.executor.submit(warm_up) for _ in range(jobs)]:
+            future.result()
+        super().__init__(socket_path, DehintRequestHandler)
+
+    def submit(self, fn: Callable, *args: Any) -> Future:
+        """Submits a job to the worker processes.  A pool that is broken by a
+        worker process exit is shut down and replaced by a new pool."""
+        with self.executor_lock:
+            try:
+                return self.executor.submit(fn, *args)
+            except BrokenProcessPool:
+                self.executor.shutdown(wait=False)
+                self.executor = ProcessPoolExecutor(max_workers=self.jobs)
+                return self.executor.submit(fn, *args)
+
+    def server_close(self) -> None:
+        super().server_close()
+        self.executor.shutdown()
+        try:
+            os.remove(self.socket_path)
+        except FileNotFoundError:
+            pass
+
+
+class DehintRequestHandler(socketserver.StreamRequestHandler):
+    """Handles the requests of a client connection.  Dehint requests are
+    submitted to the worker processes as they are read.  The responses are
+    written in request order by a writer thread as soon as they are ready, so
+    that clients can wait for a response before they send the next request."""
+
+    server: DehintServer
+
+    def handle(self) -> None:
+        # (response or dehint request, dehint job) in request order, None after
+        # the last request
+        pending: "queue.Queue[Optional[Tuple[Dict[str, Any], Optional[Future]]]]"
+        pending = queue.Queue()
+        writer = threading.Thread(target=self.write_responses, args=(pending,))
+        writer.start()
+        try:
+            for line in self.rfile:
+                if line.strip():
+                    pending.put(self.read_request(line))
+        finally:
+            pending.put(None)
+            writer.join()
+
+    def read_request(self, line: bytes) -> Tuple[Dict[str, Any], Optional[Future]]:
+        """Returns the response to a request line, or the dehint request and
+        its dehint job."""
+        try:
+            request = json.loads(line)
+            if not isinstance(request, dict):
+                raise ValueError("requests must be JSON objects")
+            op = request.get("op", "dehint")
+            if op == "dehint":
+                return request, self.submit(request)
+        except (TypeError, ValueError) as e:
+            return {"ok": False, "error": f"invalid request: {e}"}, None
+        if op == "ping":
+            return {"ok": True, "pid": os.getpid()}, None
+        if op == "shutdown":
+            # shutdown() waits for serve_forever() to return
+            threading.Thread(target=self.server.shutdown).start()
+            return {"ok": True}, None
+        return {"ok": False, "error": f"unknown op '{op}'"}, None
+
+    def submit(self, request: Dict[str, Any]) -> Future:
+        """Submits a dehint request to the worker processes.  Raises
+        ValueError or TypeError when the request is not valid."""
+        for name in ("inpath", "outpath"):
+            if not isinstance(request.get(name), str):
+                raise ValueError(f"dehint requests require an '{name}' string")
+        cache_dir = request.get("cache_dir")
+        return self.server.submit(
+            dehint_font_file,
+            request["inpath"],
+            request["outpath"],
+            request.get("options", {}),
+            False,
+            request.get("fast", False),
+            request.get("flavor"),
+            DehintCache(cache_dir) if cache_dir else None,
+            request.get("profile", False),
+            1,
+            request.get("fsync", False),
+            request.get("recalc", False),
+            request.get("profile_memory", False),
+        )
+
+    def write_responses(
+        self,
+        pending: "queue.Queue[Optional[Tuple[Dict[str, Any], Optional[Future]]]]",
+    ) -> None:
+        """Writes the responses of the pending requests in request order until
+        the last request.  Dehint requests wait for their dehint job.  The
+        remaining responses are dropped when the client closes the
+        connection."""
+        closed = False
+        while True:
+            item = pending.get()
+            if item is None:
+                return
+            response, future = item
+            if future is not None:
+                try:
+                    response = result_to_message(future.result())
+                except Exception as e:
+                    # e.g. BrokenProcessPool after a worker process exit
+                    response = {
+                        "ok": False,
+                        "error": f"Unable to dehint '{response['inpath']}' -> {str(e)}",
+                    }
+            if closed:
+                continue
+            try:
+                self.wfile.write(json.dumps(response).encode("utf-8") + b"\n")
+                self.wfile.flush()
+            except OSError:
+                closed = True
+
+
+def warm_up() -> None:
+    """Imports the fontTools modules that dehinting uses in a worker
+    process."""
+    from fontTools import ttLib  # type: ignore
+
+    for tag in WARM_UP_TABLES:
+        ttLib.getTableClass(tag)
+
+
+def prepare_socket_path(socket_path: str) -> None:
+    """Removes a stale socket file that no server listens on.  Raises
+    OSError when a server already listens on the socket path."""
+    if not os.path.exists(socket_path):
+        return
+    try:
+        with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+            sock.connect(socket_path)
+    except (ConnectionRefusedError, FileNotFoundError):
+        os.remove(socket_path)
+        return
+    raise OSError(f"a dehinter server is already listening on '{socket_path}'")
+
+
+def serve(socket_path: str, jobs: int = 1) -> None:
+    """Runs a DehintServer until a shutdown request, SIGINT, or SIGTERM.  The
+    socket file is removed when the server stops."""
+    with DehintServer(socket_path, jobs) as server:
+
+        def stop(signum, frame):
+            threading.Thread(target=server.shutdown).start()
+
+        signal.signal(signal.SIGTERM, stop)
+        signal.signal(signal.SIGINT, stop)
+        server.serve_forever()
+
+
+# ========================================================
+# Client
+# ========================================================
+def request_font_files(
+    socket_path: str,
+    requests: List[Tuple[str, str]],
+    options: Dict[str, bool],
+    fast: bool = False,
+    flavor: Optional[str] = None,
+    cache_dir: Optional[str] = None,
+    profile: bool = False,
+    fsync: bool = False,
+    recalc: bool = False,
+    profile_memory: bool = False,
+) -> Iterator[BatchResult]:
+    """Sends (in path, out path) font file requests to a dehint server and
+    returns an iterator over a BatchResult for each request in request order.
+    This has the same options as dehinter.batch.dehint_font_files, the out
+    file directories of `fsync` requests are flushed by the client.  Raises
+    OSError when the server is not available."""
+    messages = [
+        {
+            "op": "dehint",
+            "inpath": os.path.abspath(inpath),
+            "outpath": os.path.abspath(outpath),
+            "options": options,
+            "fast": fast,
+            "flavor": flavor,
+            "cache_dir": os.path.abspath(cache_dir) if cache_dir else None,
+            "profile": profile,
+            "fsync": fsync,
+            "recalc": recalc,
+            "profile_memory": profile_memory,
+        }
+        for inpath, outpath in requests
+    ]
+    responses = send_requests(socket_path, messages)
+    results = (
+        result_from_message(inpath, outpath, response)
+        for (inpath, outpath), response in zip(requests, responses)
+    )
+    return fsync_out_directories(results) if fsync else results
+
+
+def send_requests(
+    socket_path: str, messages: List[Dict[str, Any]]
+) -> Iterator[Dict[str, Any]]:
+    """Sends requests to a dehint server and returns an iterator over the
+    responses.  Raises OSError when the server is not available.
+
+    The requests are sent in a thread while the responses are read, the server
+    writes responses while it reads requests and a client that only reads
+    after it sent all requests would deadlock on large batches."""
+    sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        sock.connect(socket_path)
+    except BaseException:
+        sock.close()
+        raise
+    data = b"".join(json.dumps(m).encode("utf-8") + b"\n" for m in messages)
+    threading.Thread(target=_send_data, args=(sock, data), daemon=True).start()
+    return _read_responses(sock, len(messages))
+
+
+def _send_data(sock: socket.socket, data: bytes) -> None:
+    try:
+        sock.sendall(data)
+        sock.shutdown(socket.SHUT_WR)
+    except OSError:
+        # the reader reports a connection that was closed by the server
+        pass
+
+
+def _read_responses(sock: socket.socket, count: int) -> Iterator[Dict[str, Any]]:
+    with sock, sock.makefile("rb") as f:
+        for _ in range(count):
+            line = f.readline()
+            if not line:
+                raise ConnectionError("the dehinter server closed the connection")
+            yield json.loads(line)
+
+
+def stop_server(socket_path: str) -> None:
+    """Requests a dehint server shutdown.  Raises OSError when the server is
+    not available."""
+    for _ in send_requests(socket_path, [{"op": "shutdown"}]):
+        pass
+
+
+def result_to_message(result: BatchResult) -> Dict[str, Any]:
+    """Returns the JSON serializable response of a BatchResult."""
+    return {
+        "ok": result.ok,
+        "error": result.error,
+        "cached": result.cached,
+        "timings": [timing._asdict() for timing in result.timings],
+        "report": result.report.to_dict() if result.report is not None else None,
+    }
+
+
+def result_from_message(
+    inpath: str, outpath: str, response: Dict[str, Any]
+) -> BatchResult:
+    """Returns the BatchResult of a server response."""
+    report = response.get("report")
+    return BatchResult(
+        inpath,
+        outpath,
+        error=None if response.get("ok") else response.get("error", "server error"),
+        cached=response.get("cached", False),
+        timings=tuple(PhaseTiming(**timing) for timing in response.get("timings", [])),
+        report=DehintReport.from_dict(report) if report is not None else None,
+    )
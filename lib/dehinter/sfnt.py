@@ -0,0 +1,433 @@
+# Copyright 2019 Source Foundry Authors and Contributors
+
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+
+#     http://www.apache.org/licenses/LICENSE-2.0
+
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import array
+import hashlib
+import mmap
+import os
+import struct
+import sys
+from contextlib import contextmanager
+from typing import (
+    BinaryIO,
+    Dict,
+    Hashable,
+    Iterable,
+    Iterator,
+    List,
+    NamedTuple,
+    Optional,
+    Tuple,
+    Union,
+)
+
+from dehinter.system import atomic_write
+
+# sfnt header: sfntVersion, numTables, searchRange, entrySelector, rangeShift
+SFNT_HEADER = struct.Struct(">4sHHHH")
+# table record: tableTag, checksum, offset, length
+TABLE_RECORD = struct.Struct(">4sLLL")
+
+TRUETYPE_SFNT_VERSIONS = (b"\x00\x01\x00\x00", b"\x74\x72\x75\x65")
+
+# TrueType Collection header: ttcTag, version, numFonts
+TTC_HEADER = struct.Struct(">4sLL")
+TTC_TAG = b"ttcf"
+TTC_VERSION_1_0 = 0x00010000
+
+# byte offset of the checkSumAdjustment field in the head table
+HEAD_CHECKSUM_ADJUSTMENT_OFFSET = 8
+# the checkSumAdjustment value is defined as this magic number minus the
+# checksum of the entire font
+CHECKSUM_MAGIC = 0xB1B0AFBA
+# number of bytes that are copied at a time during checksum calculations
+CHECKSUM_CHUNK_SIZE = 1 << 20
+# maximum number of buffers in a single writev system call
+IOV_MAX = 1024
+
+TableData = Union[bytes, bytearray, memoryview]
+
+
+class SFNTError(Exception):
+    """Raised when font binary data cannot be parsed as an sfnt font."""
+
+
+class TableRecord(NamedTuple):
+    tag: str
+    checksum: int
+    offset: int
+    length: int
+
+
+def calc_checksum(data: TableData) -> int:
+    """Returns the OpenType checksum of a table, the sum of the data as big
+    endian uint32 values (zero padded to a four byte boundary).  The data are
+    read in fixed size chunks so that large tables are not copied in full."""
+    data = memoryview(data)
+    checksum = 0
+    for start in range(0, len(data), CHECKSUM_CHUNK_SIZE):
+        end = start + CHECKSUM_CHUNK_SIZE
+        chunk = data[start:end]
+        values = array.array("I")
+        remainder = len(chunk) % 4
+        if remainder:
+            values.frombytes(bytes(chunk) + b"\x00" * (4 - remainder))
+        else:
+            values.frombytes(chunk)
+        if sys.byteorder == "little":
+            values.byteswap()
+        checksum += sum(values)
+    return checksum & 0xFFFFFFFF
+
+
+def pad_length(length: int) -> int:
+    """Returns the table length padded to a four byte boundary."""
+    return (length + 3) & ~3
+
+
+class SFNTFont(object):
+    """A byte-level view of an sfnt TrueType font.
+
+    Tables are held as slices of the original font data and are only copied
+    when they are replaced.  Tables can be accessed, replaced, and removed with
+    the same mapping interface that fontTools.ttLib.TTFont objects use.
+
+    The fonts in a TrueType Collection share a `table_cache` dictionary that
+    dehinting routines use to reuse the edits of tables that are shared between
+    the fonts.
+
+    The `flavor` attribute defines the font binary format that is written when
+    the font is compiled: None for an sfnt font, "woff", or "woff2"."""
+
+    flavor: Optional[str] = None
+
+    def __init__(
+        self, data: TableData, offset: int = 0, table_cache: Optional[Dict] = None
+    ) -> None:
+        self.data = memoryview(data)
+        self.table_cache = table_cache
+        if len(self.data) < offset + SFNT_HEADER.size:
+            raise SFNTError("font data is too short to contain an sfnt header")
+        sfnt_version, num_tables, _, _, _ = SFNT_HEADER.unpack_from(self.data, offset)
+        if sfnt_version not in TRUETYPE_SFNT_VERSIONS:
+            raise SFNTError(f"unsupported sfnt version {sfnt_version!r}")
+        self.sfnt_version: bytes = sfnt_version
+        self.records: List[TableRecord] = []
+        self.tables: Dict[str, TableData] = {}
+        # (offset, length) of the tables that still hold the original font data
+        self.sources: Dict[str, Tuple[int, int]] = {}
+
+        records_start = offset + SFNT_HEADER.size
+        records_end = records_start + num_tables * TABLE_RECORD.size
+        if len(self.data) < records_end:
+            raise SFNTError("font data is too short to contain the table directory")
+        for tag_bytes, checksum, table_offset, length in TABLE_RECORD.iter_unpack(
+            self.data[records_start:records_end]
+        ):
+            tag = tag_bytes.decode("latin-1")
+            table_end = table_offset + length
+            if table_end > len(self.data):
+                raise SFNTError(f"'{tag}' table extends beyond the end of the font")
+            self.records.append(TableRecord(tag, checksum, table_offset, length))
+            self.tables[tag] = self.data[table_offset:table_end]
+            self.sources[tag] = (table_offset, length)
+
+    def __contains__(self, tag: str) -> bool:
+        return tag in self.tables
+
+    def __getitem__(self, tag: str) -> TableData:
+        return self.tables[tag]
+
+    def __setitem__(self, tag: str, data: TableData) -> None:
+        self.tables[tag] = data
+        self.sources.pop(tag, None)
+
+    def __delitem__(self, tag: str) -> None:
+        del self.tables[tag]
+        self.sources.pop(tag, None)
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self.tables)
+
+    def keys(self) -> List[str]:
+        return list(self.tables)
+
+    def table_order(self) -> List[str]:
+        """Returns the table tags in the order of the table data in the original
+        font data, followed by the tags of the tables that were added to the
+        font in tag order.  Tables that were replaced keep the position of the
+        original table data."""
+        order = [
+            record.tag
+            for record in sorted(self.records, key=lambda record: record.offset)
+            if record.tag in self.tables
+        ]
+        original_tags = set(order)
+        return order + sorted(tag for tag in self.tables if tag not in original_tags)
+
+    def source_range(self, tag: str) -> Optional[Tuple[int, int]]:
+        """Returns the (offset, length) of a table in the original font data,
+        or None when the table was replaced or is not in the font."""
+        return self.sources.get(tag)
+
+    def compile(self) -> bytes:
+        """Returns the font binary with a new table directory, table checksums,
+        and head table checkSumAdjustment."""
+        return b"".join(self.iter_compile())
+
+    def iter_compile(self) -> Iterator[TableData]:
+        """Yields the font binary in the format of the `flavor` attribute in
+        chunks.  Unmodified tables are yielded as slices of the original font
+        data."""
+        if self.flavor is None:
+            return self.iter_compile_sfnt()
+        from dehinter.woff import iter_compile_woff, iter_compile_woff2
+
+        if self.flavor == "woff":
+            return iter_compile_woff(self)
+        if self.flavor == "woff2":
+            return iter_compile_woff2(self)
+        raise SFNTError(f"unsupported font flavor '{self.flavor}'")
+
+    def iter_compile_sfnt(self) -> Iterator[TableData]:
+        """Yields the sfnt font binary in chunks."""
+        directories, table_chunks = compile_font_tables([self], 0)
+        yield from directories
+        yield from table_chunks
+
+    def save(
+        self, filepath: Union[str, "os.PathLike[str]"], fsync: bool = False
+    ) -> None:
+        """Writes the font binary to a file path.  Unmodified tables are
+        written directly from the original font data without a copy.  The
+        font is written with atomic_write, `fsync` flushes it to storage
+        before it is renamed to the file path."""
+        chunks = self.iter_compile()
+        with atomic_write(filepath, fsync) as f:
+            write_chunks(f, chunks)
+
+    def close(self) -> None:
+        """Releases the table slices of the original font data.  This must be
+        called before a memory map of the font data is closed."""
+        self.tables.clear()
+        self.data.release()
+
+
+class SFNTCollection(object):
+    """A byte-level view of a TrueType Collection.
+
+    Tables that are shared between the fonts in the collection are written
+    once when the collection is compiled."""
+
+    def __init__(self, data: TableData) -> None:
+        self.data = memoryview(data)
+        if len(self.data) < TTC_HEADER.size:
+            raise SFNTError("font data is too short to contain a ttcf header")
+        tag, _, num_fonts = TTC_HEADER.unpack_from(self.data, 0)
+        if tag != TTC_TAG:
+            raise SFNTError(f"unsupported font collection tag {tag!r}")
+        if len(self.data) < TTC_HEADER.size + 4 * num_fonts:
+            raise SFNTError("font data is too short to contain the ttcf header")
+        offsets = struct.unpack_from(f">{num_fonts}L", self.data, TTC_HEADER.size)
+        table_cache: Dict = {}
+        self.fonts: List[SFNTFont] = [
+            SFNTFont(self.data, offset, table_cache) for offset in offsets
+        ]
+
+    def compile(self) -> bytes:
+        """Returns the collection binary."""
+        return b"".join(self.iter_compile())
+
+    def iter_compile(self) -> Iterator[TableData]:
+        """Yields the collection binary in chunks.  Unmodified tables are yielded
+        as slices of the original font data."""
+        num_fonts = len(self.fonts)
+        header = bytearray(TTC_HEADER.pack(TTC_TAG, TTC_VERSION_1_0, num_fonts))
+        directories_start = TTC_HEADER.size + 4 * num_fonts
+        directories, table_chunks = compile_font_tables(self.fonts, directories_start)
+        offset = directories_start
+        for directory in directories:
+            header += struct.pack(">L", offset)
+            offset += len(directory)
+        yield header
+        yield from directories
+        yield from table_chunks
+
+    def save(
+        self, filepath: Union[str, "os.PathLike[str]"], fsync: bool = False
+    ) -> None:
+        """Writes the collection binary to a file path.  Unmodified tables are
+        written directly from the original font data without a copy.  The
+        collection is written with atomic_write."""
+        with atomic_write(filepath, fsync) as f:
+            write_chunks(f, self.iter_compile())
+
+    def close(self) -> None:
+        """Releases the table slices of the original font data.  This must be
+        called before a memory map of the font data is closed."""
+        for font in self.fonts:
+            font.close()
+        self.data.release()
+
+
+def read_sfnt(data: TableData) -> Union[SFNTFont, SFNTCollection]:
+    """Returns an SFNTCollection for TrueType Collection data and an SFNTFont
+    for all other font data.  WOFF and WOFF2 font data are returned as an
+    SFNTFont with the matching `flavor` attribute."""
+    signature = bytes(data[:4])
+    if signature == TTC_TAG:
+        return SFNTCollection(data)
+    if signature in (b"wOFF", b"wOF2"):
+        from dehinter.woff import WOFF_SIGNATURE, WOFFFont, read_woff2
+
+        if signature == WOFF_SIGNATURE:
+            return WOFFFont(data)
+        return read_woff2(data)
+    return SFNTFont(data)
+
+
+def compile_font_tables(
+    fonts: List[SFNTFont], start: int
+) -> Tuple[List[bytearray], List[TableData]]:
+    """Lays out the table directories and table data of one or more fonts that
+    are written consecutively from the byte offset `start`.  Returns the table
+    directory binaries and the padded table data chunks.
+
+    The table records are sorted by tag and the table data are written in the
+    order of the original font data, see SFNTFont.table_order, so that the
+    tables that are not edited keep their relative layout and successive
+    dehints of a font produce minimal binary diffs.  Tables with the same data
+    are written once and shared by the fonts.  The
+    head table checkSumAdjustment is defined by the first font that writes it."""
+    directory_sizes = [
+        SFNT_HEADER.size + len(font.tables) * TABLE_RECORD.size for font in fonts
+    ]
+    offset = start + sum(directory_sizes)
+    table_chunks: List[TableData] = []
+    # table data key -> (offset, checksum, length) of the written table data
+    written: Dict[Hashable, Tuple[int, int, int]] = {}
+    data_keys: Dict[int, Hashable] = {}
+    directories: List[bytearray] = []
+
+    for font in fonts:
+        records: List[TableRecord] = []
+        font_checksum = 0
+        head_data = None
+        for tag in font.table_order():
+            data = font[tag]
+            source = font.source_range(tag)
+            if source is not None:
+                key: Hashable = ("source", source)
+            elif id(data) in data_keys:
+                key = data_keys[id(data)]
+            else:
+                key = ("data", len(data), hashlib.sha1(data).digest())
+                data_keys[id(data)] = key
+            if key not in written:
+                if tag == "head":
+                    # checkSumAdjustment must be zero during the checksum
+                    # calculations, it is defined below
+                    data = head_data = bytearray(data)
+                    struct.pack_into(">L", data, HEAD_CHECKSUM_ADJUSTMENT_OFFSET, 0)
+                written[key] = (offset, calc_checksum(data), len(data))
+                table_chunks.append(data)
+                padding = pad_length(len(data)) - len(data)
+                if padding:
+                    table_chunks.append(b"\x00" * padding)
+                offset += pad_length(len(data))
+            table_offset, checksum, length = written[key]
+            records.append(TableRecord(tag, checksum, table_offset, length))
+            font_checksum += checksum
+
+        directory = build_table_directory(font.sfnt_version, records)
+        font_checksum = (font_checksum + calc_checksum(directory)) & 0xFFFFFFFF
+        if head_data is not None:
+            struct.pack_into(
+                ">L",
+                head_data,
+                HEAD_CHECKSUM_ADJUSTMENT_OFFSET,
+                (CHECKSUM_MAGIC - font_checksum) & 0xFFFFFFFF,
+            )
+        directories.append(directory)
+    return directories, table_chunks
+
+
+def build_table_directory(sfnt_version: bytes, records: List[TableRecord]) -> bytearray:
+    """Returns the binary sfnt header and table records of a table directory."""
+    num_tables = len(records)
+    entry_selector = max(num_tables, 1).bit_length() - 1
+    search_range = (1 << entry_selector) * 16
+    range_shift = num_tables * 16 - search_range
+    directory = bytearray(
+        SFNT_HEADER.pack(
+            sfnt_version, num_tables, search_range, entry_selector, range_shift
+        )
+    )
+    for record in sorted(records):
+        directory += TABLE_RECORD.pack(
+            record.tag.encode("latin-1"), record.checksum, record.offset, record.length
+        )
+    return directory
+
+
+def write_chunks(f: BinaryIO, chunks: Iterable[TableData]) -> None:
+    """Writes a sequence of byte buffers to an open binary file.  Buffers are
+    written with os.writev gather writes where it is available and the file
+    has a file descriptor, e.g. not for io.BytesIO objects."""
+    try:
+        fd: Optional[int] = f.fileno()
+    except (AttributeError, OSError):
+        # io.UnsupportedOperation is an OSError
+        fd = None
+    if fd is None or not hasattr(os, "writev"):
+        for chunk in chunks:
+            f.write(chunk)
+        return
+
+    f.flush()
+    buffers = [memoryview(chunk) for chunk in chunks if len(chunk) > 0]
+    index = 0
+    while index < len(buffers):
+        end = index + IOV_MAX
+        written = os.writev(fd, buffers[index:end])
+        # drop buffers that were written in full and trim a partial write
+        while index < len(buffers) and written >= len(buffers[index]):
+            written -= len(buffers[index])
+            index += 1
+        if written:
+            buffers[index] = buffers[index][written:]
+
+
+@contextmanager
+def open_sfnt(
+    filepath: Union[str, "os.PathLike[str]"],
+) -> Iterator[Union[SFNTFont, SFNTCollection]]:
+    """Opens a font file as an SFNTFont, or as an SFNTCollection for TrueType
+    Collection files, over a read-only memory map of the file.  Table data are
+    only paged in from the file when they are read."""
+    with open(filepath, "rb") as f:
+        mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    try:
+        sfnt = read_sfnt(memoryview(mm))
+        try:
+            yield sfnt
+        finally:
+            sfnt.close()
+    finally:
+        try:
+            mm.close()
+        except BufferError:
+            # table data slices are still referenced outside of the font object,
+            # the memory map is closed when they are garbage collected
+            pass
@@ -0,0 +1,188 @@
+# Copyright 2019 Source Foundry Authors and Contributors
+
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+
+#     http://www.apache.org/licenses/LICENSE-2.0
+
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import json
+import os
+from typing import Dict, List, NamedTuple, Optional, Set, Tuple, Union
+
+from dehinter.batch import BatchResult, dehint_font_files
+from dehinter.cache import hash_file, options_key
+from dehinter.font import FLAVOR_FILE_EXTENSIONS
+from dehinter.paths import find_font_files
+from dehinter.system import atomic_write, fsync_directory
+
+# sync state file that is written in the destination directory
+MANIFEST_FILE_NAME = ".dehinter-sync.json"
+MANIFEST_VERSION = 1
+
+
+class SyncResult(NamedTuple):
+    """The outcome of a directory sync.  Paths are relative to the source and
+    destination directories."""
+
+    # source font files that were dehinted
+    dehinted: List[str]
+    # source font files with a dehinted font that is up to date
+    unchanged: List[str]
+    # destination font files that were removed with their source font file
+    removed: List[str]
+    failures: List[BatchResult]
+
+
+def sync_directory(
+    src_dir: Union[str, "os.PathLike[str]"],
+    dst_dir: Union[str, "os.PathLike[str]"],
+    options: Dict[str, bool],
+    jobs: int = 1,
+    verbose: bool = False,
+    fast: bool = False,
+    flavor: Optional[str] = None,
+    fsync: bool = False,
+    recalc: bool = False,
+) -> SyncResult:
+    """Mirrors the font files in a source directory tree as dehinted font files
+    in a destination directory tree.
+
+    A font is dehinted when it is new, when its size, modification time and
+    content hash changed, when its dehinted font is missing, or when the dehint
+    options changed since the last sync.  Dehinted fonts of source fonts that
+    were removed are deleted.  Sync state is kept in a manifest file in the
+    destination directory.  With `fsync`, the dehinted fonts and the manifest
+    are flushed to storage before they are renamed, and their directories are
+    flushed once at the end of the sync.  `recalc` recalculates bounding boxes
+    as in dehinter.batch.dehint_font_file."""
+    src_dir = os.fspath(src_dir)
+    dst_dir = os.fspath(dst_dir)
+    manifest = read_manifest(dst_dir)
+    sync_options = options_key(options, fast, flavor, recalc)
+    previous_files: Dict[str, Dict] = manifest.get("files", {})
+    if manifest.get("options") == sync_options:
+        current_files = dict(previous_files)
+    else:
+        current_files = {}
+
+    requests: List[Tuple[str, str]] = []
+    request_files: Dict[str, Tuple[str, Dict]] = {}
+    unchanged: List[str] = []
+    src_paths: Set[str] = set()
+    for inpath in find_font_files(src_dir):
+        src_path = os.path.relpath(inpath, src_dir)
+        src_paths.add(src_path)
+        dst_path = get_sync_out_path(src_path, flavor)
+        outpath = os.path.join(dst_dir, dst_path)
+        stat = os.stat(inpath)
+        entry: Dict = {
+            "size": stat.st_size,
+            "mtime_ns": stat.st_mtime_ns,
+            "output": dst_path,
+        }
+        previous = current_files.get(src_path)
+        if previous is not None and os.path.isfile(outpath):
+            if (previous["size"], previous["mtime_ns"]) == (
+                entry["size"],
+                entry["mtime_ns"],
+            ):
+                unchanged.append(src_path)
+                continue
+            # the file was touched or copied, it is only dehinted again when
+            # the file contents changed
+            entry["sha256"] = hash_file(inpath)
+            if entry["sha256"] == previous["sha256"]:
+                current_files[src_path] = entry
+                unchanged.append(src_path)
+                continue
+        else:
+            entry["sha256"] = hash_file(inpath)
+        os.makedirs(os.path.dirname(outpath) or ".", exist_ok=True)
+        requests.append((inpath, outpath))
+        request_files[inpath] = (src_path, entry)
+
+    dehinted: List[str] = []
+    failures: List[BatchResult] = []
+    for result in dehint_font_files(
+        requests,
+        options,
+        jobs=jobs,
+        verbose=verbose,
+        fast=fast,
+        flavor=flavor,
+        fsync=fsync,
+        recalc=recalc,
+    ):
+        src_path, entry = request_files[result.inpath]
+        if result.ok:
+            current_files[src_path] = entry
+            dehinted.append(src_path)
+        else:
+            # failed fonts are processed again in the next sync
+            current_files.pop(src_path, None)
+            failures.append(result)
+
+    # remove the dehinted fonts of source fonts that were removed and the
+    # dehinted fonts that were written in a previous output format
+    removed: List[str] = []
+    for src_path in list(current_files):
+        if src_path not in src_paths:
+            del current_files[src_path]
+    current_outputs = {entry["output"] for entry in current_files.values()}
+    current_outputs.update(
+        get_sync_out_path(src_path, flavor) for src_path in src_paths
+    )
+    for previous in previous_files.values():
+        if previous["output"] not in current_outputs:
+            outpath = os.path.join(dst_dir, previous["output"])
+            if os.path.isfile(outpath):
+                os.remove(outpath)
+                removed.append(previous["output"])
+
+    write_manifest(
+        dst_dir,
+        {"version": MANIFEST_VERSION, "options": sync_options, "files": current_files},
+        fsync,
+    )
+    return SyncResult(sorted(dehinted), sorted(unchanged), sorted(removed), failures)
+
+
+def get_sync_out_path(src_path: str, flavor: Optional[str]) -> str:
+    """Returns the destination directory relative path of the dehinted font of a
+    source directory relative font file path."""
+    if flavor is None:
+        return src_path
+    return os.path.splitext(src_path)[0] + FLAVOR_FILE_EXTENSIONS[flavor]
+
+
+def read_manifest(dst_dir: str) -> Dict:
+    """Returns the sync manifest in a destination directory, or an empty
+    manifest when the directory has not been synced with this manifest
+    version."""
+    try:
+        with open(os.path.join(dst_dir, MANIFEST_FILE_NAME), "r") as f:
+            manifest = json.load(f)
+    except (OSError, ValueError):
+        return {}
+    if not isinstance(manifest, dict) or manifest.get("version") != MANIFEST_VERSION:
+        return {}
+    return manifest
+
+
+def write_manifest(dst_dir: str, manifest: Dict, fsync: bool = False) -> None:
+    """Writes the sync manifest in a destination directory with atomic_write,
+    so that an interrupted write does not leave a partial manifest.  With
+    `fsync`, the manifest and the destination directory are flushed to
+    storage."""
+    os.makedirs(dst_dir, exist_ok=True)
+    with atomic_write(os.path.join(dst_dir, MANIFEST_FILE_NAME), fsync) as f:
+        f.write(json.dumps(manifest, indent=1, sort_keys=True).encode("utf-8"))
+    if fsync:
+        fsync_directory(dst_dir)
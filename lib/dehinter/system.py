@@ -13,12 +13,26 @@
 # limitations under the License.
 
 import os
-from typing import Tuple, Union
+from contextlib import contextmanager
+from typing import BinaryIO, Iterator, Tuple, Union
+
+# temporary out files are hidden files in the out file directory that are not
+# found by the font file directory search
+TEMP_OUT_FILE_PREFIX = ".dehinter-"
+TEMP_OUT_FILE_SUFFIX = ".tmp"
+
+# attempts to create a temporary out file with a name that is not taken
+TEMP_OUT_FILE_ATTEMPTS = 100
 
 
 def get_filesize(filepath: Union[str, bytes, "os.PathLike[str]"]) -> Tuple[str, str]:
     """Returns formatted file size tuple fit for printing to end user."""
-    filesize = os.path.getsize(filepath)
+    return format_size(os.path.getsize(filepath))
+
+
+def format_size(filesize: int) -> Tuple[str, str]:
+    """Returns formatted size tuple of a number of bytes fit for printing to end
+    user."""
     kb_factor = 1 << 10
     mb_factor = 1 << 20
 
@@ -33,3 +47,65 @@ def get_filesize(filepath: Union[str, bytes, "os.PathLike[str]"]) -> Tuple[str,
         formatted_filesize = filesize / float(mb_factor)
 
     return "{0:.2f}".format(formatted_filesize), size_string
+
+
+@contextmanager
+def atomic_write(
+    filepath: Union[str, "os.PathLike[str]"], fsync: bool = False
+) -> Iterator[BinaryIO]:
+    """Opens a temporary file in the directory of `filepath` for binary writes.
+    The file is renamed to `filepath` when the block exits without an
+    exception and is removed otherwise, so that readers of `filepath` never
+    see a partial file.  With `fsync`, the file data are flushed to storage
+    before the rename.  The renamed directory entry is only durable once the
+    directory is flushed with fsync_directory.
+
+    The file is created with the permissions of a file that is created with
+    open(), the process umask is applied by the kernel."""
+    dir_path = os.path.dirname(os.path.abspath(filepath))
+    fd, temp_path = _create_temp_file(dir_path)
+    try:
+        with os.fdopen(fd, "wb") as f:
+            yield f
+            f.flush()
+            if fsync:
+                os.fsync(f.fileno())
+        os.replace(temp_path, filepath)
+    except BaseException:
+        os.remove(temp_path)
+        raise
+
+
+def fsync_directory(dirpath: Union[str, "os.PathLike[str]"]) -> None:
+    """Flushes the directory entries of a directory to storage, e.g. after
+    files were renamed into it.  This is a no-op on platforms and file systems
+    that do not support directory fsync."""
+    try:
+        fd = os.open(dirpath, os.O_RDONLY)
+    except OSError:
+        return
+    try:
+        os.fsync(fd)
+    except OSError:
+        pass
+    finally:
+        os.close(fd)
+
+
+def _create_temp_file(dir_path: str) -> Tuple[int, str]:
+    # tempfile.mkstemp creates files that are only readable by the owner
+    flags = (
+        os.O_WRONLY
+        | os.O_CREAT
+        | os.O_EXCL
+        | getattr(os, "O_BINARY", 0)
+        | getattr(os, "O_CLOEXEC", 0)
+    )
+    for _ in range(TEMP_OUT_FILE_ATTEMPTS):
+        name = TEMP_OUT_FILE_PREFIX + os.urandom(8).hex() + TEMP_OUT_FILE_SUFFIX
+        temp_path = os.path.join(dir_path, name)
+        try:
+            return os.open(temp_path, flags, 0o666), temp_path
+        except FileExistsError:
+            continue
+    raise FileExistsError(f"unable to create a temporary file in '{dir_path}'")
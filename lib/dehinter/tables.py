@@ -0,0 +1,88 @@
+# Copyright 2019 Source Foundry Authors and Contributors
+
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+
+#     http://www.apache.org/licenses/LICENSE-2.0
+
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+from typing import Dict, Iterable, List, NamedTuple, Tuple
+
+
+class TableSpec(NamedTuple):
+    """A hinting table that the dehint routines remove."""
+
+    tag: str
+    # the dehint keyword argument that keeps the table in the font
+    keep_option: str
+    # the table name in verbose output
+    label: str
+    # the table is only removed from variable fonts
+    variable_only: bool = False
+    # head table flags bit 4 must remain set while the table is in the font
+    requires_head_flag_bit_4: bool = False
+
+    @property
+    def phase(self) -> str:
+        """The profiler phase name of the table removal."""
+        return f"remove_{self.label.lower()}_table"
+
+
+# Microsoft Visual TrueType (VTT) private tables with the hinting sources
+VTT_TABLE_TAGS = (
+    "TSI0",
+    "TSI1",
+    "TSI2",
+    "TSI3",
+    "TSI5",
+    "TSIB",
+    "TSIC",
+    "TSID",
+    "TSIJ",
+    "TSIP",
+    "TSIS",
+    "TSIV",
+)
+
+# hinting tables in removal order.  A new hinting table is supported by the
+# fontTools and raw dehint routines once it is added here with a keep option
+# in the dehint keyword arguments.
+HINTING_TABLES: Tuple[TableSpec, ...] = (
+    TableSpec("cvar", "keep_cvar", "cvar", variable_only=True),
+    TableSpec("cvt ", "keep_cvt", "cvt"),
+    TableSpec("fpgm", "keep_fpgm", "fpgm"),
+    TableSpec("hdmx", "keep_hdmx", "hdmx", requires_head_flag_bit_4=True),
+    TableSpec("LTSH", "keep_ltsh", "LTSH", requires_head_flag_bit_4=True),
+    TableSpec("prep", "keep_prep", "prep"),
+    TableSpec("TTFA", "keep_ttfa", "TTFA"),
+    TableSpec("VDMX", "keep_vdmx", "VDMX"),
+    *(TableSpec(tag, "keep_tsi", tag) for tag in VTT_TABLE_TAGS),
+)
+
+# tables that keep head table flags bit 4 set
+HEAD_FLAG_BIT_4_TABLES = frozenset(
+    spec.tag for spec in HINTING_TABLES if spec.requires_head_flag_bit_4
+)
+
+
+def get_removed_tables(
+    tags: Iterable[str], options: Dict[str, bool]
+) -> List[TableSpec]:
+    """Returns the specs of the hinting tables that are removed from a font with
+    the table tags in `tags` and the dehint keep_* `options`, in removal order.
+    The table directory is scanned once."""
+    tag_set = set(tags)
+    is_variable_font = "fvar" in tag_set
+    return [
+        spec
+        for spec in HINTING_TABLES
+        if spec.tag in tag_set
+        and not options.get(spec.keep_option, False)
+        and (is_variable_font or not spec.variable_only)
+    ]
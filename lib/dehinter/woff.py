@@ -0,0 +1,333 @@
+# Copyright 2019 Source Foundry Authors and Contributors
+
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+
+#     http://www.apache.org/licenses/LICENSE-2.0
+
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import io
+import struct
+import zlib
+from typing import Dict, Iterator, List, NamedTuple, Optional, Set, Tuple
+
+from dehinter.sfnt import (
+    CHECKSUM_MAGIC,
+    HEAD_CHECKSUM_ADJUSTMENT_OFFSET,
+    SFNT_HEADER,
+    TABLE_RECORD,
+    TRUETYPE_SFNT_VERSIONS,
+    SFNTError,
+    SFNTFont,
+    TableData,
+    TableRecord,
+    build_table_directory,
+    calc_checksum,
+    pad_length,
+)
+
+# WOFF header: signature, flavor, length, numTables, reserved, totalSfntSize,
+# majorVersion, minorVersion, metaOffset, metaLength, metaOrigLength,
+# privOffset, privLength
+WOFF_HEADER = struct.Struct(">4s4sLHHLHHLLLLL")
+# WOFF table directory entry: tag, offset, compLength, origLength, origChecksum
+WOFF_TABLE_ENTRY = struct.Struct(">4sLLLL")
+WOFF_SIGNATURE = b"wOFF"
+WOFF2_SIGNATURE = b"wOF2"
+# zlib compression level of the fontTools WOFF writer
+ZLIB_COMPRESSION_LEVEL = 6
+
+
+class WOFFTableEntry(NamedTuple):
+    """A table directory entry in a WOFF font."""
+
+    offset: int
+    comp_length: int
+    orig_length: int
+    orig_checksum: int
+
+
+class WOFFFont(SFNTFont):
+    """A byte-level view of a WOFF TrueType font.
+
+    Tables are decompressed the first time they are read.  Tables that are not
+    replaced keep their compressed bytes and are written without a decompress
+    and recompress when the font is saved with the WOFF flavor.  The extended
+    metadata and private data blocks are carried over to WOFF output."""
+
+    flavor = "woff"
+
+    def __init__(self, data: TableData) -> None:
+        self.data = memoryview(data)
+        self.table_cache = None
+        if len(self.data) < WOFF_HEADER.size:
+            raise SFNTError("font data is too short to contain a WOFF header")
+        (
+            signature,
+            sfnt_version,
+            _,
+            num_tables,
+            _,
+            _,
+            major_version,
+            minor_version,
+            meta_offset,
+            meta_length,
+            meta_orig_length,
+            priv_offset,
+            priv_length,
+        ) = WOFF_HEADER.unpack_from(self.data, 0)
+        if signature != WOFF_SIGNATURE:
+            raise SFNTError(f"unsupported WOFF signature {signature!r}")
+        if sfnt_version not in TRUETYPE_SFNT_VERSIONS:
+            raise SFNTError(f"unsupported sfnt version {sfnt_version!r}")
+        self.sfnt_version: bytes = sfnt_version
+        self.version: Tuple[int, int] = (major_version, minor_version)
+        self.metadata: Optional[Tuple[TableData, int]] = None
+        if meta_length:
+            meta_data = self._slice(meta_offset, meta_length, "metadata block")
+            self.metadata = (meta_data, meta_orig_length)
+        self.private_data: Optional[TableData] = None
+        if priv_length:
+            self.private_data = self._slice(priv_offset, priv_length, "private block")
+
+        self.records: List[TableRecord] = []
+        self.tables: Dict[str, TableData] = {}
+        self.sources: Dict[str, Tuple[int, int]] = {}
+        self.entries: Dict[str, WOFFTableEntry] = {}
+        # tables that still hold compressed data in self.tables
+        self.compressed: Set[str] = set()
+
+        entries_start = WOFF_HEADER.size
+        entries_end = entries_start + num_tables * WOFF_TABLE_ENTRY.size
+        if len(self.data) < entries_end:
+            raise SFNTError("font data is too short to contain the table directory")
+        for (
+            tag_bytes,
+            table_offset,
+            comp_length,
+            orig_length,
+            orig_checksum,
+        ) in WOFF_TABLE_ENTRY.iter_unpack(self.data[entries_start:entries_end]):
+            tag = tag_bytes.decode("latin-1")
+            if comp_length > orig_length:
+                raise SFNTError(f"invalid WOFF compressed length for '{tag}' table")
+            self.records.append(
+                TableRecord(tag, orig_checksum, table_offset, orig_length)
+            )
+            self.tables[tag] = self._slice(table_offset, comp_length, f"'{tag}' table")
+            self.sources[tag] = (table_offset, comp_length)
+            self.entries[tag] = WOFFTableEntry(
+                table_offset, comp_length, orig_length, orig_checksum
+            )
+            if comp_length < orig_length:
+                self.compressed.add(tag)
+
+    def _slice(self, offset: int, length: int, name: str) -> memoryview:
+        end = offset + length
+        if end > len(self.data):
+            raise SFNTError(f"{name} extends beyond the end of the font")
+        return self.data[offset:end]
+
+    def __getitem__(self, tag: str) -> TableData:
+        if tag in self.compressed:
+            data = zlib.decompress(self.tables[tag])
+            if len(data) != self.entries[tag].orig_length:
+                raise SFNTError(f"invalid WOFF decompressed length for '{tag}' table")
+            self.tables[tag] = data
+            self.compressed.discard(tag)
+        return self.tables[tag]
+
+    def __setitem__(self, tag: str, data: TableData) -> None:
+        super().__setitem__(tag, data)
+        self.compressed.discard(tag)
+
+    def __delitem__(self, tag: str) -> None:
+        super().__delitem__(tag)
+        self.compressed.discard(tag)
+
+    def woff_table_entry(self, tag: str) -> Optional[WOFFTableEntry]:
+        """Returns the WOFF table directory entry of a table that was not
+        replaced, or None when the table was replaced or is not in the font."""
+        if tag not in self.sources:
+            return None
+        return self.entries[tag]
+
+    def close(self) -> None:
+        self.metadata = None
+        self.private_data = None
+        super().close()
+
+
+def iter_compile_woff(font: SFNTFont) -> Iterator[TableData]:
+    """Yields the WOFF binary of a font in chunks.  The tables of a WOFFFont
+    that were not replaced are yielded as slices of their original compressed
+    bytes.  All other tables are compressed with zlib when that reduces their
+    size."""
+    tags = sorted(font.keys())
+    # (tag, orig_length, orig_checksum, table data written to the WOFF font)
+    tables: List[Tuple[str, int, int, TableData]] = []
+    head_data: Optional[bytearray] = None
+    for tag in tags:
+        entry = font.woff_table_entry(tag) if isinstance(font, WOFFFont) else None
+        if tag == "head":
+            # checkSumAdjustment must be zero during the checksum calculations,
+            # the table is compressed once it is defined below
+            head_data = bytearray(font[tag])
+            struct.pack_into(">L", head_data, HEAD_CHECKSUM_ADJUSTMENT_OFFSET, 0)
+            tables.append((tag, len(head_data), calc_checksum(head_data), head_data))
+        elif entry is not None:
+            start = entry.offset
+            end = start + entry.comp_length
+            tables.append(
+                (tag, entry.orig_length, entry.orig_checksum, font.data[start:end])
+            )
+        else:
+            data = font[tag]
+            tables.append((tag, len(data), calc_checksum(data), _compress(data)))
+
+    # the head table checkSumAdjustment is defined with the checksum of the
+    # uncompressed sfnt font that the WOFF font decodes to, with the table data
+    # in the order of the original font data as in the sfnt flavor
+    table_order = font.table_order()
+    table_lengths = {tag: orig_length for tag, orig_length, _, _ in tables}
+    sfnt_offset = SFNT_HEADER.size + len(tables) * TABLE_RECORD.size
+    sfnt_offsets: Dict[str, int] = {}
+    for tag in table_order:
+        sfnt_offsets[tag] = sfnt_offset
+        sfnt_offset += pad_length(table_lengths[tag])
+    records = [
+        TableRecord(tag, orig_checksum, sfnt_offsets[tag], orig_length)
+        for tag, orig_length, orig_checksum, _ in tables
+    ]
+    directory = build_table_directory(font.sfnt_version, records)
+    font_checksum = calc_checksum(directory) + sum(r.checksum for r in records)
+    if head_data is not None:
+        struct.pack_into(
+            ">L",
+            head_data,
+            HEAD_CHECKSUM_ADJUSTMENT_OFFSET,
+            (CHECKSUM_MAGIC - font_checksum) & 0xFFFFFFFF,
+        )
+        tables = [
+            (
+                tag,
+                orig_length,
+                orig_checksum,
+                _compress(data) if tag == "head" else data,
+            )
+            for tag, orig_length, orig_checksum, data in tables
+        ]
+
+    # the table directory entries are sorted by tag and the table data are
+    # written in the order of the original font data
+    chunks: List[TableData] = []
+    offset = WOFF_HEADER.size + len(tables) * WOFF_TABLE_ENTRY.size
+    table_data = {tag: data for tag, _, _, data in tables}
+    table_offsets: Dict[str, int] = {}
+    for tag in table_order:
+        table_offsets[tag] = offset
+        offset = _append_padded(chunks, table_data[tag], offset)
+    entries = bytearray()
+    for tag, orig_length, orig_checksum, data in tables:
+        entries += WOFF_TABLE_ENTRY.pack(
+            tag.encode("latin-1"),
+            table_offsets[tag],
+            len(data),
+            orig_length,
+            orig_checksum,
+        )
+
+    meta_offset = meta_length = meta_orig_length = 0
+    priv_offset = priv_length = 0
+    version = (1, 0)
+    if isinstance(font, WOFFFont):
+        version = font.version
+        if font.metadata is not None:
+            meta_data, meta_orig_length = font.metadata
+            meta_offset, meta_length = offset, len(meta_data)
+            if font.private_data is not None:
+                offset = _append_padded(chunks, meta_data, offset)
+            else:
+                # the metadata block is only padded when a private block follows
+                chunks.append(meta_data)
+                offset += meta_length
+        if font.private_data is not None:
+            priv_offset, priv_length = offset, len(font.private_data)
+            chunks.append(font.private_data)
+            offset += priv_length
+
+    yield WOFF_HEADER.pack(
+        WOFF_SIGNATURE,
+        font.sfnt_version,
+        offset,
+        len(tables),
+        0,
+        sfnt_offset,
+        version[0],
+        version[1],
+        meta_offset,
+        meta_length,
+        meta_orig_length,
+        priv_offset,
+        priv_length,
+    )
+    yield entries
+    yield from chunks
+
+
+def _compress(data: TableData) -> TableData:
+    compressed = zlib.compress(data, ZLIB_COMPRESSION_LEVEL)
+    if len(compressed) < len(data):
+        return compressed
+    return data
+
+
+def _append_padded(chunks: List[TableData], data: TableData, offset: int) -> int:
+    chunks.append(data)
+    padding = pad_length(len(data)) - len(data)
+    if padding:
+        chunks.append(b"\x00" * padding)
+    return offset + pad_length(len(data))
+
+
+# ========================================================
+# WOFF2
+# ========================================================
+def read_woff2(data: TableData) -> SFNTFont:
+    """Decodes WOFF2 font data in memory and returns an SFNTFont of the decoded
+    sfnt font with the WOFF2 flavor.  The Brotli stream and the glyf and loca
+    table transforms are decoded with fontTools."""
+    woff2 = _import_woff2()
+    sfnt_file = io.BytesIO()
+    woff2.decompress(io.BytesIO(data), sfnt_file)
+    font = SFNTFont(sfnt_file.getvalue())
+    font.flavor = "woff2"
+    return font
+
+
+def iter_compile_woff2(font: SFNTFont) -> Iterator[TableData]:
+    """Returns an iterator over the WOFF2 binary of a font.  The sfnt font
+    binary is encoded in memory with fontTools before this function returns so
+    that encoder errors are raised before a file is written."""
+    woff2 = _import_woff2()
+    woff2_file = io.BytesIO()
+    woff2.compress(io.BytesIO(b"".join(font.iter_compile_sfnt())), woff2_file)
+    return iter([woff2_file.getvalue()])
+
+
+def _import_woff2():
+    from fontTools.ttLib import woff2  # type: ignore
+
+    if not woff2.haveBrotli:
+        raise SFNTError(
+            "WOFF2 support requires the brotli package.  Install it with "
+            "`pip install dehinter[woff]`"
+        )
+    return woff2
@@ -17,8 +17,12 @@ INSTALL_REQUIRES = [
 ]
 # Optional packages
 EXTRAS_REQUIRES = {
+    # for WOFF2 font support
+    "woff": ["brotli"],
     # for developer installs
     "dev": ["coverage", "pytest", "tox", "flake8", "mypy", "isort"],
+    # for benchmark runs
+    "benchmark": ["pytest-benchmark"],
     # for maintainer installs
     "maintain": ["wheel", "setuptools", "twine"],
 }
@@ -0,0 +1,72 @@
+import os
+import struct
+
+from fontTools.ttLib import TTCollection, TTFont
+
+import pytest
+
+FILEPATH_HINTED_TTF = os.path.join("tests", "test_files", "fonts", "Roboto-Regular.ttf")
+
+
+@pytest.fixture(scope="session")
+def ttc_path(tmp_path_factory):
+    """A TrueType Collection with two Roboto fonts that share all tables
+    except the name table."""
+    # the head tables are only shared when both fonts keep the same modified
+    # timestamp
+    font_1 = TTFont(FILEPATH_HINTED_TTF, recalcTimestamp=False)
+    font_2 = TTFont(FILEPATH_HINTED_TTF, recalcTimestamp=False)
+    font_2["name"].setName("Roboto Collection", 1, 3, 1, 0x409)
+    collection = TTCollection()
+    collection.fonts = [font_1, font_2]
+    path = tmp_path_factory.mktemp("ttc") / "Roboto-Collection.ttc"
+    collection.save(str(path))
+    return str(path)
+
+
+@pytest.fixture(scope="session")
+def woff_path(tmp_path_factory):
+    """A WOFF version of the Roboto font with an extended metadata block."""
+    from fontTools.ttLib.sfnt import WOFFFlavorData
+
+    tt = TTFont(FILEPATH_HINTED_TTF)
+    tt.flavor = "woff"
+    tt.flavorData = WOFFFlavorData()
+    tt.flavorData.metaData = b'<?xml version="1.0"?><metadata version="1.0"/>'
+    path = tmp_path_factory.mktemp("woff") / "Roboto-Regular.woff"
+    tt.save(str(path))
+    return str(path)
+
+
+@pytest.fixture(scope="session")
+def woff_private_path(woff_path, tmp_path_factory):
+    """The woff_path font with a private data block.  The fontTools WOFF
+    writer does not support private data blocks, the block is appended to the
+    end of the font and the header length and private block fields are
+    updated."""
+    with open(woff_path, "rb") as f:
+        data = bytearray(f.read())
+    data += b"\x00" * (-len(data) % 4)
+    private_data = b"dehinter private data"
+    struct.pack_into(">L", data, 36, len(data))
+    struct.pack_into(">L", data, 40, len(private_data))
+    data += private_data
+    struct.pack_into(">L", data, 8, len(data))
+    path = tmp_path_factory.mktemp("woff") / "Roboto-Regular-private.woff"
+    path.write_bytes(data)
+    return str(path)
+
+
+@pytest.fixture(scope="session")
+def vtt_path(tmp_path_factory):
+    """The Roboto font with Microsoft VTT source tables."""
+    from fontTools.ttLib.tables.DefaultTable import DefaultTable
+
+    tt = TTFont(FILEPATH_HINTED_TTF)
+    for tag in ("TSI0", "TSI1", "TSIP", "TSIV"):
+        table = DefaultTable(tag)
+        table.data = tag.encode("ascii") * 64
+        tt[tag] = table
+    path = tmp_path_factory.mktemp("vtt") / "Roboto-Regular-VTT.ttf"
+    tt.save(str(path))
+    return str(path)
@@ -0,0 +1,196 @@
+import asyncio
+import io
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from fontTools.ttLib import TTFont
+
+from dehinter.aio import DehintService, DehintServiceBusy, dehint_async
+
+import pytest
+
+FILEPATH_HINTED_TTF = os.path.join("tests", "test_files", "fonts", "Roboto-Regular.ttf")
+FILEPATH_HINTED_TTF_2 = os.path.join(
+    "tests", "test_files", "fonts", "NotoSans-Regular.ttf"
+)
+
+
+def get_font_data(filepath):
+    with open(filepath, "rb") as f:
+        return f.read()
+
+
+class CountingExecutor(ThreadPoolExecutor):
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.submitted = 0
+
+    def submit(self, *args, **kwargs):
+        self.submitted += 1
+        return super().submit(*args, **kwargs)
+
+
+class BlockingExecutor(CountingExecutor):
+    # jobs wait for the release event before they run
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.release = threading.Event()
+
+    def submit(self, fn, *args, **kwargs):
+        def blocked():
+            self.release.wait()
+            return fn(*args, **kwargs)
+
+        return super().submit(blocked)
+
+
+async def run_ready_callbacks():
+    for _ in range(5):
+        await asyncio.sleep(0)
+
+
+def test_dehint_async():
+    data = get_font_data(FILEPATH_HINTED_TTF)
+    dehinted = asyncio.run(dehint_async(data, fast=True, keep_fpgm=True))
+    tt = TTFont(io.BytesIO(dehinted))
+    assert "fpgm" in tt
+    assert "prep" not in tt
+
+
+def test_dehint_service_coalesces_identical_requests():
+    data = get_font_data(FILEPATH_HINTED_TTF)
+    data_2 = get_font_data(FILEPATH_HINTED_TTF_2)
+    executor = CountingExecutor(max_workers=2)
+
+    async def dehint_fonts():
+        async with DehintService(executor=executor) as service:
+            results = await asyncio.gather(
+                service.dehint(data, fast=True),
+                service.dehint(memoryview(data), fast=True),
+                service.dehint(data, fast=True),
+                service.dehint(data, fast=True, keep_fpgm=True),
+                service.dehint(data_2, fast=True),
+            )
+            assert service.pending == 0
+            return results
+
+    results = asyncio.run(dehint_fonts())
+    executor.shutdown()
+    assert executor.submitted == 3
+    assert results[0] is results[1] is results[2]
+    assert "fpgm" not in TTFont(io.BytesIO(results[0]))
+    assert "fpgm" in TTFont(io.BytesIO(results[3]))
+    assert results[4] != results[0]
+
+
+def test_dehint_service_max_pending():
+    data = get_font_data(FILEPATH_HINTED_TTF)
+    data_2 = get_font_data(FILEPATH_HINTED_TTF_2)
+
+    async def dehint_fonts():
+        with ThreadPoolExecutor(max_workers=1) as executor:
+            service = DehintService(executor=executor, max_pending=1)
+            task = asyncio.ensure_future(service.dehint(data, fast=True))
+            await asyncio.sleep(0)
+            assert service.pending == 1
+            with pytest.raises(DehintServiceBusy):
+                await service.dehint(data_2, fast=True)
+            # identical requests are coalesced and are not rejected
+            assert await service.dehint(data, fast=True) == await task
+            assert await service.dehint(data_2, fast=True)
+
+    asyncio.run(dehint_fonts())
+
+
+def test_dehint_service_cancellation():
+    data = get_font_data(FILEPATH_HINTED_TTF)
+    data_2 = get_font_data(FILEPATH_HINTED_TTF_2)
+
+    async def dehint_fonts():
+        with CountingExecutor(max_workers=1) as executor:
+            service = DehintService(executor=executor, max_concurrency=1)
+            blocking = asyncio.ensure_future(service.dehint(data_2, fast=True))
+            first = asyncio.ensure_future(service.dehint(data, fast=True))
+            second = asyncio.ensure_future(service.dehint(data, fast=True))
+            await asyncio.sleep(0)
+            # the job continues while another request waits for it
+            first.cancel()
+            assert await second
+            assert first.cancelled()
+
+            # the job is cancelled before it runs when all requests are
+            # cancelled
+            submitted = executor.submitted
+            blocking = asyncio.ensure_future(
+                service.dehint(data_2, fast=True, keep_fpgm=True)
+            )
+            third = asyncio.ensure_future(
+                service.dehint(data, fast=True, keep_prep=True)
+            )
+            await asyncio.sleep(0)
+            third.cancel()
+            await blocking
+            assert third.cancelled()
+            assert executor.submitted == submitted + 1
+            assert service.pending == 0
+
+    asyncio.run(dehint_fonts())
+
+
+def test_dehint_service_cancelled_job_keeps_slot():
+    data = get_font_data(FILEPATH_HINTED_TTF)
+    data_2 = get_font_data(FILEPATH_HINTED_TTF_2)
+
+    async def dehint_fonts():
+        with BlockingExecutor(max_workers=2) as executor:
+            service = DehintService(executor=executor, max_concurrency=1, max_pending=2)
+            first = asyncio.ensure_future(service.dehint(data, fast=True))
+            await run_ready_callbacks()
+            assert executor.submitted == 1
+            first.cancel()
+            await run_ready_callbacks()
+            assert first.cancelled()
+            # the cancelled job still runs in the executor
+            assert service.pending == 1
+            second = asyncio.ensure_future(service.dehint(data_2, fast=True))
+            await run_ready_callbacks()
+            assert service.pending == 2
+            with pytest.raises(DehintServiceBusy):
+                await service.dehint(data, fast=True, keep_fpgm=True)
+            # the second job waits for the slot of the cancelled job
+            assert executor.submitted == 1
+            executor.release.set()
+            assert await second
+            assert executor.submitted == 2
+            assert service.pending == 0
+
+    asyncio.run(dehint_fonts())
+
+
+def test_dehint_service_prepares_large_requests_in_thread(monkeypatch):
+    monkeypatch.setattr("dehinter.aio.THREAD_PREPARE_MIN_SIZE", 0)
+    data = get_font_data(FILEPATH_HINTED_TTF)
+    executor = CountingExecutor(max_workers=1)
+
+    async def dehint_fonts():
+        async with DehintService(executor=executor) as service:
+            return await asyncio.gather(
+                service.dehint(data, fast=True),
+                service.dehint(memoryview(data), fast=True),
+            )
+
+    results = asyncio.run(dehint_fonts())
+    executor.shutdown()
+    assert executor.submitted == 1
+    assert results[0] is results[1]
+
+
+def test_dehint_service_invalid_data():
+    async def dehint_fonts():
+        async with DehintService(executor=ThreadPoolExecutor(1)) as service:
+            with pytest.raises(ValueError):
+                await service.dehint(b"not a font")
+            assert service.pending == 0
+
+    asyncio.run(dehint_fonts())
@@ -0,0 +1,125 @@
+import json
+import os
+
+import pytest
+
+from dehinter.__main__ import run
+from dehinter.analyze import analyze_font_file
+from dehinter.batch import dehint_font_file
+
+FONTS_DIR = os.path.join("tests", "test_files", "fonts")
+FILEPATH_HINTED_TTF = os.path.join(FONTS_DIR, "Roboto-Regular.ttf")
+FILEPATH_TEST_TEXT = os.path.join("tests", "test_files", "text", "test.txt")
+
+
+@pytest.mark.parametrize(
+    "filename",
+    [
+        "Roboto-Regular.ttf",
+        "NotoSans-Regular.ttf",
+        "OpenSans-VF.ttf",
+        "Ubuntu-Regular.ttf",
+    ],
+)
+def test_analyze_font_file_matches_dehint(filename, tmp_path):
+    inpath = os.path.join(FONTS_DIR, filename)
+    outpath = str(tmp_path / filename)
+    savings = analyze_font_file(inpath, {})
+    result = dehint_font_file(inpath, outpath, {}, fast=True)
+    assert savings.ok is True
+    assert result.ok is True
+    assert sorted(savings.tables) == sorted(result.report.removed_tables)
+    assert savings.glyphs_edited == result.report.glyphs_edited
+    assert savings.in_size == os.path.getsize(inpath)
+    assert savings.total == os.path.getsize(inpath) - os.path.getsize(outpath)
+
+
+def test_analyze_font_file_keep_options():
+    savings = analyze_font_file(
+        FILEPATH_HINTED_TTF, {"keep_fpgm": True, "keep_glyf": True, "keep_gasp": True}
+    )
+    assert "fpgm" not in savings.tables
+    assert "prep" in savings.tables
+    assert savings.glyf == 0
+    assert savings.glyphs_edited == 0
+    assert savings.gasp == 0
+    assert savings.total == sum(savings.tables.values())
+
+
+def test_analyze_font_file_vtt(vtt_path):
+    savings = analyze_font_file(vtt_path, {})
+    # table data, padding, and a 16 byte table record
+    assert savings.tables["TSI0"] == 256 + 16
+    assert savings.tables.keys() >= {"TSI0", "TSI1", "TSIP", "TSIV"}
+    assert "TSI0" not in analyze_font_file(vtt_path, {"keep_tsi": True}).tables
+
+
+def test_analyze_font_file_collection(ttc_path, tmp_path):
+    outpath = str(tmp_path / "Roboto-Collection.ttc")
+    single = analyze_font_file(FILEPATH_HINTED_TTF, {})
+    savings = analyze_font_file(ttc_path, {})
+    result = dehint_font_file(ttc_path, outpath, {}, fast=True)
+    assert result.ok is True
+    assert savings.total == os.path.getsize(ttc_path) - os.path.getsize(outpath)
+    assert savings.ok is True
+    # the shared tables are counted once, the table records of each font
+    assert savings.tables["fpgm"] == single.tables["fpgm"] + 16
+    assert savings.glyf == single.glyf
+    assert savings.glyphs_edited == single.glyphs_edited
+    assert savings.gasp == single.gasp
+
+
+def test_analyze_font_file_woff(woff_path):
+    savings = analyze_font_file(woff_path, {})
+    assert savings.ok is True
+    assert savings.glyf > 0
+    assert "fpgm" in savings.tables
+
+
+def test_analyze_font_file_invalid():
+    savings = analyze_font_file(FILEPATH_TEST_TEXT, {})
+    assert savings.ok is False
+    assert "Unable to read font binary" in savings.error
+    assert savings.to_dict()["ok"] is False
+
+
+def test_run_dry_run(tmp_path, capsys):
+    for filename in ("Roboto-Regular.ttf", "Roboto-Copy.ttf"):
+        with open(FILEPATH_HINTED_TTF, "rb") as f:
+            with open(str(tmp_path / filename), "wb") as g:
+                g.write(f.read())
+    run(["--dry-run", str(tmp_path)])
+    out = capsys.readouterr().out
+    assert f"[*] Projected savings of '{tmp_path / 'Roboto-Copy.ttf'}'" in out
+    assert "fpgm" in out
+    assert "[*] Projected savings of 2 of 2 font files" in out
+    # no font is written
+    assert sorted(os.listdir(str(tmp_path))) == [
+        "Roboto-Copy.ttf",
+        "Roboto-Regular.ttf",
+    ]
+
+
+def test_run_analyze_report(tmp_path, capsys):
+    inpath = str(tmp_path / "Roboto-Regular.ttf")
+    with open(FILEPATH_HINTED_TTF, "rb") as f:
+        with open(inpath, "wb") as g:
+            g.write(f.read())
+    run(["--analyze", "--report", "json", "--keep-prep", inpath])
+    (record,) = json.loads(capsys.readouterr().out)
+    assert record["file"] == inpath
+    assert record["ok"] is True
+    assert "prep" not in record["tables"]
+    assert record["total"] == record["in_size"] - record["projected_size"]
+    assert os.listdir(str(tmp_path)) == ["Roboto-Regular.ttf"]
+
+
+def test_run_dry_run_invalid_font(tmp_path, capsys):
+    with pytest.raises(SystemExit):
+        run(
+            ["--dry-run", "--report", "ndjson", FILEPATH_HINTED_TTF, FILEPATH_TEST_TEXT]
+        )
+    captured = capsys.readouterr()
+    records = [json.loads(line) for line in captured.out.splitlines()]
+    assert [record["ok"] for record in records] == [True, False]
+    assert "does not appear to be a TrueType font file" in captured.err
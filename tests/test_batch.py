@@ -0,0 +1,135 @@
+import multiprocessing
+import os
+import shutil
+
+import pytest
+from fontTools.ttLib import TTFont
+
+from dehinter import batch
+from dehinter.batch import BatchResult, dehint_font_file, dehint_font_files
+from dehinter.font import dehint
+
+FILEPATH_HINTED_TTF = os.path.join("tests", "test_files", "fonts", "Roboto-Regular.ttf")
+FILEPATH_HINTED_TTF_2 = os.path.join(
+    "tests", "test_files", "fonts", "NotoSans-Regular.ttf"
+)
+FILEPATH_TEST_TEXT = os.path.join("tests", "test_files", "text", "test.txt")
+
+TEST_DIR = os.path.join("tests", "test_files", "fonts", "temp")
+
+
+def setup_function(function):
+    if os.path.isdir(TEST_DIR):
+        shutil.rmtree(TEST_DIR)
+    os.mkdir(TEST_DIR)
+
+
+def teardown_function(function):
+    shutil.rmtree(TEST_DIR)
+
+
+def test_dehint_font_file():
+    outpath = os.path.join(TEST_DIR, "Roboto-Regular-dehinted.ttf")
+    result = dehint_font_file(FILEPATH_HINTED_TTF, outpath, {})
+    assert result._replace(report=None) == BatchResult(FILEPATH_HINTED_TTF, outpath)
+    assert result.ok is True
+    assert "fpgm" not in TTFont(outpath)
+    assert "fpgm" in result.report.removed_tables
+    assert result.report.out_size == os.path.getsize(outpath)
+
+
+def test_dehint_font_file_with_options():
+    outpath = os.path.join(TEST_DIR, "Roboto-Regular-dehinted.ttf")
+    result = dehint_font_file(FILEPATH_HINTED_TTF, outpath, {"keep_fpgm": True})
+    assert result.ok is True
+    assert "fpgm" in TTFont(outpath)
+    assert "prep" not in TTFont(outpath)
+
+
+def test_dehint_font_file_invalid_font():
+    outpath = os.path.join(TEST_DIR, "test-dehinted.txt")
+    result = dehint_font_file(FILEPATH_TEST_TEXT, outpath, {})
+    assert result.ok is False
+    assert "Unable to create font object" in result.error
+    assert not os.path.exists(outpath)
+
+
+def test_dehint_font_files_parallel_matches_serial():
+    requests = [
+        (FILEPATH_HINTED_TTF, os.path.join(TEST_DIR, "Roboto-Regular-dehinted.ttf")),
+        (FILEPATH_TEST_TEXT, os.path.join(TEST_DIR, "test-dehinted.txt")),
+        (FILEPATH_HINTED_TTF_2, os.path.join(TEST_DIR, "NotoSans-dehinted.ttf")),
+    ]
+    results = list(dehint_font_files(requests, {}, jobs=2))
+    assert [(r.inpath, r.outpath) for r in results] == requests
+    assert [r.ok for r in results] == [True, False, True]
+
+    serial_outpath = os.path.join(TEST_DIR, "Roboto-Regular-serial.ttf")
+    tt = TTFont(FILEPATH_HINTED_TTF)
+    dehint(tt, verbose=False)
+    tt.save(serial_outpath)
+    parallel_tt = TTFont(requests[0][1])
+    serial_tt = TTFont(serial_outpath)
+    for tag in ("glyf", "maxp", "gasp"):
+        assert parallel_tt.getTableData(tag) == serial_tt.getTableData(tag)
+
+
+def test_dehint_font_files_worker_crash(monkeypatch):
+    if multiprocessing.get_start_method() != "fork":
+        pytest.skip("worker processes only inherit the patch when they are forked")
+    dehint_font_file_cached = batch._dehint_font_file_cached
+
+    def crash(inpath, *args):
+        # forked worker processes inherit the patched function
+        if inpath == FILEPATH_TEST_TEXT:
+            os._exit(1)
+        return dehint_font_file_cached(inpath, *args)
+
+    monkeypatch.setattr(batch, "_dehint_font_file_cached", crash)
+    requests = [
+        (FILEPATH_TEST_TEXT, os.path.join(TEST_DIR, "test-dehinted.txt")),
+        (FILEPATH_HINTED_TTF, os.path.join(TEST_DIR, "Roboto-Regular-dehinted.ttf")),
+    ]
+    results = list(dehint_font_files(requests, {}, jobs=2))
+    assert [(r.inpath, r.outpath) for r in results] == requests
+    assert results[0].ok is False
+    assert f"Unable to dehint '{FILEPATH_TEST_TEXT}'" in results[0].error
+
+
+def test_dehint_font_files_fsync(monkeypatch):
+    fsynced_dirs = []
+    monkeypatch.setattr(batch, "fsync_directory", fsynced_dirs.append)
+    sub_dir = os.path.join(TEST_DIR, "sub")
+    os.mkdir(sub_dir)
+    requests = [
+        (FILEPATH_HINTED_TTF, os.path.join(TEST_DIR, "Roboto-Regular-dehinted.ttf")),
+        (
+            FILEPATH_HINTED_TTF_2,
+            os.path.join(TEST_DIR, "NotoSans-Regular-dehinted.ttf"),
+        ),
+        (FILEPATH_HINTED_TTF, os.path.join(sub_dir, "Roboto-Regular-dehinted.ttf")),
+        (FILEPATH_TEST_TEXT, os.path.join(sub_dir, "test-dehinted.txt")),
+    ]
+    results = list(dehint_font_files(requests, {}, fast=True, fsync=True))
+    assert [result.ok for result in results] == [True, True, True, False]
+    # one directory fsync per out file directory
+    assert fsynced_dirs == [os.path.abspath(TEST_DIR), os.path.abspath(sub_dir)]
+    assert sorted(os.listdir(sub_dir)) == ["Roboto-Regular-dehinted.ttf"]
+
+
+def test_dehint_font_file_failure_keeps_previous_out_file(monkeypatch):
+    outpath = os.path.join(TEST_DIR, "Roboto-Regular-dehinted.ttf")
+    with open(outpath, "wb") as f:
+        f.write(b"previous")
+
+    def write_chunks(f, chunks):
+        f.write(b"partial")
+        raise OSError("disk full")
+
+    monkeypatch.setattr("dehinter.sfnt.write_chunks", write_chunks)
+    result = dehint_font_file(FILEPATH_HINTED_TTF, outpath, {}, fast=True)
+    assert result.ok is False
+    assert "disk full" in result.error
+    with open(outpath, "rb") as f:
+        assert f.read() == b"previous"
+    assert os.listdir(TEST_DIR) == ["Roboto-Regular-dehinted.ttf"]
@@ -0,0 +1,117 @@
+import os
+import shutil
+import time
+
+from dehinter.batch import dehint_font_file
+from dehinter.cache import DEHINT_OPTION_DEFAULTS, DehintCache, parse_size
+
+import pytest
+
+FILEPATH_HINTED_TTF = os.path.join("tests", "test_files", "fonts", "Roboto-Regular.ttf")
+FILEPATH_HINTED_TTF_2 = os.path.join(
+    "tests", "test_files", "fonts", "NotoSans-Regular.ttf"
+)
+FILEPATH_DEHINTED_TTF = os.path.join(
+    "tests", "test_files", "fonts", "Roboto-Regular-dehinted.ttf"
+)
+
+
+def test_dehint_option_defaults():
+    assert len(DEHINT_OPTION_DEFAULTS) == 13
+    assert DEHINT_OPTION_DEFAULTS["keep_tsi"] is False
+    assert DEHINT_OPTION_DEFAULTS["keep_glyf"] is False
+
+
+def test_cache_key(tmp_path):
+    cache = DehintCache(tmp_path)
+    key = cache.key(FILEPATH_HINTED_TTF, {})
+    # missing keep_* options use the dehint() defaults
+    assert key == cache.key(FILEPATH_HINTED_TTF, dict(DEHINT_OPTION_DEFAULTS))
+    assert key != cache.key(FILEPATH_HINTED_TTF, {"keep_glyf": True})
+    assert key != cache.key(FILEPATH_HINTED_TTF, {}, fast=True)
+    assert key != cache.key(FILEPATH_HINTED_TTF, {}, flavor="woff")
+    assert key != cache.key(FILEPATH_HINTED_TTF, {}, recalc=True)
+    assert key != cache.key(FILEPATH_HINTED_TTF_2, {})
+    # the key only depends on the file contents
+    copy_path = tmp_path / "copy.ttf"
+    shutil.copyfile(FILEPATH_HINTED_TTF, copy_path)
+    assert key == cache.key(copy_path, {})
+
+
+def test_cache_store_and_fetch(tmp_path):
+    cache = DehintCache(tmp_path / "cache")
+    outpath = tmp_path / "out.ttf"
+    assert cache.fetch("ab" * 32, outpath) is False
+    assert not outpath.exists()
+
+    cache.store("ab" * 32, FILEPATH_DEHINTED_TTF)
+    assert os.path.isfile(cache.entry_path("ab" * 32))
+    assert cache.fetch("ab" * 32, outpath) is True
+    with open(FILEPATH_DEHINTED_TTF, "rb") as f:
+        assert outpath.read_bytes() == f.read()
+    assert cache.stats() == (1, os.path.getsize(FILEPATH_DEHINTED_TTF))
+
+
+def test_cache_prune_least_recently_used(tmp_path):
+    cache = DehintCache(tmp_path)
+    for number, key in enumerate(("aa" * 32, "bb" * 32, "cc" * 32)):
+        cache.store(key, FILEPATH_DEHINTED_TTF)
+        entry_time = time.time() - 100 + number
+        os.utime(cache.entry_path(key), (entry_time, entry_time))
+    # a cache hit makes the oldest entry the most recently used entry
+    assert cache.fetch("aa" * 32, tmp_path / "out.ttf") is True
+
+    entry_size = os.path.getsize(FILEPATH_DEHINTED_TTF)
+    assert cache.prune(2 * entry_size) == (1, entry_size)
+    assert not os.path.exists(cache.entry_path("bb" * 32))
+    assert os.path.exists(cache.entry_path("aa" * 32))
+    assert cache.prune() == (2, 2 * entry_size)
+    assert cache.stats() == (0, 0)
+
+
+def test_cache_stats_without_cache_dir(tmp_path):
+    assert DehintCache(tmp_path / "missing").stats() == (0, 0)
+
+
+def test_parse_size():
+    assert parse_size("1024") == 1024
+    assert parse_size("512K") == 512 << 10
+    assert parse_size("100mb") == 100 << 20
+    assert parse_size("2G") == 2 << 30
+    with pytest.raises(ValueError):
+        parse_size("big")
+
+
+def test_dehint_font_file_with_cache(tmp_path):
+    cache = DehintCache(tmp_path / "cache")
+    outpath = str(tmp_path / "Roboto-Regular-dehinted.ttf")
+    options = dict(DEHINT_OPTION_DEFAULTS)
+
+    result = dehint_font_file(FILEPATH_HINTED_TTF, outpath, options, cache=cache)
+    assert result.ok is True
+    assert result.cached is False
+    assert cache.stats().entries == 1
+    with open(outpath, "rb") as f:
+        dehinted_data = f.read()
+    os.remove(outpath)
+
+    result = dehint_font_file(FILEPATH_HINTED_TTF, outpath, options, cache=cache)
+    assert result.ok is True
+    assert result.cached is True
+    with open(outpath, "rb") as f:
+        assert f.read() == dehinted_data
+
+    # a different option set is a cache miss
+    result = dehint_font_file(
+        FILEPATH_HINTED_TTF, outpath, options, fast=True, cache=cache
+    )
+    assert result.cached is False
+    assert cache.stats().entries == 2
+
+
+def test_dehint_font_file_with_cache_does_not_store_errors(tmp_path):
+    cache = DehintCache(tmp_path / "cache")
+    test_text = os.path.join("tests", "test_files", "text", "test.txt")
+    result = dehint_font_file(test_text, str(tmp_path / "out.ttf"), {}, cache=cache)
+    assert result.ok is False
+    assert cache.stats().entries == 0
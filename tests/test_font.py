@@ -1,6 +1,10 @@
+import io
 import os
+import pprint
+import shutil
 
 from dehinter.font import (
+    is_font_collection,
     is_truetype_font,
     has_cvar_table,
     has_cvt_table,
@@ -24,9 +28,16 @@ from dehinter.font import (
     remove_glyf_instructions,
 )
 from dehinter.font import update_gasp_table, update_head_table_flags, update_maxp_table
+from dehinter.font import dehint, dehint_file, open_font, save_font, set_font_flavor
+from dehinter.font import (
+    BufferReader,
+    dehint_bytes,
+    dehint_fileobj,
+    is_truetype_font_data,
+)
 
 import pytest
-from fontTools.ttLib import TTFont
+from fontTools.ttLib import TTCollection, TTFont
 
 FILEPATH_TEST_TEXT = os.path.join("tests", "test_files", "text", "test.txt")
 FILEPATH_HINTED_TTF = os.path.join("tests", "test_files", "fonts", "Roboto-Regular.ttf")
@@ -356,3 +367,308 @@ def test_update_head_table_flags_previously_cleared():
     response = update_head_table_flags(tt)
     assert response is False
     assert (tt["head"].flags & (1 << 4)) == 0
+
+
+# =========================================
+# File I/O
+# =========================================
+def test_open_font_lazy_loading():
+    with open_font(FILEPATH_HINTED_TTF) as tt:
+        assert tt.lazy is True
+        assert "GSUB" in tt
+        dehint(tt, verbose=False)
+        assert not tt.isLoaded("GSUB")
+        assert not tt.isLoaded("cmap")
+        assert tt.isLoaded("glyf")
+
+
+def test_open_font_invalid_file():
+    with pytest.raises(Exception):
+        with open_font(FILEPATH_TEST_TEXT):
+            pass
+
+
+def test_save_font_lazy_font():
+    test_dir = os.path.join("tests", "test_files", "fonts", "temp")
+    test_outpath = os.path.join(test_dir, "Roboto-Regular-dehinted.ttf")
+    if os.path.isdir(test_dir):
+        shutil.rmtree(test_dir)
+    os.mkdir(test_dir)
+
+    with open_font(FILEPATH_HINTED_TTF) as tt:
+        save_font(tt, test_outpath)
+    tt = TTFont(test_outpath)
+    assert tt.getTableData("GSUB") == TTFont(FILEPATH_HINTED_TTF).getTableData("GSUB")
+
+    shutil.rmtree(test_dir)
+
+
+def test_dehint_report(monkeypatch):
+    # table values are not formatted when output is disabled
+    def pformat(*args):
+        raise AssertionError("pformat was called")
+
+    monkeypatch.setattr(pprint.PrettyPrinter, "pformat", pformat)
+    tt = TTFont(FILEPATH_HINTED_TTF)
+    report = dehint(tt, keep_hdmx=True, verbose=False)
+    assert report.removed_tables == ["cvt ", "fpgm", "LTSH", "prep"]
+    assert report.glyphs_edited > 0
+    assert report.bytecode_removed > 0
+    assert report.gasp == {"gaspRange": ({8: 2, 65535: 15}, {65535: 0x000A})}
+    assert report.maxp["maxSizeOfInstructions"][1] == 0
+    # bit 4 of the head flags is kept with the hdmx table
+    assert report.head == {}
+    assert report.in_size is None
+    assert report.fonts is None
+
+    report = dehint(tt, keep_gasp=True, verbose=False)
+    assert report.removed_tables == ["hdmx"]
+    assert report.glyphs_edited == 0
+    assert report.gasp is None
+    assert report.maxp == {}
+    assert report.head == {"flags": (25, 9)}
+
+
+def test_dehint_file():
+    test_dir = os.path.join("tests", "test_files", "fonts", "temp")
+    test_outpath = os.path.join(test_dir, "NotoSans-Regular-dehinted.ttf")
+    if os.path.isdir(test_dir):
+        shutil.rmtree(test_dir)
+    os.mkdir(test_dir)
+
+    report = dehint_file(
+        FILEPATH_HINTED_TTF_2, test_outpath, keep_fpgm=True, verbose=False
+    )
+    assert "fpgm" not in report.removed_tables
+    assert report.in_size == os.path.getsize(FILEPATH_HINTED_TTF_2)
+    assert report.out_size == os.path.getsize(test_outpath)
+    tt = TTFont(test_outpath)
+    assert "fpgm" in tt
+    assert "prep" not in tt
+    assert "TTFA" not in tt
+    assert tt["gasp"].gaspRange == {65535: 0x000A}
+    assert tt["maxp"].maxSizeOfInstructions == 0
+    for table in ("GSUB", "GPOS", "cmap", "name"):
+        assert tt.getTableData(table) == TTFont(FILEPATH_HINTED_TTF_2).getTableData(
+            table
+        )
+
+    shutil.rmtree(test_dir)
+
+
+HEAD_BBOX_FIELDS = ("xMin", "yMin", "xMax", "yMax")
+
+
+@pytest.mark.parametrize("filepath", [FILEPATH_HINTED_TTF, FILEPATH_HINTED_TTF_2])
+def test_dehint_file_bboxes_unchanged(filepath, tmp_path):
+    outpath = str(tmp_path / "dehinted.ttf")
+    dehint_file(filepath, outpath, verbose=False)
+    tt = TTFont(outpath)
+    tt_in = TTFont(filepath)
+    for field in HEAD_BBOX_FIELDS:
+        assert getattr(tt["head"], field) == getattr(tt_in["head"], field)
+    for field in ("maxPoints", "maxContours", "maxComponentDepth"):
+        assert getattr(tt["maxp"], field) == getattr(tt_in["maxp"], field)
+    for glyph_name in tt.getGlyphOrder():
+        glyph = tt["glyf"][glyph_name]
+        glyph_in = tt_in["glyf"][glyph_name]
+        assert glyph.numberOfContours == glyph_in.numberOfContours
+        if glyph.numberOfContours:
+            for field in HEAD_BBOX_FIELDS:
+                assert getattr(glyph, field) == getattr(glyph_in, field)
+
+
+def test_dehint_file_recalc(tmp_path):
+    inpath = str(tmp_path / "Roboto-Regular.ttf")
+    tt = TTFont(FILEPATH_HINTED_TTF, recalcBBoxes=False, recalcTimestamp=False)
+    tt["head"].xMin = -2000
+    tt.save(inpath)
+
+    outpath = str(tmp_path / "Roboto-Regular-dehinted.ttf")
+    dehint_file(inpath, outpath, verbose=False)
+    head = TTFont(outpath)["head"]
+    assert head.xMin == -2000
+    # the modified timestamp is updated without recalc
+    assert head.modified > tt["head"].modified
+    dehint_file(inpath, outpath, verbose=False, recalc=True)
+    assert TTFont(outpath)["head"].xMin == TTFont(FILEPATH_HINTED_TTF)["head"].xMin
+
+
+# =========================================
+# In-memory dehinting
+# =========================================
+@pytest.mark.parametrize("fast", [False, True])
+def test_dehint_bytes(fast, monkeypatch):
+    with open(FILEPATH_HINTED_TTF, "rb") as f:
+        data = f.read()
+
+    # the filesystem is not used
+    def no_open(*args, **kwargs):
+        raise AssertionError("the filesystem was used")
+
+    monkeypatch.setattr("builtins.open", no_open)
+    for buffer in (data, bytearray(data), memoryview(data)):
+        dehinted = dehint_bytes(buffer, fast=fast)
+        tt = TTFont(io.BytesIO(dehinted))
+        assert "fpgm" not in tt
+        assert tt["gasp"].gaspRange == {65535: 0x000A}
+        assert tt.getTableData("GSUB") == TTFont(io.BytesIO(data)).getTableData("GSUB")
+    dehinted = dehint_bytes(data, fast=fast, keep_fpgm=True, flavor="woff")
+    assert dehinted[:4] == b"wOFF"
+    assert "fpgm" in TTFont(io.BytesIO(dehinted))
+
+
+def test_dehint_bytes_collection(ttc_path):
+    with open(ttc_path, "rb") as f:
+        data = f.read()
+    for fast in (False, True):
+        collection = TTCollection(io.BytesIO(dehint_bytes(data, fast=fast)))
+        assert len(collection.fonts) == 2
+        for tt in collection.fonts:
+            assert "fpgm" not in tt
+
+
+def test_dehint_bytes_invalid_data():
+    with pytest.raises(ValueError):
+        dehint_bytes(b"not a font")
+    with open(FILEPATH_TEST_TEXT, "rb") as f:
+        with pytest.raises(ValueError):
+            dehint_bytes(f.read(), fast=True)
+
+
+@pytest.mark.parametrize("fast", [False, True])
+def test_dehint_fileobj(fast, woff_path):
+    with open(woff_path, "rb") as f:
+        infile = io.BytesIO(f.read())
+    outfile = io.BytesIO()
+    report = dehint_fileobj(infile, outfile, fast=fast, flavor="ttf")
+    assert report.in_size == os.path.getsize(woff_path)
+    assert report.out_size == len(outfile.getvalue())
+    assert "fpgm" in report.removed_tables
+    tt = TTFont(io.BytesIO(outfile.getvalue()))
+    assert tt.flavor is None
+    assert "fpgm" not in tt
+
+
+def test_is_truetype_font_data(ttc_path, woff_path):
+    for filepath in (FILEPATH_HINTED_TTF, ttc_path, woff_path):
+        with open(filepath, "rb") as f:
+            assert is_truetype_font_data(f.read()) is True
+    with open(FILEPATH_TEST_TEXT, "rb") as f:
+        assert is_truetype_font_data(f.read()) is False
+    assert is_truetype_font_data(b"ttcf") is False
+    assert is_truetype_font_data(b"") is False
+
+
+def test_buffer_reader():
+    reader = BufferReader(memoryview(b"0123456789"))
+    assert reader.read(3) == b"012"
+    assert reader.tell() == 3
+    assert reader.seek(-2, io.SEEK_END) == 8
+    assert reader.read() == b"89"
+    assert reader.read(4) == b""
+    reader.seek(1)
+    assert reader.seek(2, io.SEEK_CUR) == 3
+    buffer = bytearray(4)
+    assert reader.readinto(buffer) == 4
+    assert buffer == b"3456"
+    with pytest.raises(ValueError):
+        reader.seek(-1)
+
+
+# =========================================
+# TrueType Collections
+# =========================================
+def test_is_truetype_font_collection(ttc_path):
+    assert is_truetype_font(ttc_path) is True
+    assert is_font_collection(ttc_path) is True
+    assert is_font_collection(FILEPATH_HINTED_TTF) is False
+
+
+def test_open_font_collection(ttc_path):
+    with open_font(ttc_path) as tt:
+        assert isinstance(tt, TTCollection)
+        assert len(tt.fonts) == 2
+
+
+def test_dehint_collection_shared_tables(ttc_path, capsys):
+    with open_font(ttc_path) as tt:
+        report = dehint(tt)
+        assert len(report.fonts) == 2
+        assert report.fonts[0].glyphs_edited > 0
+        assert report.fonts[1].glyphs_edited == 0
+        assert tt.fonts[0]["glyf"] is tt.fonts[1]["glyf"]
+        assert tt.fonts[0]["loca"] is tt.fonts[1]["loca"]
+    captured = capsys.readouterr()
+    assert "Font 1 of 2 in collection" in captured.out
+    assert "Font 2 of 2 in collection" in captured.out
+    # shared glyph instructions are only removed once
+    assert captured.out.count("Removed glyf table instruction bytecode") == 1
+
+
+def test_dehint_file_collection(ttc_path):
+    test_dir = os.path.join("tests", "test_files", "fonts", "temp")
+    test_outpath = os.path.join(test_dir, "Roboto-Collection-dehinted.ttc")
+    if os.path.isdir(test_dir):
+        shutil.rmtree(test_dir)
+    os.mkdir(test_dir)
+
+    dehint_file(ttc_path, test_outpath, verbose=False)
+    collection = TTCollection(test_outpath)
+    assert len(collection.fonts) == 2
+    glyf_offsets = set()
+    for tt in collection.fonts:
+        assert "fpgm" not in tt
+        assert "prep" not in tt
+        assert tt["gasp"].gaspRange == {65535: 0x000A}
+        assert tt["maxp"].maxSizeOfInstructions == 0
+        assert remove_glyf_instructions(tt) == 0
+        glyf_offsets.add(tt.reader.tables["glyf"].offset)
+    # the glyf table is still shared by both fonts
+    assert len(glyf_offsets) == 1
+
+    shutil.rmtree(test_dir)
+
+
+# =========================================
+# WOFF and WOFF2 fonts
+# =========================================
+def test_is_truetype_font_woff(woff_path):
+    assert is_truetype_font(woff_path) is True
+    assert is_font_collection(woff_path) is False
+
+
+def test_set_font_flavor(ttc_path):
+    tt = TTFont(FILEPATH_HINTED_TTF)
+    set_font_flavor(tt, "woff")
+    assert tt.flavor == "woff"
+    set_font_flavor(tt, "ttf")
+    assert tt.flavor is None
+    with pytest.raises(ValueError):
+        set_font_flavor(tt, "otf")
+    collection = TTCollection(ttc_path)
+    set_font_flavor(collection, "ttf")
+    with pytest.raises(ValueError):
+        set_font_flavor(collection, "woff")
+
+
+def test_dehint_file_woff(woff_path):
+    test_dir = os.path.join("tests", "test_files", "fonts", "temp")
+    if os.path.isdir(test_dir):
+        shutil.rmtree(test_dir)
+    os.mkdir(test_dir)
+
+    woff_outpath = os.path.join(test_dir, "Roboto-Regular-dehinted.woff")
+    dehint_file(woff_path, woff_outpath, verbose=False)
+    ttf_outpath = os.path.join(test_dir, "Roboto-Regular-dehinted.ttf")
+    dehint_file(woff_path, ttf_outpath, flavor="ttf", verbose=False)
+
+    assert TTFont(woff_outpath).flavor == "woff"
+    assert TTFont(ttf_outpath).flavor is None
+    for filepath in (woff_outpath, ttf_outpath):
+        tt = TTFont(filepath)
+        assert "fpgm" not in tt
+        assert tt["gasp"].gaspRange == {65535: 0x000A}
+        assert tt["maxp"].maxSizeOfInstructions == 0
+
+    shutil.rmtree(test_dir)
@@ -0,0 +1,422 @@
+import array
+import os
+import struct
+
+from dehinter import glyf as glyf_module
+from dehinter.glyf import (
+    LOCA_FORMAT_LONG,
+    LOCA_FORMAT_SHORT,
+    WE_HAVE_INSTRUCTIONS,
+    GlyfMetrics,
+    compile_loca,
+    compute_glyf_metrics,
+    get_glyph_chunks,
+    locate_glyph_data_end,
+    locate_glyph_instructions,
+    measure_glyf_instructions,
+    parse_glyph_components,
+    parse_loca,
+    strip_glyf_instructions,
+    strip_glyph_instructions,
+)
+from dehinter.raw import HEAD_INDEX_TO_LOC_FORMAT_OFFSET, MAXP_NUM_GLYPHS_OFFSET
+from dehinter.sfnt import SFNTError, open_sfnt
+
+import pytest
+
+# glyph header: numberOfContours, xMin, yMin, xMax, yMax
+SIMPLE_GLYPH_HEADER = struct.pack(">hhhhh", 1, 0, 0, 100, 100)
+COMPOSITE_GLYPH_HEADER = struct.pack(">hhhhh", -1, 0, 0, 100, 100)
+
+# one contour with three on-curve points and x-short/y-short coordinates
+SIMPLE_GLYPH_OUTLINE = bytes([0x37, 0x37, 0x37, 10, 20, 30, 10, 20, 30])
+
+
+def make_simple_glyph(bytecode=b""):
+    return (
+        SIMPLE_GLYPH_HEADER
+        + struct.pack(">HH", 2, len(bytecode))
+        + bytecode
+        + SIMPLE_GLYPH_OUTLINE
+    )
+
+
+def make_composite_glyph(bytecode=None):
+    # two components: byte arguments with a scale, word arguments
+    flags_1 = 0x0020 | 0x0008
+    flags_2 = 0x0001
+    if bytecode is not None:
+        flags_2 |= WE_HAVE_INSTRUCTIONS
+    glyph = COMPOSITE_GLYPH_HEADER
+    glyph += struct.pack(">HHbbh", flags_1, 1, 5, 5, 0x4000)
+    glyph += struct.pack(">HHhh", flags_2, 2, 500, -500)
+    if bytecode is not None:
+        glyph += struct.pack(">H", len(bytecode)) + bytecode
+    return glyph
+
+
+def pad(glyph):
+    return glyph + b"\x00" * (-len(glyph) % 4)
+
+
+def make_glyf_and_loca(glyphs, index_to_loc_format=LOCA_FORMAT_SHORT):
+    offsets = [0]
+    glyf = b""
+    for glyph in glyphs:
+        glyf += glyph
+        offsets.append(len(glyf))
+    loca, _ = compile_loca(array.array("I", offsets), index_to_loc_format)
+    return glyf, loca
+
+
+def test_parse_and_compile_loca_short():
+    offsets = array.array("I", [0, 12, 12, 40])
+    loca, index_to_loc_format = compile_loca(offsets, LOCA_FORMAT_SHORT)
+    assert index_to_loc_format == LOCA_FORMAT_SHORT
+    assert loca == struct.pack(">HHHH", 0, 6, 6, 20)
+    assert parse_loca(loca, LOCA_FORMAT_SHORT, 3) == offsets
+
+
+def test_parse_and_compile_loca_long():
+    offsets = array.array("I", [0, 12, 12, 40])
+    loca, index_to_loc_format = compile_loca(offsets, LOCA_FORMAT_LONG)
+    assert index_to_loc_format == LOCA_FORMAT_LONG
+    assert loca == struct.pack(">LLLL", 0, 12, 12, 40)
+    assert parse_loca(loca, LOCA_FORMAT_LONG, 3) == offsets
+
+
+def test_compile_loca_short_falls_back_to_long():
+    _, index_to_loc_format = compile_loca(array.array("I", [0, 13]), LOCA_FORMAT_SHORT)
+    assert index_to_loc_format == LOCA_FORMAT_LONG
+    _, index_to_loc_format = compile_loca(
+        array.array("I", [0, 0x20000]), LOCA_FORMAT_SHORT
+    )
+    assert index_to_loc_format == LOCA_FORMAT_LONG
+
+
+def test_parse_loca_too_short():
+    with pytest.raises(SFNTError):
+        parse_loca(b"\x00\x00", LOCA_FORMAT_SHORT, 3)
+
+
+def test_locate_glyph_instructions_simple():
+    instructions = locate_glyph_instructions(make_simple_glyph(b"\xb0\x01\x2c"))
+    assert instructions.offset == 12
+    assert instructions.length == 3
+    assert instructions.flag_offsets == []
+
+
+def test_locate_glyph_instructions_composite():
+    instructions = locate_glyph_instructions(make_composite_glyph(b"\xb0\x01"))
+    assert instructions.offset == 10 + 8 + 8
+    assert instructions.length == 2
+    assert instructions.flag_offsets == [10, 18]
+
+
+def test_locate_glyph_instructions_composite_without_instructions():
+    assert locate_glyph_instructions(make_composite_glyph()) is None
+
+
+def test_locate_glyph_instructions_truncated():
+    with pytest.raises(SFNTError):
+        locate_glyph_instructions(SIMPLE_GLYPH_HEADER)
+
+
+def test_strip_glyph_instructions_simple():
+    glyph = make_simple_glyph(b"\xb0\x01\x2c")
+    stripped = strip_glyph_instructions(glyph, locate_glyph_instructions(glyph))
+    assert stripped == make_simple_glyph() + b"\x00"
+
+
+def test_strip_glyph_instructions_composite():
+    glyph = make_composite_glyph(b"\xb0\x01")
+    stripped = strip_glyph_instructions(glyph, locate_glyph_instructions(glyph))
+    assert stripped == make_composite_glyph()
+    assert locate_glyph_instructions(stripped) is None
+
+
+def test_strip_glyph_instructions_removes_padding():
+    for glyph, expected in (
+        (make_simple_glyph(b"\xb0\x01\x2c"), make_simple_glyph() + b"\x00"),
+        (make_composite_glyph(b"\xb0\x01"), make_composite_glyph()),
+    ):
+        # four byte aligned source record with trailing excess bytes
+        padded = pad(glyph) + b"\x00" * 4
+        instructions = locate_glyph_instructions(padded)
+        assert locate_glyph_data_end(padded, instructions) == len(glyph)
+        assert strip_glyph_instructions(padded, instructions) == expected
+
+
+def test_locate_glyph_data_end_truncated():
+    glyph = make_simple_glyph(b"\xb0\x01\x2c")[:-4]
+    with pytest.raises(SFNTError):
+        locate_glyph_data_end(glyph, locate_glyph_instructions(glyph))
+
+
+@pytest.mark.parametrize(
+    "filename", ["Roboto-Regular.ttf", "NotoSans-Regular.ttf", "Ubuntu-Regular.ttf"]
+)
+def test_strip_glyph_instructions_matches_fonttools_trim(filename):
+    from fontTools.ttLib import TTFont
+    from fontTools.ttLib.tables._g_l_y_f import Glyph
+
+    tt = TTFont(os.path.join("tests", "test_files", "fonts", filename))
+    glyf_data = tt.reader["glyf"]
+    offsets = parse_loca(
+        tt.reader["loca"], tt["head"].indexToLocFormat, tt["maxp"].numGlyphs
+    )
+    edited = 0
+    for glyph_id in range(tt["maxp"].numGlyphs):
+        start, end = offsets[glyph_id], offsets[glyph_id + 1]
+        glyph = glyf_data[start:end]
+        instructions = locate_glyph_instructions(glyph) if glyph else None
+        if instructions is None or instructions.length == 0:
+            continue
+        expected = Glyph(glyph)
+        expected.trim(remove_hinting=True)
+        stripped = strip_glyph_instructions(glyph, instructions)
+        # stripped glyph records have no trailing excess bytes
+        assert stripped == expected.data + b"\x00" * (len(expected.data) & 1)
+        edited += 1
+    assert edited > 0
+
+
+def test_strip_glyf_instructions():
+    glyphs = [
+        b"",
+        make_simple_glyph(),
+        make_simple_glyph(b"\xb0\x01\x2c"),
+        make_composite_glyph(),
+        make_composite_glyph(b"\xb0\x01"),
+        b"",
+    ]
+    glyf, loca = make_glyf_and_loca([pad(glyph) for glyph in glyphs])
+    (
+        new_glyf,
+        new_loca,
+        index_to_loc_format,
+        glyph_number,
+        bytecode_removed,
+    ) = strip_glyf_instructions(glyf, loca, LOCA_FORMAT_SHORT, len(glyphs))
+    # edited glyph records drop the padding of the source glyph record and are
+    # padded to two bytes
+    expected_glyf, expected_loca = make_glyf_and_loca(
+        [
+            b"",
+            pad(make_simple_glyph()),
+            make_simple_glyph() + b"\x00",
+            pad(make_composite_glyph()),
+            make_composite_glyph(),
+            b"",
+        ]
+    )
+    assert glyph_number == 2
+    assert bytecode_removed == 5
+    assert index_to_loc_format == LOCA_FORMAT_SHORT
+    assert new_glyf == expected_glyf
+    assert new_loca == expected_loca
+
+
+def test_strip_glyf_instructions_without_instructions():
+    glyf, loca = make_glyf_and_loca(
+        [pad(make_simple_glyph()), pad(make_composite_glyph())]
+    )
+    (
+        new_glyf,
+        new_loca,
+        index_to_loc_format,
+        glyph_number,
+        bytecode_removed,
+    ) = strip_glyf_instructions(glyf, loca, LOCA_FORMAT_SHORT, 2)
+    assert glyph_number == 0
+    assert bytecode_removed == 0
+    assert new_glyf == glyf
+    assert new_loca == loca
+    assert index_to_loc_format == LOCA_FORMAT_SHORT
+
+
+def test_strip_glyf_instructions_invalid_loca():
+    glyf, _ = make_glyf_and_loca([pad(make_simple_glyph())])
+    loca = struct.pack(">HH", 0, 0x100)
+    with pytest.raises(SFNTError):
+        strip_glyf_instructions(glyf, loca, LOCA_FORMAT_SHORT, 1)
+
+
+@pytest.mark.parametrize(
+    "filename",
+    [
+        "Roboto-Regular.ttf",
+        "NotoSans-Regular.ttf",
+        "OpenSans-VF.ttf",
+        "Ubuntu-Regular.ttf",
+    ],
+)
+def test_measure_glyf_instructions(filename):
+    with open_sfnt(os.path.join("tests", "test_files", "fonts", filename)) as sfnt:
+        (num_glyphs,) = struct.unpack_from(">H", sfnt["maxp"], MAXP_NUM_GLYPHS_OFFSET)
+        (index_to_loc_format,) = struct.unpack_from(
+            ">h", sfnt["head"], HEAD_INDEX_TO_LOC_FORMAT_OFFSET
+        )
+        args = (sfnt["glyf"], sfnt["loca"], index_to_loc_format, num_glyphs)
+        (
+            glyph_number,
+            bytecode_length,
+            removed_length,
+            index_to_loc_format,
+        ) = measure_glyf_instructions(*args)
+        (
+            new_glyf,
+            _,
+            expected_index_to_loc_format,
+            expected_number,
+            expected_bytecode,
+        ) = strip_glyf_instructions(*args)
+        glyf_length = len(sfnt["glyf"])
+    assert glyph_number == expected_number
+    assert bytecode_length == expected_bytecode
+    assert removed_length == glyf_length - len(new_glyf)
+    assert index_to_loc_format == expected_index_to_loc_format
+
+
+def test_measure_glyf_instructions_invalid_loca():
+    glyf, _ = make_glyf_and_loca([pad(make_simple_glyph())])
+    loca = struct.pack(">HH", 0, 0x100)
+    with pytest.raises(SFNTError):
+        measure_glyf_instructions(glyf, loca, LOCA_FORMAT_SHORT, 1)
+
+
+def test_get_glyph_chunks(monkeypatch):
+    monkeypatch.setattr(glyf_module, "GLYF_CHUNK_MIN_GLYPHS", 100)
+    assert get_glyph_chunks(1000, 1) == [(0, 1000)]
+    assert get_glyph_chunks(150, 4) == [(0, 150)]
+    assert get_glyph_chunks(1000, 3) == [(0, 334), (334, 668), (668, 1000)]
+    assert get_glyph_chunks(250, 8) == [(0, 125), (125, 250)]
+    assert get_glyph_chunks(0, 4) == [(0, 0)]
+
+
+@pytest.mark.parametrize(
+    "filename", ["Roboto-Regular.ttf", "NotoSans-Regular.ttf", "OpenSans-VF.ttf"]
+)
+def test_strip_glyf_instructions_parallel_matches_serial(filename, monkeypatch):
+    monkeypatch.setattr(glyf_module, "GLYF_CHUNK_MIN_GLYPHS", 100)
+    with open_sfnt(os.path.join("tests", "test_files", "fonts", filename)) as sfnt:
+        (num_glyphs,) = struct.unpack_from(">H", sfnt["maxp"], MAXP_NUM_GLYPHS_OFFSET)
+        (index_to_loc_format,) = struct.unpack_from(
+            ">h", sfnt["head"], HEAD_INDEX_TO_LOC_FORMAT_OFFSET
+        )
+        args = (sfnt["glyf"], sfnt["loca"], index_to_loc_format, num_glyphs)
+        assert len(get_glyph_chunks(num_glyphs, 3)) == 3
+        serial = strip_glyf_instructions(*args)
+        parallel = strip_glyf_instructions(*args, jobs=3)
+    assert serial[3] > 0
+    assert parallel == serial
+
+
+def test_strip_glyf_instructions_parallel_invalid_loca(monkeypatch):
+    monkeypatch.setattr(glyf_module, "GLYF_CHUNK_MIN_GLYPHS", 2)
+    glyphs = [pad(make_simple_glyph(b"\xb0\x01"))] * 6
+    glyf, loca = make_glyf_and_loca(glyphs)
+    offsets = parse_loca(loca, LOCA_FORMAT_SHORT, 6)
+    # the end offset of glyph 4 is before its start offset
+    offsets[5] = offsets[3]
+    loca, _ = compile_loca(offsets, LOCA_FORMAT_SHORT)
+    with pytest.raises(SFNTError, match="invalid loca offsets for glyph 4"):
+        strip_glyf_instructions(glyf, loca, LOCA_FORMAT_SHORT, 6, jobs=3)
+
+
+def make_nested_composite_glyph(*glyph_ids):
+    glyph = COMPOSITE_GLYPH_HEADER
+    for number, glyph_id in enumerate(glyph_ids, 1):
+        flags = 0x0001 if number == len(glyph_ids) else 0x0001 | 0x0020
+        glyph += struct.pack(">HHhh", flags, glyph_id, 0, 0)
+    return glyph
+
+
+def test_parse_glyph_components():
+    assert parse_glyph_components(make_composite_glyph()) == ([1, 2], 0)
+    assert parse_glyph_components(make_composite_glyph(b"\xb0\x01")) == ([1, 2], 2)
+    with pytest.raises(SFNTError):
+        parse_glyph_components(make_composite_glyph()[:18])
+
+
+def test_compute_glyf_metrics():
+    glyphs = [
+        b"",
+        make_simple_glyph(b"\xb0\x01\x2c"),
+        make_simple_glyph(),
+        make_composite_glyph(b"\xb0\x01"),
+        make_nested_composite_glyph(3, 1),
+    ]
+    glyf, loca = make_glyf_and_loca([pad(glyph) for glyph in glyphs])
+    assert compute_glyf_metrics(glyf, loca, LOCA_FORMAT_SHORT, len(glyphs)) == (
+        GlyfMetrics(
+            x_min=0,
+            y_min=0,
+            x_max=100,
+            y_max=100,
+            max_points=3,
+            max_contours=1,
+            max_composite_points=9,
+            max_composite_contours=3,
+            max_size_of_instructions=3,
+            max_component_elements=2,
+            max_component_depth=2,
+        )
+    )
+
+
+def test_compute_glyf_metrics_empty():
+    glyf, loca = make_glyf_and_loca([b"", b""])
+    assert compute_glyf_metrics(glyf, loca, LOCA_FORMAT_SHORT, 2) == GlyfMetrics()
+
+
+def test_compute_glyf_metrics_invalid_components():
+    glyf, loca = make_glyf_and_loca([pad(make_nested_composite_glyph(0))])
+    with pytest.raises(SFNTError):
+        compute_glyf_metrics(glyf, loca, LOCA_FORMAT_SHORT, 1)
+    glyf, loca = make_glyf_and_loca([pad(make_nested_composite_glyph(5))])
+    with pytest.raises(SFNTError):
+        compute_glyf_metrics(glyf, loca, LOCA_FORMAT_SHORT, 1)
+
+
+@pytest.mark.parametrize(
+    "filename",
+    [
+        "Roboto-Regular.ttf",
+        "NotoSans-Regular.ttf",
+        "OpenSans-VF.ttf",
+        "Ubuntu-Regular.ttf",
+    ],
+)
+def test_compute_glyf_metrics_matches_fonttools(filename):
+    from fontTools.ttLib import TTFont
+
+    filepath = os.path.join("tests", "test_files", "fonts", filename)
+    with open_sfnt(filepath) as sfnt:
+        (num_glyphs,) = struct.unpack_from(">H", sfnt["maxp"], MAXP_NUM_GLYPHS_OFFSET)
+        (index_to_loc_format,) = struct.unpack_from(
+            ">h", sfnt["head"], HEAD_INDEX_TO_LOC_FORMAT_OFFSET
+        )
+        metrics = compute_glyf_metrics(
+            sfnt["glyf"], sfnt["loca"], index_to_loc_format, num_glyphs
+        )
+    tt = TTFont(filepath)
+    tt["maxp"].recalc(tt)
+    maxp, head = tt["maxp"], tt["head"]
+    assert (metrics.x_min, metrics.y_min, metrics.x_max, metrics.y_max) == (
+        head.xMin,
+        head.yMin,
+        head.xMax,
+        head.yMax,
+    )
+    assert metrics.max_points == maxp.maxPoints
+    assert metrics.max_contours == maxp.maxContours
+    assert metrics.max_composite_points == maxp.maxCompositePoints
+    assert metrics.max_composite_contours == maxp.maxCompositeContours
+    assert metrics.max_component_elements == maxp.maxComponentElements
+    assert metrics.max_component_depth == maxp.maxComponentDepth
+    assert metrics.max_size_of_instructions == max(
+        len(glyph.program.getBytecode())
+        for glyph in (tt["glyf"][name] for name in tt.getGlyphOrder())
+        if glyph.numberOfContours and hasattr(glyph, "program")
+    )
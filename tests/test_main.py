@@ -1,8 +1,12 @@
 import array
+import io
+import json
 import os
 import shutil
+import subprocess
+import sys
 
-from fontTools.ttLib import TTFont
+from fontTools.ttLib import TTCollection, TTFont
 
 from dehinter.__main__ import run
 
@@ -613,3 +617,629 @@ def test_run_dehinted_file_write_inplace():
 
     # tear down
     shutil.rmtree(test_dir)
+
+
+def test_run_multiple_files_with_jobs(capsys):
+    test_dir = os.path.join("tests", "test_files", "fonts", "temp")
+    font_names = ("NotoSans-Regular", "Roboto-Regular", "Ubuntu-Regular")
+
+    # setup
+    if os.path.isdir(test_dir):
+        shutil.rmtree(test_dir)
+    os.mkdir(test_dir)
+    for font_name in font_names:
+        shutil.copyfile(
+            os.path.join("tests", "test_files", "fonts", f"{font_name}.ttf"),
+            os.path.join(test_dir, f"{font_name}.ttf"),
+        )
+
+    # execute
+    run(["--jobs", "2", test_dir])
+    captured = capsys.readouterr()
+    assert "Dehinted 3 of 3 font files" in captured.out
+
+    # test
+    for font_name in font_names:
+        font_validator(os.path.join(test_dir, f"{font_name}-dehinted.ttf"))
+
+    # tear down
+    shutil.rmtree(test_dir)
+
+
+def test_run_multiple_files_collects_errors(capsys):
+    test_dir = os.path.join("tests", "test_files", "fonts", "temp")
+    notouch_inpath = os.path.join("tests", "test_files", "fonts", "Roboto-Regular.ttf")
+    test_inpath = os.path.join(test_dir, "Roboto-Regular.ttf")
+    test_outpath = os.path.join(test_dir, "Roboto-Regular-dehinted.ttf")
+    test_args = [
+        "bogusfile.ttf",
+        os.path.join("tests", "test_files", "text", "test.txt"),
+        test_inpath,
+    ]
+
+    # setup
+    if os.path.isdir(test_dir):
+        shutil.rmtree(test_dir)
+    os.mkdir(test_dir)
+    shutil.copyfile(notouch_inpath, test_inpath)
+
+    # execute
+    with pytest.raises(SystemExit):
+        run(test_args)
+    captured = capsys.readouterr()
+    assert "2 of 3 font files failed" in captured.err
+    assert "bogusfile.ttf" in captured.err
+
+    # test that the valid file in the batch was still written
+    font_validator(test_outpath)
+
+    # tear down
+    shutil.rmtree(test_dir)
+
+
+def test_run_multiple_files_with_outfile_path():
+    with pytest.raises(SystemExit):
+        run(
+            [
+                "-o",
+                "test.ttf",
+                os.path.join("tests", "test_files", "fonts", "Roboto-Regular.ttf"),
+                os.path.join("tests", "test_files", "fonts", "NotoSans-Regular.ttf"),
+            ]
+        )
+
+
+def test_run_with_empty_glob_pattern():
+    with pytest.raises(SystemExit):
+        run([os.path.join("tests", "test_files", "fonts", "*.bogus")])
+
+
+def test_run_fast_roboto():
+    test_dir = os.path.join("tests", "test_files", "fonts", "temp")
+    notouch_inpath = os.path.join("tests", "test_files", "fonts", "Roboto-Regular.ttf")
+    test_inpath = os.path.join(test_dir, "Roboto-Regular.ttf")
+    test_outpath = os.path.join(test_dir, "Roboto-Regular-dehinted.ttf")
+    test_args = ["--fast", test_inpath]
+
+    # setup
+    if os.path.isdir(test_dir):
+        shutil.rmtree(test_dir)
+    os.mkdir(test_dir)
+    shutil.copyfile(notouch_inpath, test_inpath)
+
+    # execute
+    run(test_args)
+
+    # test
+    font_validator(test_outpath)
+
+    # tear down
+    shutil.rmtree(test_dir)
+
+
+def test_run_fast_with_non_font_file():
+    with pytest.raises(SystemExit):
+        run(["--fast", os.path.join("tests", "test_files", "text", "test.txt")])
+
+
+def test_run_collection(ttc_path):
+    test_dir = os.path.join("tests", "test_files", "fonts", "temp")
+    test_inpath = os.path.join(test_dir, "Roboto-Collection.ttc")
+    test_outpath = os.path.join(test_dir, "Roboto-Collection-dehinted.ttc")
+
+    # setup
+    if os.path.isdir(test_dir):
+        shutil.rmtree(test_dir)
+    os.mkdir(test_dir)
+    shutil.copyfile(ttc_path, test_inpath)
+
+    for test_args in ([test_inpath], ["--fast", test_inpath]):
+        # execute
+        run(test_args)
+
+        # test
+        for tt in TTCollection(test_outpath).fonts:
+            assert "fpgm" not in tt
+            assert tt["gasp"].gaspRange == {65535: 0x000A}
+        os.remove(test_outpath)
+
+    # tear down
+    shutil.rmtree(test_dir)
+
+
+def test_run_woff(woff_path):
+    test_dir = os.path.join("tests", "test_files", "fonts", "temp")
+    test_inpath = os.path.join(test_dir, "Roboto-Regular.woff")
+    test_outpath = os.path.join(test_dir, "Roboto-Regular-dehinted.woff")
+
+    # setup
+    if os.path.isdir(test_dir):
+        shutil.rmtree(test_dir)
+    os.mkdir(test_dir)
+    shutil.copyfile(woff_path, test_inpath)
+
+    for test_args in ([test_inpath], ["--fast", test_inpath]):
+        # execute
+        run(test_args)
+
+        # test
+        font_validator(test_outpath)
+        assert TTFont(test_outpath).flavor == "woff"
+        os.remove(test_outpath)
+
+    # tear down
+    shutil.rmtree(test_dir)
+
+
+def test_run_flavor():
+    test_dir = os.path.join("tests", "test_files", "fonts", "temp")
+    notouch_inpath = os.path.join("tests", "test_files", "fonts", "Roboto-Regular.ttf")
+    test_inpath = os.path.join(test_dir, "Roboto-Regular.ttf")
+    woff_outpath = os.path.join(test_dir, "Roboto-Regular-dehinted.woff")
+    ttf_outpath = os.path.join(test_dir, "Roboto-Regular-dehinted.ttf")
+
+    # setup
+    if os.path.isdir(test_dir):
+        shutil.rmtree(test_dir)
+    os.mkdir(test_dir)
+    shutil.copyfile(notouch_inpath, test_inpath)
+
+    for fast_args in ([], ["--fast"]):
+        # execute
+        run(fast_args + ["--flavor", "woff", test_inpath])
+        run(fast_args + ["--flavor", "ttf", woff_outpath, "-o", ttf_outpath])
+
+        # test
+        assert TTFont(woff_outpath).flavor == "woff"
+        font_validator(woff_outpath)
+        assert TTFont(ttf_outpath).flavor is None
+        font_validator(ttf_outpath)
+        os.remove(woff_outpath)
+        os.remove(ttf_outpath)
+
+    # tear down
+    shutil.rmtree(test_dir)
+
+
+def test_run_flavor_with_collection(ttc_path, capsys):
+    with pytest.raises(SystemExit):
+        run(["--fast", "--flavor", "woff", ttc_path])
+    captured = capsys.readouterr()
+    assert "does not support font collections" in captured.err
+
+
+def test_run_with_cache(capsys):
+    test_dir = os.path.join("tests", "test_files", "fonts", "temp")
+    cache_dir = os.path.join(test_dir, "cache")
+    notouch_inpath = os.path.join("tests", "test_files", "fonts", "Roboto-Regular.ttf")
+    test_inpath = os.path.join(test_dir, "Roboto-Regular.ttf")
+    test_outpath = os.path.join(test_dir, "Roboto-Regular-dehinted.ttf")
+
+    # setup
+    if os.path.isdir(test_dir):
+        shutil.rmtree(test_dir)
+    os.mkdir(test_dir)
+    shutil.copyfile(notouch_inpath, test_inpath)
+
+    # execute
+    run(["--cache-dir", cache_dir, test_inpath])
+    os.remove(test_outpath)
+    capsys.readouterr()
+    run(["--cache-dir", cache_dir, test_inpath])
+
+    # test
+    captured = capsys.readouterr()
+    assert "in the cache" in captured.out
+    assert "Removed" not in captured.out
+    font_validator(test_outpath)
+
+    run(["cache", "stats", "--cache-dir", cache_dir])
+    captured = capsys.readouterr()
+    assert "Entries: 1" in captured.out
+
+    run(["--cache-dir", cache_dir, "--cache-max-size", "0", test_inpath])
+    run(["cache", "stats", "--cache-dir", cache_dir])
+    captured = capsys.readouterr()
+    assert "Entries: 0" in captured.out
+
+    run(["--quiet", "--cache-dir", cache_dir, test_inpath])
+    run(["cache", "prune", "--cache-dir", cache_dir])
+    captured = capsys.readouterr()
+    assert "Removed 1 cache entries" in captured.out
+
+    # tear down
+    shutil.rmtree(test_dir)
+
+
+def test_run_with_invalid_cache_max_size():
+    with pytest.raises(SystemExit):
+        run(
+            [
+                "--cache-dir",
+                "cache",
+                "--cache-max-size",
+                "big",
+                os.path.join("tests", "test_files", "fonts", "Roboto-Regular.ttf"),
+            ]
+        )
+
+
+def test_run_sync(capsys):
+    test_dir = os.path.join("tests", "test_files", "fonts", "temp")
+    src_dir = os.path.join(test_dir, "src")
+    dst_dir = os.path.join(test_dir, "dst")
+    notouch_inpath = os.path.join("tests", "test_files", "fonts", "Roboto-Regular.ttf")
+
+    # setup
+    if os.path.isdir(test_dir):
+        shutil.rmtree(test_dir)
+    os.makedirs(src_dir)
+    shutil.copyfile(notouch_inpath, os.path.join(src_dir, "Roboto-Regular.ttf"))
+
+    # execute
+    run(["sync", "--fast", src_dir, dst_dir])
+    captured = capsys.readouterr()
+    assert "1 dehinted, 0 unchanged" in captured.out
+    font_validator(os.path.join(dst_dir, "Roboto-Regular.ttf"))
+
+    run(["sync", "--fast", src_dir, dst_dir])
+    captured = capsys.readouterr()
+    assert "0 dehinted, 1 unchanged" in captured.out
+
+    # tear down
+    shutil.rmtree(test_dir)
+
+
+def test_run_file_with_subcommand_name(monkeypatch):
+    test_dir = os.path.join("tests", "test_files", "fonts", "temp")
+    notouch_inpath = os.path.join("tests", "test_files", "fonts", "Roboto-Regular.ttf")
+
+    # setup
+    if os.path.isdir(test_dir):
+        shutil.rmtree(test_dir)
+    os.mkdir(test_dir)
+    for file_name in ("cache", "sync", "serve"):
+        shutil.copyfile(notouch_inpath, os.path.join(test_dir, file_name))
+    monkeypatch.chdir(test_dir)
+
+    # execute
+    run(["--fast", "--quiet", "cache", "sync", "serve"])
+
+    # test
+    for file_name in ("cache", "sync", "serve"):
+        font_validator(file_name + "-dehinted")
+
+    # tear down
+    monkeypatch.undo()
+    shutil.rmtree(test_dir)
+
+
+def test_run_sync_invalid_directories():
+    font_dir = os.path.join("tests", "test_files", "fonts")
+    with pytest.raises(SystemExit):
+        run(["sync", os.path.join(font_dir, "bogus"), "dst"])
+    with pytest.raises(SystemExit):
+        run(["sync", font_dir, os.path.join(font_dir, "temp")])
+
+
+def test_run_with_profile():
+    test_dir = os.path.join("tests", "test_files", "fonts", "temp")
+    notouch_inpath = os.path.join("tests", "test_files", "fonts", "Roboto-Regular.ttf")
+    test_inpath = os.path.join(test_dir, "Roboto-Regular.ttf")
+    profile_path = os.path.join(test_dir, "profile.jsonl")
+
+    # setup
+    if os.path.isdir(test_dir):
+        shutil.rmtree(test_dir)
+    os.mkdir(test_dir)
+    shutil.copyfile(notouch_inpath, test_inpath)
+
+    # execute
+    run(["--fast", "--quiet", "--profile", profile_path, test_inpath])
+
+    # test
+    with open(profile_path) as f:
+        records = [json.loads(line) for line in f]
+    assert [record["phase"] for record in records][0] == "load"
+    assert [record["phase"] for record in records][-1] == "save"
+    for record in records:
+        assert record["file"] == test_inpath
+        assert record["peak_memory"] == 0
+        assert set(record) == {
+            "file",
+            "phase",
+            "table",
+            "wall_time",
+            "cpu_time",
+            "peak_memory",
+        }
+
+    # tear down
+    shutil.rmtree(test_dir)
+
+
+def test_run_with_profile_memory():
+    test_dir = os.path.join("tests", "test_files", "fonts", "temp")
+    notouch_inpath = os.path.join("tests", "test_files", "fonts", "Roboto-Regular.ttf")
+    test_inpath = os.path.join(test_dir, "Roboto-Regular.ttf")
+    profile_path = os.path.join(test_dir, "profile.jsonl")
+
+    # setup
+    if os.path.isdir(test_dir):
+        shutil.rmtree(test_dir)
+    os.mkdir(test_dir)
+    shutil.copyfile(notouch_inpath, test_inpath)
+
+    # execute
+    with pytest.raises(SystemExit):
+        run(["--fast", "--quiet", "--profile-memory", test_inpath])
+    run(["--fast", "--quiet", "--profile", profile_path, "--profile-memory", test_inpath])
+
+    # test
+    with open(profile_path) as f:
+        records = [json.loads(line) for line in f]
+    assert any(record["peak_memory"] > 0 for record in records)
+
+    # tear down
+    shutil.rmtree(test_dir)
+
+
+def test_run_with_report(capsys):
+    test_dir = os.path.join("tests", "test_files", "fonts", "temp")
+    notouch_inpath = os.path.join("tests", "test_files", "fonts", "Roboto-Regular.ttf")
+    test_inpath = os.path.join(test_dir, "Roboto-Regular.ttf")
+    test_outpath = os.path.join(test_dir, "Roboto-Regular-dehinted.ttf")
+    text_inpath = os.path.join("tests", "test_files", "text", "test.txt")
+
+    # setup
+    if os.path.isdir(test_dir):
+        shutil.rmtree(test_dir)
+    os.mkdir(test_dir)
+    shutil.copyfile(notouch_inpath, test_inpath)
+
+    # execute: a single JSON array
+    run(["--report", "json", test_inpath])
+    captured = capsys.readouterr()
+    records = json.loads(captured.out)
+    assert len(records) == 1
+    record = records[0]
+    assert record["file"] == test_inpath
+    assert record["outfile"] == test_outpath
+    assert record["ok"] is True
+    assert record["error"] is None
+    assert "fpgm" in record["removed_tables"]
+    assert record["glyphs_edited"] > 0
+    assert record["bytecode_removed"] > 0
+    assert record["maxp"]["maxZones"] == {"old": 1, "new": 0}
+    assert record["gasp"]["gaspRange"]["new"] == {"65535": 10}
+    assert record["in_size"] == os.path.getsize(test_inpath)
+    assert record["out_size"] == os.path.getsize(test_outpath)
+    os.remove(test_outpath)
+
+    # execute: one JSON object per line, failed requests are reported
+    with pytest.raises(SystemExit):
+        run(["--fast", "--report", "ndjson", test_inpath, text_inpath])
+    captured = capsys.readouterr()
+    lines = captured.out.splitlines()
+    assert len(lines) == 2
+    records = [json.loads(line) for line in lines]
+    assert records[0]["file"] == text_inpath
+    assert records[0]["ok"] is False
+    assert records[1]["file"] == test_inpath
+    assert records[1]["ok"] is True
+    assert records[1]["glyphs_edited"] == record["glyphs_edited"]
+    assert "[!] Error" in captured.err
+
+    # tear down
+    shutil.rmtree(test_dir)
+
+
+def test_run_keep_tsi(vtt_path, tmp_path):
+    outpath = str(tmp_path / "Roboto-Regular-VTT-dehinted.ttf")
+    run(["--quiet", "-o", outpath, vtt_path])
+    assert not [tag for tag in TTFont(outpath).keys() if tag.startswith("TSI")]
+    assert os.path.getsize(outpath) < os.path.getsize(vtt_path)
+
+    run(["--quiet", "--keep-tsi", "-o", outpath, vtt_path])
+    tt = TTFont(outpath)
+    assert [tag for tag in tt.keys() if tag.startswith("TSI")] == [
+        "TSI0",
+        "TSI1",
+        "TSIP",
+        "TSIV",
+    ]
+    assert "fpgm" not in tt
+    assert tt.reader["TSIV"] == b"TSIV" * 64
+
+
+def test_run_glyf_jobs(tmp_path, monkeypatch, capsys):
+    from dehinter import glyf
+
+    monkeypatch.setattr(glyf, "GLYF_CHUNK_MIN_GLYPHS", 100)
+    inpath = os.path.join("tests", "test_files", "fonts", "NotoSans-Regular.ttf")
+    serial_outpath = str(tmp_path / "serial.ttf")
+    parallel_outpath = str(tmp_path / "parallel.ttf")
+    run(["--quiet", "--fast", "-o", serial_outpath, inpath])
+    run(["--quiet", "--fast", "--glyf-jobs", "4", "-o", parallel_outpath, inpath])
+    with open(serial_outpath, "rb") as f, open(parallel_outpath, "rb") as g:
+        assert f.read() == g.read()
+
+    with pytest.raises(SystemExit):
+        run(["--glyf-jobs", "4", "-o", parallel_outpath, inpath])
+    assert "requires the --fast option" in capsys.readouterr().err
+    with pytest.raises(SystemExit):
+        run(["--fast", "--glyf-jobs", "-1", "-o", parallel_outpath, inpath])
+    assert "--glyf-jobs must be a positive integer" in capsys.readouterr().err
+
+
+#
+#  Start-up import tests
+#
+
+IMPORTED_MODULES_SCRIPT = """
+import sys
+from dehinter.__main__ import run
+try:
+    run(sys.argv[1:])
+except SystemExit:
+    pass
+print(" ".join(sorted(sys.modules)))
+"""
+
+
+def get_imported_modules(argv):
+    process = subprocess.run(
+        [sys.executable, "-c", IMPORTED_MODULES_SCRIPT] + argv,
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    return process.stdout.splitlines()[-1].split()
+
+
+@pytest.mark.parametrize(
+    "argv",
+    [
+        ["--version"],
+        ["--help"],
+        [os.path.join("tests", "test_files", "text", "test.txt")],
+        [os.path.join("tests", "test_files", "fonts", "does-not-exist.ttf")],
+    ],
+)
+def test_run_startup_does_not_import_fonttools(argv):
+    modules = get_imported_modules(argv)
+    assert not [module for module in modules if module.startswith("fontTools")]
+    assert "concurrent.futures.process" not in modules
+
+
+@pytest.mark.parametrize("argv", [["--version"], ["--help"]])
+def test_run_version_and_help_import_no_batch_modules(argv):
+    modules = get_imported_modules(argv)
+    assert "dehinter.batch" not in modules
+    assert "dehinter.cache" not in modules
+    assert "dehinter.server" not in modules
+
+
+def test_run_fast_does_not_import_fonttools(tmp_path):
+    inpath = str(tmp_path / "Roboto-Regular.ttf")
+    shutil.copyfile(
+        os.path.join("tests", "test_files", "fonts", "Roboto-Regular.ttf"), inpath
+    )
+    modules = get_imported_modules(["--fast", "--quiet", inpath])
+    assert not [module for module in modules if module.startswith("fontTools")]
+    assert os.path.exists(str(tmp_path / "Roboto-Regular-dehinted.ttf"))
+
+
+#
+#  Standard input and output
+#
+
+STDIO_SCRIPT = "from dehinter.__main__ import main; main()"
+
+
+def run_pipeline(argv, data):
+    return subprocess.run(
+        [sys.executable, "-c", STDIO_SCRIPT] + argv, input=data, capture_output=True
+    )
+
+
+@pytest.mark.parametrize("fast", [False, True])
+def test_run_stdin_to_stdout(fast, tmp_path):
+    with open(
+        os.path.join("tests", "test_files", "fonts", "Roboto-Regular.ttf"), "rb"
+    ) as f:
+        data = f.read()
+    argv = ["--fast", "-"] if fast else ["-"]
+    process = run_pipeline(argv, data)
+    assert process.returncode == 0
+    assert process.stderr == b""
+    outpath = str(tmp_path / "Roboto-Regular-dehinted.ttf")
+    with open(outpath, "wb") as f:
+        f.write(process.stdout)
+    font_validator(outpath)
+
+
+def test_run_file_to_stdout_with_flavor():
+    inpath = os.path.join("tests", "test_files", "fonts", "Roboto-Regular.ttf")
+    process = run_pipeline(["--flavor", "woff", "-o", "-", inpath], b"")
+    assert process.returncode == 0
+    assert process.stdout[:4] == b"wOFF"
+    # no default out file path is written
+    assert not os.path.exists(
+        os.path.join("tests", "test_files", "fonts", "Roboto-Regular-dehinted.woff")
+    )
+
+
+def test_run_stdin_to_file(tmp_path, monkeypatch, capsys):
+    with open(
+        os.path.join("tests", "test_files", "fonts", "Roboto-Regular.ttf"), "rb"
+    ) as f:
+        data = f.read()
+    monkeypatch.setattr(sys, "stdin", io.TextIOWrapper(io.BytesIO(data)))
+    outpath = str(tmp_path / "Roboto-Regular-dehinted.ttf")
+    run(["--report", "json", "-o", outpath, "-"])
+    (record,) = json.loads(capsys.readouterr().out)
+    assert record["file"] == "-"
+    assert record["in_size"] == len(data)
+    assert record["out_size"] == os.path.getsize(outpath)
+    font_validator(outpath)
+
+
+def test_run_stdin_with_non_font_data(tmp_path):
+    outpath = str(tmp_path / "test-dehinted.ttf")
+    process = run_pipeline(["-o", outpath, "-"], b"not a font" * 1000)
+    assert process.returncode == 1
+    assert b"do not appear to be a TrueType font" in process.stderr
+    assert not os.path.exists(outpath)
+
+
+@pytest.mark.parametrize(
+    "argv, message",
+    [
+        (
+            ["-", os.path.join("tests", "test_files", "fonts", "Roboto-Regular.ttf")],
+            "standard input",
+        ),
+        (["--cache-dir", "cache", "-"], "--cache-dir"),
+        (["--report", "json", "-"], "--report"),
+    ],
+)
+def test_run_stdio_invalid_options(argv, message, capsys):
+    with pytest.raises(SystemExit):
+        run(argv)
+    assert message in capsys.readouterr().err
+
+
+def test_run_fsync(tmp_path, monkeypatch):
+    from dehinter import batch
+
+    fsynced_dirs = []
+    monkeypatch.setattr(batch, "fsync_directory", fsynced_dirs.append)
+    for filename in ("Roboto-Regular.ttf", "NotoSans-Regular.ttf"):
+        shutil.copyfile(
+            os.path.join("tests", "test_files", "fonts", filename),
+            str(tmp_path / filename),
+        )
+    run(["--fsync", "--fast", "--quiet", str(tmp_path)])
+    assert fsynced_dirs == [str(tmp_path)]
+    assert sorted(os.listdir(str(tmp_path))) == [
+        "NotoSans-Regular-dehinted.ttf",
+        "NotoSans-Regular.ttf",
+        "Roboto-Regular-dehinted.ttf",
+        "Roboto-Regular.ttf",
+    ]
+
+
+def test_run_recalc(tmp_path):
+    inpath = str(tmp_path / "Roboto-Regular.ttf")
+    outpath = str(tmp_path / "Roboto-Regular-dehinted.ttf")
+    shutil.copyfile(
+        os.path.join("tests", "test_files", "fonts", "Roboto-Regular.ttf"), inpath
+    )
+    tt = TTFont(inpath, recalcBBoxes=False)
+    tt["head"].xMin = -2000
+    tt.save(inpath)
+    run(["--quiet", inpath])
+    assert TTFont(outpath)["head"].xMin == -2000
+    run(["--quiet", "--recalc", inpath])
+    assert TTFont(outpath)["head"].xMin == -1825
@@ -1,6 +1,6 @@
 import os
 
-from dehinter.paths import filepath_exists, get_default_out_path
+from dehinter.paths import expand_input_paths, filepath_exists, get_default_out_path
 
 import pytest
 
@@ -27,3 +27,64 @@ def test_get_default_filepath_with_dir():
     assert default_path == os.path.join(
         "tests", "test_files", "fonts", "Roboto-Regular-dehinted.ttf"
     )
+
+
+def test_get_default_filepath_with_file_extension():
+    path = os.path.join("tests", "test_files", "fonts", "Roboto-Regular.ttf")
+    default_path = get_default_out_path(path, ".woff2")
+    assert default_path == os.path.join(
+        "tests", "test_files", "fonts", "Roboto-Regular-dehinted.woff2"
+    )
+
+
+def test_expand_input_paths_with_file_path():
+    path = os.path.join("tests", "test_files", "fonts", "Roboto-Regular.ttf")
+    assert expand_input_paths([path]) == [path]
+
+
+def test_expand_input_paths_with_missing_file_path():
+    assert expand_input_paths(["bogus_file.ttf"]) == ["bogus_file.ttf"]
+
+
+def test_expand_input_paths_with_dir_path():
+    dir_path = os.path.join("tests", "test_files", "fonts")
+    paths = expand_input_paths([dir_path])
+    assert paths == [
+        os.path.join(dir_path, "NotoSans-Regular.ttf"),
+        os.path.join(dir_path, "OpenSans-VF.ttf"),
+        os.path.join(dir_path, "Roboto-Regular.ttf"),
+        os.path.join(dir_path, "Ubuntu-Regular.ttf"),
+    ]
+
+
+def test_expand_input_paths_with_dir_path_dehinted_files(tmp_path):
+    for file_name in (
+        "A-Regular.ttf",
+        "A-Regular-dehinted.ttf",
+        "B-Regular.woff",
+        "B-Regular-dehinted.woff2",
+        "C-dehinted.ttf",
+    ):
+        (tmp_path / file_name).write_bytes(b"")
+    paths = expand_input_paths([str(tmp_path)])
+    # dehinted files without an in file in the directory are font files
+    assert paths == [
+        os.path.join(str(tmp_path), "A-Regular.ttf"),
+        os.path.join(str(tmp_path), "B-Regular.woff"),
+        os.path.join(str(tmp_path), "C-dehinted.ttf"),
+    ]
+
+
+def test_expand_input_paths_with_glob_pattern():
+    pattern = os.path.join("tests", "test_files", "fonts", "Roboto-*.ttf")
+    paths = expand_input_paths([pattern])
+    assert paths == [
+        os.path.join("tests", "test_files", "fonts", "Roboto-Regular-dehinted.ttf"),
+        os.path.join("tests", "test_files", "fonts", "Roboto-Regular.ttf"),
+    ]
+
+
+def test_expand_input_paths_removes_duplicates():
+    path = os.path.join("tests", "test_files", "fonts", "Roboto-Regular.ttf")
+    pattern = os.path.join("tests", "test_files", "fonts", "Roboto-Regular.tt?")
+    assert expand_input_paths([path, pattern, path]) == [path]
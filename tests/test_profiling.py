@@ -0,0 +1,124 @@
+import json
+import os
+import tracemalloc
+
+from fontTools.ttLib import TTFont
+
+from dehinter.batch import dehint_font_file
+from dehinter.font import dehint, dehint_file
+from dehinter.profiling import PhaseTiming, Profiler, profile_phase
+from dehinter.raw import dehint_sfnt
+from dehinter.sfnt import open_sfnt
+
+FILEPATH_HINTED_TTF = os.path.join("tests", "test_files", "fonts", "Roboto-Regular.ttf")
+
+
+def test_profiler_phase():
+    timings = []
+    with Profiler(callback=timings.append, trace_memory=True) as profiler:
+        with profiler.phase("allocate", "glyf"):
+            data = bytearray(1 << 20)
+        assert tracemalloc.is_tracing()
+    assert not tracemalloc.is_tracing()
+    assert len(data) == 1 << 20
+    assert timings == profiler.timings
+    (timing,) = timings
+    assert timing.phase == "allocate"
+    assert timing.table == "glyf"
+    assert timing.wall_time >= 0
+    assert timing.cpu_time >= 0
+    assert timing.peak_memory >= 1 << 20
+
+
+def test_profiler_without_memory_trace():
+    with Profiler() as profiler:
+        assert not tracemalloc.is_tracing()
+        with profiler.phase("load"):
+            pass
+    assert profiler.timings[0].peak_memory == 0
+
+
+def test_profiler_does_not_stop_existing_trace():
+    tracemalloc.start()
+    try:
+        with Profiler(trace_memory=True) as profiler:
+            with profiler.phase("load"):
+                pass
+        assert tracemalloc.is_tracing()
+    finally:
+        tracemalloc.stop()
+
+
+def test_profile_phase_without_profiler():
+    with profile_phase(None, "load"):
+        pass
+
+
+def test_phase_timing_to_json():
+    timing = PhaseTiming("update_gasp_table", "gasp", 0.5, 0.25, 100)
+    assert json.loads(timing.to_json(file="font.ttf")) == {
+        "file": "font.ttf",
+        "phase": "update_gasp_table",
+        "table": "gasp",
+        "wall_time": 0.5,
+        "cpu_time": 0.25,
+        "peak_memory": 100,
+    }
+
+
+def test_dehint_with_profiler():
+    tt = TTFont(FILEPATH_HINTED_TTF)
+    with Profiler(trace_memory=False) as profiler:
+        dehint(tt, keep_fpgm=True, verbose=False, profiler=profiler)
+    phases = [timing.phase for timing in profiler.timings]
+    assert "remove_cvt_table" in phases
+    assert "remove_fpgm_table" not in phases
+    assert phases[-4:] == [
+        "remove_glyf_instructions",
+        "update_gasp_table",
+        "update_maxp_table",
+        "update_head_table_flags",
+    ]
+
+
+def test_dehint_sfnt_with_profiler():
+    with Profiler(trace_memory=False) as profiler:
+        with open_sfnt(FILEPATH_HINTED_TTF) as sfnt:
+            dehint_sfnt(sfnt, verbose=False, profiler=profiler)
+    tables = {timing.phase: timing.table for timing in profiler.timings}
+    assert tables["remove_cvt_table"] == "cvt "
+    assert tables["remove_raw_glyf_instructions"] == "glyf"
+    assert tables["update_raw_maxp_table"] == "maxp"
+
+
+def test_dehint_file_with_profiler(tmp_path):
+    with Profiler(trace_memory=False) as profiler:
+        dehint_file(
+            FILEPATH_HINTED_TTF,
+            tmp_path / "out.ttf",
+            verbose=False,
+            profiler=profiler,
+        )
+    phases = [timing.phase for timing in profiler.timings]
+    assert phases[0] == "load"
+    assert phases[-1] == "save"
+
+
+def test_dehint_font_file_profile(tmp_path):
+    outpath = str(tmp_path / "out.ttf")
+    result = dehint_font_file(FILEPATH_HINTED_TTF, outpath, {}, fast=True)
+    assert result.timings == ()
+    result = dehint_font_file(FILEPATH_HINTED_TTF, outpath, {}, fast=True, profile=True)
+    assert result.ok is True
+    phases = [timing.phase for timing in result.timings]
+    assert phases[0] == "load"
+    assert "remove_raw_glyf_instructions" in phases
+    assert phases[-1] == "save"
+    assert all(timing.peak_memory == 0 for timing in result.timings)
+    assert not tracemalloc.is_tracing()
+    result = dehint_font_file(
+        FILEPATH_HINTED_TTF, outpath, {}, fast=True, profile=True, profile_memory=True
+    )
+    assert result.ok is True
+    assert any(timing.peak_memory > 0 for timing in result.timings)
+    assert not tracemalloc.is_tracing()
@@ -0,0 +1,268 @@
+import os
+import struct
+from io import BytesIO
+
+from fontTools.ttLib import TTCollection, TTFont
+
+from dehinter.batch import dehint_font_file
+from dehinter.font import remove_glyf_instructions
+
+from dehinter.raw import (
+    dehint_sfnt,
+    recalc_raw_glyf_metrics,
+    remove_raw_glyf_instructions,
+    update_raw_gasp_table,
+    update_raw_head_table_flags,
+    update_raw_maxp_table,
+)
+from dehinter.sfnt import SFNTCollection, SFNTFont, open_sfnt
+
+import pytest
+
+FILEPATH_HINTED_TTF = os.path.join("tests", "test_files", "fonts", "Roboto-Regular.ttf")
+FILEPATH_DEHINTED_TTF = os.path.join(
+    "tests", "test_files", "fonts", "Roboto-Regular-dehinted.ttf"
+)
+FILEPATH_HINTED_TTF_2 = os.path.join(
+    "tests", "test_files", "fonts", "NotoSans-Regular.ttf"
+)
+FILEPATH_HINTED_TTF_3 = os.path.join("tests", "test_files", "fonts", "Ubuntu-Regular.ttf")
+FILEPATH_HINTED_TTF_VF = os.path.join("tests", "test_files", "fonts", "OpenSans-VF.ttf")
+
+
+def get_sfnt(filepath):
+    with open(filepath, "rb") as f:
+        return SFNTFont(f.read())
+
+
+def compile_to_ttfont(sfnt):
+    return TTFont(BytesIO(sfnt.compile()))
+
+
+@pytest.mark.parametrize(
+    "filepath",
+    [
+        FILEPATH_HINTED_TTF,
+        FILEPATH_HINTED_TTF_2,
+        FILEPATH_HINTED_TTF_3,
+        FILEPATH_HINTED_TTF_VF,
+    ],
+)
+def test_dehint_sfnt_matches_dehint(filepath):
+    from dehinter.font import dehint
+
+    sfnt = get_sfnt(filepath)
+    raw_report = dehint_sfnt(sfnt, verbose=False)
+    raw_tt = compile_to_ttfont(sfnt)
+
+    tt = TTFont(filepath)
+    report = dehint(tt, verbose=False)
+
+    assert raw_report == report
+    assert report.glyphs_edited > 0
+    assert report.bytecode_removed > 0
+
+    assert sorted(raw_tt.keys()) == sorted(tt.keys())
+    assert raw_tt["gasp"].gaspRange == tt["gasp"].gaspRange
+    assert raw_tt["maxp"].__dict__ == tt["maxp"].__dict__
+    assert raw_tt["head"].flags == tt["head"].flags
+    for glyph_name in tt.getGlyphOrder():
+        raw_glyph = raw_tt["glyf"][glyph_name]
+        glyph = tt["glyf"][glyph_name]
+        assert raw_glyph.compile(raw_tt["glyf"]) == glyph.compile(tt["glyf"])
+
+
+def test_dehint_sfnt_keep_options():
+    sfnt = get_sfnt(FILEPATH_HINTED_TTF)
+    glyf_data = bytes(sfnt["glyf"])
+    dehint_sfnt(sfnt, keep_fpgm=True, keep_glyf=True, keep_hdmx=True, verbose=False)
+    assert "fpgm" in sfnt
+    assert "hdmx" in sfnt
+    assert "prep" not in sfnt
+    assert bytes(sfnt["glyf"]) == glyf_data
+    # head flags bit 4 is not cleared when the hdmx table is present
+    tt = compile_to_ttfont(sfnt)
+    assert (tt["head"].flags & 1 << 4) != 0
+
+
+def test_dehint_sfnt_preserves_table_order():
+    # the Ubuntu glyf table data precede the head table data
+    original = get_sfnt(FILEPATH_HINTED_TTF_3)
+    sfnt = get_sfnt(FILEPATH_HINTED_TTF_3)
+    dehint_sfnt(sfnt, verbose=False)
+    dehinted = SFNTFont(sfnt.compile())
+    assert dehinted.table_order()[:2] == ["glyf", "maxp"]
+    assert dehinted.table_order() == [
+        tag for tag in original.table_order() if tag in sfnt
+    ]
+    for tag in ("GPOS", "GSUB", "name", "post"):
+        assert bytes(dehinted[tag]) == bytes(original[tag])
+
+
+def test_dehint_sfnt_vtt_tables(vtt_path):
+    from dehinter.font import dehint
+
+    sfnt = get_sfnt(vtt_path)
+    raw_report = dehint_sfnt(sfnt, verbose=False)
+    assert not [tag for tag in sfnt.keys() if tag.startswith("TSI")]
+    assert raw_report.removed_tables[-4:] == ["TSI0", "TSI1", "TSIP", "TSIV"]
+    assert raw_report == dehint(TTFont(vtt_path), verbose=False)
+
+    sfnt = get_sfnt(vtt_path)
+    raw_report = dehint_sfnt(sfnt, keep_tsi=True, verbose=False)
+    assert [tag for tag in sfnt.keys() if tag.startswith("TSI")] == [
+        "TSI0",
+        "TSI1",
+        "TSIP",
+        "TSIV",
+    ]
+    assert "fpgm" not in sfnt
+
+
+def test_dehint_sfnt_keeps_cvar_in_static_font():
+    sfnt = get_sfnt(FILEPATH_HINTED_TTF_VF)
+    del sfnt["fvar"]
+    dehint_sfnt(sfnt, verbose=False)
+    assert "cvar" in sfnt
+
+
+def test_dehint_sfnt_verbose_output(capsys):
+    sfnt = get_sfnt(FILEPATH_HINTED_TTF)
+    dehint_sfnt(sfnt)
+    captured = capsys.readouterr()
+    assert "[-] Removed fpgm table" in captured.out
+    assert "[-] Removed glyf table instruction bytecode" in captured.out
+
+
+def test_remove_raw_glyf_instructions_dehinted_font():
+    sfnt = get_sfnt(FILEPATH_DEHINTED_TTF)
+    glyf_data = bytes(sfnt["glyf"])
+    assert remove_raw_glyf_instructions(sfnt) == 0
+    assert bytes(sfnt["glyf"]) == glyf_data
+
+
+def test_update_raw_gasp_table():
+    sfnt = get_sfnt(FILEPATH_HINTED_TTF)
+    assert update_raw_gasp_table(sfnt) is True
+    assert compile_to_ttfont(sfnt)["gasp"].gaspRange == {65535: 0x000A}
+    assert update_raw_gasp_table(sfnt) is False
+
+
+def test_update_raw_gasp_table_missing_table():
+    sfnt = get_sfnt(FILEPATH_HINTED_TTF)
+    del sfnt["gasp"]
+    assert update_raw_gasp_table(sfnt) is True
+    assert compile_to_ttfont(sfnt)["gasp"].gaspRange == {65535: 0x000A}
+
+
+def test_update_raw_maxp_table():
+    sfnt = get_sfnt(FILEPATH_HINTED_TTF)
+    assert update_raw_maxp_table(sfnt) is True
+    maxp = compile_to_ttfont(sfnt)["maxp"]
+    assert maxp.maxZones == 0
+    assert maxp.maxTwilightPoints == 0
+    assert maxp.maxStorage == 0
+    assert maxp.maxFunctionDefs == 0
+    assert maxp.maxStackElements == 0
+    assert maxp.maxSizeOfInstructions == 0
+    assert update_raw_maxp_table(sfnt) is False
+
+
+def test_update_raw_maxp_table_version_0_5():
+    sfnt = get_sfnt(FILEPATH_HINTED_TTF)
+    sfnt["maxp"] = struct.pack(">LH", 0x00005000, 10)
+    assert update_raw_maxp_table(sfnt) is False
+
+
+def test_update_raw_head_table_flags():
+    sfnt = get_sfnt(FILEPATH_HINTED_TTF)
+    # bit 4 remains set when hdmx and LTSH are present
+    assert update_raw_head_table_flags(sfnt) is False
+    del sfnt["hdmx"]
+    del sfnt["LTSH"]
+    assert update_raw_head_table_flags(sfnt) is True
+    assert (compile_to_ttfont(sfnt)["head"].flags & 1 << 4) == 0
+    assert update_raw_head_table_flags(sfnt) is False
+
+
+def test_dehint_sfnt_collection(ttc_path, capsys):
+    with open_sfnt(ttc_path) as collection:
+        assert isinstance(collection, SFNTCollection)
+        dehint_sfnt(collection)
+        fonts = collection.fonts
+        assert fonts[0]["glyf"] is fonts[1]["glyf"]
+        assert fonts[0]["loca"] is fonts[1]["loca"]
+        compiled = collection.compile()
+    captured = capsys.readouterr()
+    assert "Font 1 of 2 in collection" in captured.out
+    assert "Font 2 of 2 in collection" in captured.out
+
+    tt_collection = TTCollection(BytesIO(compiled), checkChecksums=2)
+    assert len(tt_collection.fonts) == 2
+    for tt in tt_collection.fonts:
+        assert "fpgm" not in tt
+        assert tt["gasp"].gaspRange == {65535: 0x000A}
+        assert remove_glyf_instructions(tt) == 0
+    # shared tables are written once
+    readers = [tt.reader.tables for tt in tt_collection.fonts]
+    for tag in ("glyf", "loca", "GSUB", "maxp", "head"):
+        assert readers[0][tag].offset == readers[1][tag].offset
+    assert readers[0]["name"].offset != readers[1]["name"].offset
+    assert len(compiled) < os.path.getsize(ttc_path)
+
+
+def test_recalc_raw_glyf_metrics():
+    sfnt = get_sfnt(FILEPATH_HINTED_TTF)
+    dehint_sfnt(sfnt, verbose=False)
+    # stale maxp and head values
+    maxp = bytearray(sfnt["maxp"])
+    struct.pack_into(">HH", maxp, 6, 1, 1)
+    sfnt["maxp"] = maxp
+    head = bytearray(sfnt["head"])
+    struct.pack_into(">4h", head, 36, 0, 0, 0, 0)
+    sfnt["head"] = head
+    assert recalc_raw_glyf_metrics(sfnt) is True
+    assert recalc_raw_glyf_metrics(sfnt) is False
+
+    tt = TTFont(FILEPATH_HINTED_TTF)
+    tt["maxp"].recalc(tt)
+    raw_tt = compile_to_ttfont(sfnt)
+    for field in (
+        "maxPoints",
+        "maxContours",
+        "maxCompositePoints",
+        "maxComponentDepth",
+    ):
+        assert getattr(raw_tt["maxp"], field) == getattr(tt["maxp"], field)
+    for field in ("xMin", "yMin", "xMax", "yMax"):
+        assert getattr(raw_tt["head"], field) == getattr(tt["head"], field)
+    assert raw_tt["maxp"].maxSizeOfInstructions == 0
+
+
+def test_dehint_sfnt_recalc_bboxes():
+    sfnt = get_sfnt(FILEPATH_HINTED_TTF)
+    maxp = bytearray(sfnt["maxp"])
+    struct.pack_into(">H", maxp, 6, 1)
+    sfnt["maxp"] = maxp
+    report = dehint_sfnt(sfnt, verbose=False, recalc_bboxes=True)
+    assert report.maxp["maxPoints"] == (1, compile_to_ttfont(sfnt)["maxp"].maxPoints)
+    assert report.maxp["maxSizeOfInstructions"] == (548, 0)
+
+
+
+@pytest.mark.parametrize(
+    "options",
+    [{}, {"keep_glyf": True, "keep_fpgm": True}, {"keep_maxp": True}],
+)
+def test_dehint_sfnt_recalc_matches_fonttools(options, tmp_path):
+    # maxSizeOfInstructions is not recalculated by fontTools
+    raw_path = str(tmp_path / "raw.ttf")
+    fonttools_path = str(tmp_path / "fonttools.ttf")
+    for outpath, fast in ((raw_path, True), (fonttools_path, False)):
+        result = dehint_font_file(
+            FILEPATH_HINTED_TTF, outpath, options, fast=fast, recalc=True
+        )
+        assert result.ok is True
+    raw_maxp = TTFont(raw_path)["maxp"]
+    fonttools_maxp = TTFont(fonttools_path)["maxp"]
+    assert raw_maxp.__dict__ == fonttools_maxp.__dict__
@@ -0,0 +1,46 @@
+import json
+
+from dehinter.report import DehintReport, table_delta
+
+
+def test_table_delta():
+    assert table_delta({"a": 1, "b": 2}, {"a": 0, "b": 2}) == {"a": (1, 0)}
+    assert table_delta({"a": None}, {"a": {65535: 10}}) == {"a": (None, {65535: 10})}
+    assert table_delta({"a": 1}, {"a": 1}) == {}
+
+
+def test_dehint_report_to_dict():
+    font_report = DehintReport(
+        ["cvt ", "fpgm"],
+        glyphs_edited=2,
+        bytecode_removed=10,
+        gasp={"gaspRange": ({8: 2}, {65535: 10})},
+        maxp={"maxZones": (2, 0)},
+        head={},
+    )
+    record = font_report.to_dict()
+    assert record["removed_tables"] == ["cvt ", "fpgm"]
+    assert record["glyphs_edited"] == 2
+    assert record["bytecode_removed"] == 10
+    assert record["gasp"] == {"gaspRange": {"old": {8: 2}, "new": {65535: 10}}}
+    assert record["maxp"] == {"maxZones": {"old": 2, "new": 0}}
+    assert record["head"] == {}
+    assert record["in_size"] is None
+    assert record["fonts"] is None
+
+    collection_record = DehintReport([], fonts=[font_report, font_report]).to_dict()
+    assert collection_record["fonts"] == [record, record]
+    assert collection_record["maxp"] is None
+    json.dumps(collection_record)
+
+
+def test_dehint_report_from_dict():
+    font_report = DehintReport(
+        ["cvt "],
+        glyphs_edited=2,
+        gasp={"gaspRange": (None, {65535: 10})},
+        maxp={"maxZones": (2, 0)},
+        in_size=10,
+    )
+    report = DehintReport([], fonts=[font_report])
+    assert DehintReport.from_dict(json.loads(json.dumps(report.to_dict()))) == report
@@ -0,0 +1,216 @@
+import json
+import os
+import socket
+import threading
+from concurrent.futures.process import BrokenProcessPool
+
+from fontTools.ttLib import TTFont
+
+import pytest
+
+from dehinter.__main__ import run
+from dehinter.batch import dehint_font_file
+from dehinter.server import (
+    DehintServer,
+    prepare_socket_path,
+    request_font_files,
+    send_requests,
+    stop_server,
+)
+
+FILEPATH_HINTED_TTF = os.path.join("tests", "test_files", "fonts", "Roboto-Regular.ttf")
+FILEPATH_TEST_TEXT = os.path.join("tests", "test_files", "text", "test.txt")
+
+
+@pytest.fixture
+def server(tmp_path):
+    """A dehint server that runs in a thread of the test process."""
+    dehint_server = DehintServer(str(tmp_path / "dehinter.sock"), jobs=2)
+    thread = threading.Thread(target=dehint_server.serve_forever)
+    thread.start()
+    yield dehint_server
+    dehint_server.shutdown()
+    thread.join()
+    dehint_server.server_close()
+
+
+def test_server_ping(server):
+    responses = list(send_requests(server.socket_path, [{"op": "ping"}] * 2))
+    assert responses == [{"ok": True, "pid": os.getpid()}] * 2
+
+
+def test_server_invalid_requests(server):
+    sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    sock.connect(server.socket_path)
+    sock.sendall(
+        b'not json\n[1]\n{"op": "unknown"}\n{"outpath": "out.ttf"}\n'
+        b'{"inpath": "in.ttf", "outpath": "out.ttf", "cache_dir": 1}\n'
+        b'{"op": "ping"}\n'
+    )
+    sock.shutdown(socket.SHUT_WR)
+    with sock, sock.makefile("rb") as f:
+        responses = [json.loads(line) for line in f]
+    assert len(responses) == 6
+    assert all(response["ok"] is False for response in responses[:5])
+    assert "invalid request" in responses[0]["error"]
+    assert "requests must be JSON objects" in responses[1]["error"]
+    assert responses[2]["error"] == "unknown op 'unknown'"
+    assert "require an 'inpath' string" in responses[3]["error"]
+    assert "invalid request" in responses[4]["error"]
+    # the connection serves the requests that follow invalid requests
+    assert responses[5]["ok"] is True
+
+
+def test_request_font_files(server, tmp_path):
+    requests = [
+        (FILEPATH_HINTED_TTF, str(tmp_path / "Roboto-Regular-dehinted.ttf")),
+        (FILEPATH_TEST_TEXT, str(tmp_path / "test-dehinted.txt")),
+        (FILEPATH_HINTED_TTF, str(tmp_path / "Roboto-Regular-fast.ttf")),
+    ]
+    results = list(request_font_files(server.socket_path, requests, {}, profile=True))
+    assert [(r.inpath, r.outpath) for r in results] == requests
+    assert [r.ok for r in results] == [True, False, True]
+    assert "Unable to create font object" in results[1].error
+    assert results[0].timings
+
+    # the server result matches a dehint in the client process
+    expected = dehint_font_file(
+        FILEPATH_HINTED_TTF, str(tmp_path / "Roboto-Regular-local.ttf"), {}
+    )
+    assert results[0].report == expected.report
+    assert "fpgm" not in TTFont(requests[2][1])
+
+
+def test_request_font_files_with_options(server, tmp_path):
+    outpath = str(tmp_path / "Roboto-Regular-dehinted.woff")
+    (result,) = request_font_files(
+        server.socket_path,
+        [(FILEPATH_HINTED_TTF, outpath)],
+        {"keep_fpgm": True},
+        fast=True,
+        flavor="woff",
+        cache_dir=str(tmp_path / "cache"),
+    )
+    assert result.ok is True
+    assert result.cached is False
+    tt = TTFont(outpath)
+    assert tt.flavor == "woff"
+    assert "fpgm" in tt
+    assert "prep" not in tt
+
+    # the second request is a cache hit
+    (result,) = request_font_files(
+        server.socket_path,
+        [(FILEPATH_HINTED_TTF, outpath)],
+        {"keep_fpgm": True},
+        fast=True,
+        flavor="woff",
+        cache_dir=str(tmp_path / "cache"),
+    )
+    assert result.ok is True
+    assert result.cached is True
+
+
+def test_request_font_files_large_batch(server, tmp_path):
+    # the responses fill the socket buffers before all requests are sent
+    missing_path = str(tmp_path / "missing.ttf")
+    requests = [(missing_path, str(tmp_path / f"{i}.ttf")) for i in range(5000)]
+    results = []
+
+    def request():
+        results.extend(request_font_files(server.socket_path, requests, {}, fast=True))
+
+    thread = threading.Thread(target=request, daemon=True)
+    thread.start()
+    thread.join(timeout=60)
+    assert not thread.is_alive()
+    assert len(results) == len(requests)
+    assert all(result.ok is False for result in results)
+
+
+def test_server_responds_on_open_connection(server, tmp_path):
+    requests = [
+        {"op": "ping"},
+        {
+            "inpath": os.path.abspath(FILEPATH_HINTED_TTF),
+            "outpath": str(tmp_path / "Roboto-Regular-dehinted.ttf"),
+            "fast": True,
+        },
+        {"op": "ping"},
+    ]
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+        sock.settimeout(30)
+        sock.connect(server.socket_path)
+        with sock.makefile("rb") as f:
+            # each response is read before the next request is sent
+            for request in requests:
+                sock.sendall(json.dumps(request).encode("utf-8") + b"\n")
+                assert json.loads(f.readline())["ok"] is True
+
+
+def test_server_replaces_broken_worker_pool(server, tmp_path):
+    # a worker process exit breaks the process pool
+    with pytest.raises(BrokenProcessPool):
+        server.executor.submit(os._exit, 1).result()
+    outpath = str(tmp_path / "Roboto-Regular-dehinted.ttf")
+    (result,) = request_font_files(
+        server.socket_path, [(FILEPATH_HINTED_TTF, outpath)], {}, fast=True
+    )
+    assert result.ok is True
+    assert "fpgm" not in TTFont(outpath)
+
+
+def test_request_font_files_without_server(tmp_path):
+    with pytest.raises(OSError):
+        request_font_files(str(tmp_path / "dehinter.sock"), [], {})
+
+
+def test_prepare_socket_path(server, tmp_path):
+    # a running server is not replaced
+    with pytest.raises(OSError):
+        prepare_socket_path(server.socket_path)
+    # a stale socket file is removed
+    stale_path = str(tmp_path / "stale.sock")
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+        sock.bind(stale_path)
+    prepare_socket_path(stale_path)
+    assert not os.path.exists(stale_path)
+
+
+def test_stop_server(tmp_path):
+    socket_path = str(tmp_path / "dehinter.sock")
+    dehint_server = DehintServer(socket_path)
+    thread = threading.Thread(target=dehint_server.serve_forever)
+    thread.start()
+    stop_server(socket_path)
+    thread.join(timeout=30)
+    assert not thread.is_alive()
+    dehint_server.server_close()
+    assert not os.path.exists(socket_path)
+
+
+def test_run_with_server(server, tmp_path, capsys):
+    inpath = str(tmp_path / "Roboto-Regular.ttf")
+    with open(FILEPATH_HINTED_TTF, "rb") as f:
+        with open(inpath, "wb") as g:
+            g.write(f.read())
+    run(["--server", "--socket", server.socket_path, "--report", "json", inpath])
+    records = json.loads(capsys.readouterr().out)
+    assert len(records) == 1
+    assert records[0]["ok"] is True
+    assert "fpgm" in records[0]["removed_tables"]
+    assert "fpgm" not in TTFont(str(tmp_path / "Roboto-Regular-dehinted.ttf"))
+
+
+def test_run_with_server_not_running(tmp_path, capsys):
+    inpath = str(tmp_path / "Roboto-Regular.ttf")
+    with open(FILEPATH_HINTED_TTF, "rb") as f:
+        with open(inpath, "wb") as g:
+            g.write(f.read())
+    socket_path = str(tmp_path / "dehinter.sock")
+    with pytest.raises(SystemExit):
+        run(["--server", "--socket", socket_path, inpath])
+    assert "unable to connect to the dehinter server" in capsys.readouterr().err
+
+    with pytest.raises(SystemExit):
+        run(["serve", "--stop", "--socket", socket_path])
@@ -0,0 +1,166 @@
+import io
+import os
+import struct
+
+from fontTools.ttLib import TTFont
+
+from dehinter.sfnt import (
+    CHECKSUM_CHUNK_SIZE,
+    SFNTError,
+    SFNTFont,
+    calc_checksum,
+    open_sfnt,
+    write_chunks,
+)
+
+import pytest
+
+FILEPATH_TEST_TEXT = os.path.join("tests", "test_files", "text", "test.txt")
+FONTS_DIR = os.path.join("tests", "test_files", "fonts")
+FILEPATH_HINTED_TTF = os.path.join(FONTS_DIR, "Roboto-Regular.ttf")
+
+
+def get_font_data(filepath):
+    with open(filepath, "rb") as f:
+        return f.read()
+
+
+def test_calc_checksum():
+    assert calc_checksum(b"") == 0
+    assert calc_checksum(b"\x00\x00\x00\x01\x00\x00\x00\x02") == 3
+    # zero padded to a four byte boundary
+    assert calc_checksum(b"\x01") == 0x01000000
+    # overflow wraps at 32 bits
+    assert calc_checksum(b"\xff\xff\xff\xff\x00\x00\x00\x02") == 1
+
+
+def test_sfnt_font_tables():
+    data = get_font_data(FILEPATH_HINTED_TTF)
+    sfnt = SFNTFont(data)
+    tt = TTFont(FILEPATH_HINTED_TTF)
+    assert sorted(sfnt.keys()) == sorted(tag for tag in tt.keys() if tag != "GlyphOrder")
+    assert "fpgm" in sfnt
+    assert bytes(sfnt["fpgm"]) == tt.reader["fpgm"]
+
+
+def test_sfnt_font_invalid_data():
+    with pytest.raises(SFNTError):
+        SFNTFont(get_font_data(FILEPATH_TEST_TEXT))
+    with pytest.raises(SFNTError):
+        SFNTFont(b"\x00\x01")
+
+
+def test_sfnt_font_truncated_data():
+    data = get_font_data(FILEPATH_HINTED_TTF)
+    with pytest.raises(SFNTError):
+        SFNTFont(data[: len(data) // 2])
+
+
+def test_sfnt_font_compile_unmodified():
+    sfnt = SFNTFont(get_font_data(FILEPATH_HINTED_TTF))
+    compiled = sfnt.compile()
+    compiled_sfnt = SFNTFont(compiled)
+    assert compiled_sfnt.keys() == sorted(sfnt.keys())
+    for tag in sfnt.keys():
+        if tag != "head":
+            assert bytes(compiled_sfnt[tag]) == bytes(sfnt[tag])
+    for record in compiled_sfnt.records:
+        assert record.offset % 4 == 0
+        if record.tag != "head":
+            assert record.checksum == calc_checksum(compiled_sfnt[record.tag])
+
+
+@pytest.mark.parametrize(
+    "filename",
+    [
+        "Roboto-Regular.ttf",
+        "NotoSans-Regular.ttf",
+        "OpenSans-VF.ttf",
+        "Ubuntu-Regular.ttf",
+    ],
+)
+def test_sfnt_font_compile_preserves_layout(filename):
+    data = get_font_data(os.path.join(FONTS_DIR, filename))
+    assert SFNTFont(data).compile() == data
+
+
+def test_sfnt_font_table_order():
+    data = get_font_data(FILEPATH_HINTED_TTF)
+    sfnt = SFNTFont(data)
+    order = sfnt.table_order()
+    assert order[:3] == ["head", "hhea", "maxp"]
+    del sfnt["fpgm"]
+    sfnt["gasp"] = struct.pack(">HHHH", 1, 1, 65535, 0x000A)
+    sfnt["TEST"] = b"test"
+    expected = [tag for tag in order if tag != "fpgm"] + ["TEST"]
+    assert sfnt.table_order() == expected
+    # the table data are written in table order
+    compiled_sfnt = SFNTFont(sfnt.compile())
+    assert compiled_sfnt.table_order() == expected
+    assert compiled_sfnt.keys() == sorted(expected)
+
+
+def test_sfnt_font_compile_checksum_adjustment():
+    sfnt = SFNTFont(get_font_data(FILEPATH_HINTED_TTF))
+    del sfnt["fpgm"]
+    sfnt["gasp"] = struct.pack(">HHHH", 1, 1, 65535, 0x000A)
+    compiled = sfnt.compile()
+    assert calc_checksum(compiled) == 0xB1B0AFBA
+    # fontTools raises on table checksum mismatches with checkChecksums=2
+    tt = TTFont(io.BytesIO(compiled), checkChecksums=2)
+    for tag in tt.keys():
+        tt[tag]
+    assert "fpgm" not in tt
+    assert tt["gasp"].gaspRange == {65535: 0x000A}
+
+
+def test_open_sfnt():
+    with open_sfnt(FILEPATH_HINTED_TTF) as sfnt:
+        assert "glyf" in sfnt
+        assert bytes(sfnt["fpgm"]) == TTFont(FILEPATH_HINTED_TTF).reader["fpgm"]
+    assert sfnt.tables == {}
+
+
+def test_open_sfnt_with_retained_table_data():
+    with open_sfnt(FILEPATH_HINTED_TTF) as sfnt:
+        fpgm = sfnt["fpgm"]
+    # the table data slice remains valid until it is released
+    assert bytes(fpgm) == TTFont(FILEPATH_HINTED_TTF).reader["fpgm"]
+
+
+def test_open_sfnt_invalid_file():
+    with pytest.raises(SFNTError):
+        with open_sfnt(FILEPATH_TEST_TEXT):
+            pass
+
+
+def test_sfnt_font_save(tmp_path):
+    outpath = str(tmp_path / "Roboto-Regular.ttf")
+    with open_sfnt(FILEPATH_HINTED_TTF) as sfnt:
+        del sfnt["fpgm"]
+        expected = sfnt.compile()
+        sfnt.save(outpath)
+    with open(outpath, "rb") as f:
+        assert f.read() == expected
+
+
+def test_write_chunks(tmp_path):
+    outpath = str(tmp_path / "chunks.bin")
+    chunks = [bytes([i % 256]) * (i % 7) for i in range(3000)]
+    with open(outpath, "wb") as f:
+        f.write(b"header")
+        write_chunks(f, chunks)
+    with open(outpath, "rb") as f:
+        assert f.read() == b"header" + b"".join(chunks)
+
+    # file objects without a file descriptor
+    f = io.BytesIO()
+    write_chunks(f, chunks)
+    assert f.getvalue() == b"".join(chunks)
+
+
+def test_calc_checksum_multiple_chunks():
+    data = bytes(range(256)) * ((CHECKSUM_CHUNK_SIZE // 256) + 3) + b"\x01"
+    expected = sum(struct.unpack(f">{len(data) // 4}L", data[: len(data) // 4 * 4]))
+    expected += 0x01000000
+    assert calc_checksum(data) == expected & 0xFFFFFFFF
@@ -0,0 +1,134 @@
+import json
+import os
+import shutil
+
+from fontTools.ttLib import TTFont
+
+from dehinter.sync import (
+    MANIFEST_FILE_NAME,
+    MANIFEST_VERSION,
+    get_sync_out_path,
+    read_manifest,
+    sync_directory,
+    write_manifest,
+)
+
+FILEPATH_HINTED_TTF = os.path.join("tests", "test_files", "fonts", "Roboto-Regular.ttf")
+FILEPATH_HINTED_TTF_2 = os.path.join(
+    "tests", "test_files", "fonts", "NotoSans-Regular.ttf"
+)
+
+
+def make_src_dir(tmp_path):
+    src_dir = tmp_path / "src"
+    os.makedirs(src_dir / "roboto")
+    os.makedirs(src_dir / "noto")
+    shutil.copyfile(FILEPATH_HINTED_TTF, src_dir / "roboto" / "Roboto-Regular.ttf")
+    shutil.copyfile(FILEPATH_HINTED_TTF_2, src_dir / "noto" / "NotoSans-Regular.ttf")
+    return src_dir
+
+
+def test_get_sync_out_path():
+    path = os.path.join("roboto", "Roboto-Regular.ttf")
+    assert get_sync_out_path(path, None) == path
+    assert get_sync_out_path(path, "woff") == os.path.join(
+        "roboto", "Roboto-Regular.woff"
+    )
+
+
+def test_read_manifest_missing_or_invalid(tmp_path):
+    assert read_manifest(str(tmp_path)) == {}
+    (tmp_path / MANIFEST_FILE_NAME).write_text("not json")
+    assert read_manifest(str(tmp_path)) == {}
+    (tmp_path / MANIFEST_FILE_NAME).write_text(json.dumps({"version": 0}))
+    assert read_manifest(str(tmp_path)) == {}
+
+
+def test_write_manifest(tmp_path):
+    manifest = {"version": MANIFEST_VERSION, "files": {}}
+    write_manifest(str(tmp_path / "dst"), manifest, fsync=True)
+    assert read_manifest(str(tmp_path / "dst")) == manifest
+    # the manifest is renamed from a temporary file with the permissions of a
+    # file that is created with open()
+    assert os.listdir(tmp_path / "dst") == [MANIFEST_FILE_NAME]
+    (tmp_path / "expected").write_bytes(b"")
+    manifest_mode = os.stat(tmp_path / "dst" / MANIFEST_FILE_NAME).st_mode
+    assert manifest_mode == os.stat(tmp_path / "expected").st_mode
+
+
+def test_sync_directory(tmp_path):
+    src_dir = make_src_dir(tmp_path)
+    dst_dir = tmp_path / "dst"
+    roboto_path = os.path.join("roboto", "Roboto-Regular.ttf")
+    noto_path = os.path.join("noto", "NotoSans-Regular.ttf")
+
+    # first sync dehints all fonts
+    result = sync_directory(src_dir, dst_dir, {})
+    assert result.dehinted == [noto_path, roboto_path]
+    assert result.unchanged == []
+    assert result.failures == []
+    assert "fpgm" not in TTFont(dst_dir / roboto_path)
+    manifest = read_manifest(str(dst_dir))
+    assert sorted(manifest["files"]) == [noto_path, roboto_path]
+
+    # nothing changed
+    result = sync_directory(src_dir, dst_dir, {})
+    assert result.dehinted == []
+    assert result.unchanged == [noto_path, roboto_path]
+
+    # a touched file with the same contents is not dehinted again
+    os.utime(src_dir / roboto_path, (0, 0))
+    result = sync_directory(src_dir, dst_dir, {})
+    assert result.dehinted == []
+    assert read_manifest(str(dst_dir))["files"][roboto_path]["mtime_ns"] == 0
+
+    # a changed file is dehinted again
+    shutil.copyfile(FILEPATH_HINTED_TTF_2, src_dir / roboto_path)
+    result = sync_directory(src_dir, dst_dir, {})
+    assert result.dehinted == [roboto_path]
+    assert result.unchanged == [noto_path]
+
+    # a missing dehinted font is dehinted again
+    os.remove(dst_dir / noto_path)
+    result = sync_directory(src_dir, dst_dir, {})
+    assert result.dehinted == [noto_path]
+
+    # changed options dehint all fonts
+    result = sync_directory(src_dir, dst_dir, {"keep_fpgm": True})
+    assert result.dehinted == [noto_path, roboto_path]
+    assert "fpgm" in TTFont(dst_dir / roboto_path)
+
+    # the dehinted fonts of removed source fonts are removed
+    os.remove(src_dir / noto_path)
+    result = sync_directory(src_dir, dst_dir, {"keep_fpgm": True})
+    assert result.removed == [noto_path]
+    assert not os.path.exists(dst_dir / noto_path)
+    assert list(read_manifest(str(dst_dir))["files"]) == [roboto_path]
+
+
+def test_sync_directory_flavor_change(tmp_path):
+    src_dir = make_src_dir(tmp_path)
+    dst_dir = tmp_path / "dst"
+    roboto_path = os.path.join("roboto", "Roboto-Regular.ttf")
+    roboto_woff_path = os.path.join("roboto", "Roboto-Regular.woff")
+
+    sync_directory(src_dir, dst_dir, {}, fast=True)
+    result = sync_directory(src_dir, dst_dir, {}, fast=True, flavor="woff")
+    assert roboto_path in result.dehinted
+    assert roboto_path in result.removed
+    assert not os.path.exists(dst_dir / roboto_path)
+    assert TTFont(dst_dir / roboto_woff_path).flavor == "woff"
+
+
+def test_sync_directory_failures_are_retried(tmp_path):
+    src_dir = tmp_path / "src"
+    os.makedirs(src_dir)
+    (src_dir / "bad.ttf").write_bytes(b"not a font")
+
+    for _ in range(2):
+        result = sync_directory(src_dir, tmp_path / "dst", {})
+        assert result.dehinted == []
+        assert [failure.inpath for failure in result.failures] == [
+            str(src_dir / "bad.ttf")
+        ]
+    assert read_manifest(str(tmp_path / "dst"))["files"] == {}
@@ -1,6 +1,9 @@
 import os
+import stat
 
-from dehinter.system import get_filesize
+import pytest
+
+from dehinter.system import atomic_write, format_size, fsync_directory, get_filesize
 
 
 def test_get_filesize_bytes():
@@ -16,3 +19,58 @@ def test_get_filesize_kilobytes():
 def test_get_filesize_megabytes():
     megabyte_file = os.path.join("tests", "test_files", "text", "mb.txt")
     assert get_filesize(megabyte_file) == ("1.00", "MB")
+
+
+def test_format_size():
+    assert format_size(0) == ("0.00", "B")
+    assert format_size(1536) == ("1.50", "KB")
+    assert format_size(3 << 20) == ("3.00", "MB")
+
+
+def test_atomic_write(tmp_path, monkeypatch):
+    def no_umask(mask):
+        raise AssertionError("the process umask was changed")
+
+    # the umask is not read, it is process wide state that threads share
+    monkeypatch.setattr(os, "umask", no_umask)
+    outpath = str(tmp_path / "out.ttf")
+    with atomic_write(outpath) as f:
+        f.write(b"font data")
+        # the out file path is only written on exit
+        assert not os.path.exists(outpath)
+    with open(outpath, "rb") as f:
+        assert f.read() == b"font data"
+    assert os.listdir(str(tmp_path)) == ["out.ttf"]
+    # the permissions of a file that is created with open()
+    open_path = str(tmp_path / "open.ttf")
+    with open(open_path, "wb"):
+        pass
+    assert stat.S_IMODE(os.stat(outpath).st_mode) == stat.S_IMODE(
+        os.stat(open_path).st_mode
+    )
+
+
+def test_atomic_write_error_keeps_previous_file(tmp_path):
+    outpath = str(tmp_path / "out.ttf")
+    with open(outpath, "wb") as f:
+        f.write(b"previous")
+    with pytest.raises(KeyboardInterrupt):
+        with atomic_write(outpath) as f:
+            f.write(b"partial")
+            raise KeyboardInterrupt
+    with open(outpath, "rb") as f:
+        assert f.read() == b"previous"
+    assert os.listdir(str(tmp_path)) == ["out.ttf"]
+
+
+def test_atomic_write_fsync(tmp_path, monkeypatch):
+    fsynced = []
+    monkeypatch.setattr(os, "fsync", fsynced.append)
+    with atomic_write(str(tmp_path / "out.ttf"), fsync=True) as f:
+        f.write(b"font data")
+    assert len(fsynced) == 1
+    fsync_directory(str(tmp_path))
+    assert len(fsynced) == 2
+    # directories that can not be opened are skipped
+    fsync_directory(str(tmp_path / "missing"))
+    assert len(fsynced) == 2
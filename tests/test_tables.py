@@ -0,0 +1,34 @@
+from dehinter.tables import (
+    HEAD_FLAG_BIT_4_TABLES,
+    HINTING_TABLES,
+    TableSpec,
+    get_removed_tables,
+)
+
+FONT_TAGS = ["cmap", "cvt ", "fpgm", "glyf", "hdmx", "head", "loca", "prep"]
+
+
+def test_get_removed_tables():
+    removed = get_removed_tables(FONT_TAGS, {})
+    assert [spec.tag for spec in removed] == ["cvt ", "fpgm", "hdmx", "prep"]
+
+
+def test_get_removed_tables_keep_options():
+    removed = get_removed_tables(FONT_TAGS, {"keep_fpgm": True, "keep_cvt": False})
+    assert [spec.tag for spec in removed] == ["cvt ", "hdmx", "prep"]
+
+
+def test_get_removed_tables_variable_only():
+    tags = ["cvar", "cvt ", "glyf"]
+    assert [spec.tag for spec in get_removed_tables(tags, {})] == ["cvt "]
+    removed = get_removed_tables(iter(tags + ["fvar"]), {})
+    assert [spec.tag for spec in removed] == ["cvar", "cvt "]
+    removed = get_removed_tables(tags + ["fvar"], {"keep_cvar": True})
+    assert [spec.tag for spec in removed] == ["cvt "]
+
+
+def test_hinting_tables():
+    assert len({spec.tag for spec in HINTING_TABLES}) == len(HINTING_TABLES)
+    assert HEAD_FLAG_BIT_4_TABLES == {"hdmx", "LTSH"}
+    assert TableSpec("cvt ", "keep_cvt", "cvt").phase == "remove_cvt_table"
+    assert TableSpec("LTSH", "keep_ltsh", "LTSH").phase == "remove_ltsh_table"
@@ -0,0 +1,143 @@
+import io
+import os
+
+from fontTools.ttLib import TTFont
+
+from dehinter.raw import dehint_sfnt
+from dehinter.sfnt import SFNTError, SFNTFont, open_sfnt, read_sfnt
+from dehinter.woff import WOFFFont
+
+import pytest
+
+FILEPATH_HINTED_TTF = os.path.join("tests", "test_files", "fonts", "Roboto-Regular.ttf")
+
+
+def strip_head_timestamps(head):
+    # checkSumAdjustment and modified differ between the fontTools WOFF encode
+    # of the test font and the original sfnt font
+    head = bytes(head)
+    return head[:8] + head[12:28] + head[36:]
+
+
+def test_read_woff_font(woff_private_path):
+    with open_sfnt(woff_private_path) as sfnt:
+        assert isinstance(sfnt, WOFFFont)
+        assert sfnt.flavor == "woff"
+        tt = TTFont(FILEPATH_HINTED_TTF)
+        assert sorted(sfnt.keys()) == sorted(
+            tag for tag in tt.keys() if tag != "GlyphOrder"
+        )
+        # tables are decompressed the first time that they are read
+        assert "GSUB" in sfnt.compressed
+        assert bytes(sfnt["GSUB"]) == tt.getTableData("GSUB")
+        assert "GSUB" not in sfnt.compressed
+        assert sfnt.metadata is not None
+        assert sfnt.private_data is not None
+
+
+def test_read_woff_font_invalid():
+    with pytest.raises(SFNTError):
+        WOFFFont(b"wOFF")
+    with open(FILEPATH_HINTED_TTF, "rb") as f:
+        with pytest.raises(SFNTError):
+            WOFFFont(f.read())
+
+
+def test_woff_unedited_tables_keep_compressed_bytes(woff_private_path):
+    with open_sfnt(woff_private_path) as sfnt:
+        dehint_sfnt(sfnt, verbose=False)
+        woff = read_sfnt(sfnt.compile())
+        assert isinstance(woff, WOFFFont)
+        for tag in ("GSUB", "GPOS", "cmap", "name"):
+            source = sfnt.woff_table_entry(tag)
+            entry = woff.woff_table_entry(tag)
+            assert entry.comp_length == source.comp_length
+            assert entry.orig_checksum == source.orig_checksum
+            assert bytes(woff.tables[tag]) == bytes(sfnt.tables[tag])
+        assert sfnt.woff_table_entry("glyf") is None
+        assert bytes(woff.metadata[0]) == bytes(sfnt.metadata[0])
+        assert bytes(woff.private_data) == b"dehinter private data"
+
+
+def test_woff_compile_preserves_layout(woff_path):
+    with open(woff_path, "rb") as f:
+        data = f.read()
+    woff = read_sfnt(data)
+    assert woff.compile() == data
+    order = woff.table_order()
+    dehint_sfnt(woff, verbose=False)
+    dehinted = read_sfnt(woff.compile())
+    assert dehinted.table_order() == [tag for tag in order if tag in woff]
+
+
+def test_woff_dehint_matches_sfnt_dehint(woff_path):
+    with open_sfnt(FILEPATH_HINTED_TTF) as sfnt:
+        dehint_sfnt(sfnt, verbose=False)
+        expected = read_sfnt(sfnt.compile())
+    with open_sfnt(woff_path) as sfnt:
+        dehint_sfnt(sfnt, verbose=False)
+        woff_data = sfnt.compile()
+        sfnt.flavor = None
+        sfnt_data = sfnt.compile()
+
+    for data in (woff_data, sfnt_data):
+        font = read_sfnt(data)
+        assert sorted(font.keys()) == sorted(expected.keys())
+        for tag in expected.keys():
+            if tag == "head":
+                assert strip_head_timestamps(font[tag]) == strip_head_timestamps(
+                    expected[tag]
+                )
+            else:
+                assert bytes(font[tag]) == bytes(expected[tag])
+
+    # fontTools reads the WOFF font and verifies the sfnt checksums
+    tt = TTFont(io.BytesIO(woff_data))
+    assert tt.flavor == "woff"
+    assert tt["gasp"].gaspRange == {65535: 0x000A}
+    TTFont(io.BytesIO(sfnt_data), checkChecksums=2)
+    sfnt_file = io.BytesIO()
+    tt.flavor = None
+    tt.save(sfnt_file)
+    sfnt_file.seek(0)
+    TTFont(sfnt_file, checkChecksums=2)
+
+
+def test_sfnt_font_woff_flavor():
+    with open_sfnt(FILEPATH_HINTED_TTF) as sfnt:
+        dehint_sfnt(sfnt, verbose=False)
+        sfnt_data = sfnt.compile()
+        sfnt.flavor = "woff"
+        woff_data = sfnt.compile()
+    assert woff_data[:4] == b"wOFF"
+    assert len(woff_data) < len(sfnt_data)
+    woff = read_sfnt(woff_data)
+    expected = SFNTFont(sfnt_data)
+    for tag in expected.keys():
+        assert bytes(woff[tag]) == bytes(expected[tag])
+
+
+def test_sfnt_font_woff2_flavor_without_brotli():
+    try:
+        import brotli  # noqa: F401
+
+        pytest.skip("brotli is installed")
+    except ImportError:
+        pass
+    with open_sfnt(FILEPATH_HINTED_TTF) as sfnt:
+        sfnt.flavor = "woff2"
+        with pytest.raises(SFNTError):
+            sfnt.compile()
+
+
+def test_sfnt_font_woff2_flavor():
+    pytest.importorskip("brotli")
+    with open_sfnt(FILEPATH_HINTED_TTF) as sfnt:
+        dehint_sfnt(sfnt, verbose=False)
+        sfnt.flavor = "woff2"
+        woff2_data = sfnt.compile()
+    assert woff2_data[:4] == b"wOF2"
+    woff2 = read_sfnt(woff2_data)
+    assert woff2.flavor == "woff2"
+    assert "fpgm" not in woff2
+    assert TTFont(io.BytesIO(woff2_data))["gasp"].gaspRange == {65535: 0x000A}